@@ -0,0 +1,33 @@
+import argparse
+import sys
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.book import BookBuilder
+
+BACKENDS = {
+    'mailbox': GameState,
+    'bitboard': BitboardGameState,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds an opening book file from the games of PGN files.")
+    parser.add_argument('output', help="book file to write")
+    parser.add_argument('pgn', nargs='+', help="PGN files, gzip compressed when they end with .gz")
+    parser.add_argument('-b', '--backend', choices=sorted(BACKENDS), default='mailbox')
+    parser.add_argument('-p', '--max-ply', type=int, default=24, help="moves of every game added to the book")
+    parser.add_argument('-w', '--min-weight', type=int, default=1, help="leave out rarer moves")
+    parser.add_argument('-n', '--limit', type=int, default=None, help="games read from every file")
+    args = parser.parse_args(argv)
+
+    builder = BookBuilder(args.max_ply)
+    errors = 0
+    for path in args.pgn:
+        errors += builder.add_pgn(path, BACKENDS[args.backend], max_games=args.limit).errors
+    entries = builder.write(args.output, args.min_weight)
+    print(f"{builder.games} games, {errors} error(s), {entries} entries written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
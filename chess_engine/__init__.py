@@ -1,3 +1,47 @@
-from chess_engine.engine import GameState
-from chess_engine.moves import Move
+"""
+Names are imported from their module on first use : `import chess_engine` loads nothing, and a worker process only
+pays for the modules it touches (no NumPy without batch evaluation, no multiprocessing without ParallelPool).
+The package never imports the GUI, pygame or the logger package.
+"""
+import importlib
 
+# exported name -> module of chess_engine defining it
+_EXPORTS = {
+    'GameState': 'engine',
+    'Move': 'moves',
+    'BitboardGameState': 'bitboard',
+    'TranspositionTable': 'transposition',
+    'SharedTranspositionTable': 'transposition',
+    'Searcher': 'search',
+    'SearchResult': 'search',
+    'MoveOrderer': 'ordering',
+    'evaluate_batch': 'batch_evaluation',
+    'ParallelPool': 'parallel',
+    'read_epd': 'epd',
+    'EPDRecord': 'epd',
+    'read_pgn': 'pgn',
+    'replay_pgn': 'pgn',
+    'parse_san': 'pgn',
+    'OpeningBook': 'book',
+    'BookBuilder': 'book',
+    'Tablebases': 'tablebase',
+    'generate_tablebase': 'tablebase',
+    'UCIEngine': 'uci',
+    'run_match': 'match',
+    'EngineConfig': 'match',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
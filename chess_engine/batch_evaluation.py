@@ -0,0 +1,80 @@
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for batch evaluation
+    np = None
+
+from .evaluation import PIECE_VALUES, PIECE_SQUARE_TABLES
+from .moves import PIECE_CODES
+
+__all__ = [
+    'encode_boards',
+    'encode_planes',
+    'evaluate_batch'
+]
+
+# encode_boards codes : 0 for an empty square, 1 + index into PIECE_CODES for a piece
+EMPTY_CODE = 0
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("batch evaluation requires numpy, install it with `pip install numpy`")
+
+
+def _build_tables():
+    # Every square of GameState.board is two ASCII characters, read as one little-endian uint16 : colour | kind << 8.
+    # The lookup table maps those 65536 values to piece codes.
+    lut = np.zeros(1 << 16, dtype=np.int8)
+    for i, piece in enumerate(PIECE_CODES):
+        lut[ord(piece[0]) | ord(piece[1]) << 8] = i + 1
+
+    # scores[code][square], material plus placement, positive for white
+    scores = np.zeros((len(PIECE_CODES) + 1, 64), dtype=np.int32)
+    for i, piece in enumerate(PIECE_CODES):
+        kind = piece[1]
+        table = np.array(PIECE_SQUARE_TABLES[kind], dtype=np.int32) + PIECE_VALUES[kind]
+        if piece[0] == 'w':
+            scores[i + 1] = table
+        else:
+            # black reads the table with the row mirrored
+            scores[i + 1] = -table.reshape(8, 8)[::-1].reshape(64)
+
+    return lut, scores
+
+
+_PIECE_LUT, _SCORE_TABLE = _build_tables() if np is not None else (None, None)
+
+
+def encode_boards(game_states):
+    """
+    Encodes the boards of `game_states` (GameState or BitboardGameState) into an (N, 64) int8 array of piece codes,
+    squares numbered row * 8 + col. Rows are joined into one byte string and decoded through a lookup table,
+    no Python object is created per square.
+    """
+    _require_numpy()
+    data = ''.join([''.join(map(''.join, game_state.board)) for game_state in game_states]).encode('ascii')
+    squares = np.frombuffer(data, dtype='<u2')
+    return _PIECE_LUT[squares].reshape(-1, 64)
+
+
+def encode_planes(game_states=None, codes=None):
+    """
+    One-hot (N, 12, 64) int8 encoding, plane i holds the PIECE_CODES[i] pieces.
+    Pass either the game states or codes already returned by encode_boards.
+    """
+    if codes is None:
+        codes = encode_boards(game_states)
+    planes = codes[:, None, :] == np.arange(1, len(PIECE_CODES) + 1, dtype=np.int8)[None, :, None]
+    return planes.astype(np.int8)
+
+
+def evaluate_batch(game_states):
+    """
+    Static evaluation of many positions at once, equal to evaluation.evaluate for each of them :
+    centipawns from the side to move's point of view, as an (N,) int32 array.
+    """
+    game_states = list(game_states)
+    codes = encode_boards(game_states)
+    scores = _SCORE_TABLE[codes, np.arange(64)].sum(axis=1, dtype=np.int32)
+    white_move = np.fromiter((game_state.white_move for game_state in game_states), dtype=bool, count=len(codes))
+    return np.where(white_move, scores, -scores)
@@ -0,0 +1,711 @@
+from functools import partial
+from typing import List
+from .engine import STAGE_CAPTURES, STAGE_QUIETS, STAGE_ALL, ENPASSANT_BITS, CASTLE_BITS, PROMOTIONS
+from .moves import Move, PIECE_CODES, FLAG_ENPASSANT, FLAG_CASTLE, SQUARE_MASK, CASTLE_ALL, CASTLING_MASKS, \
+    CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN, CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN, PROMOTION_PIECES
+from .fen import INITIAL_FEN, parse_fen, position_to_fen
+from .perft import perft, divide
+from .zobrist import PIECE_KEYS, ENPASSANT_KEYS, SIDE_KEY, CASTLING_KEYS
+from .evaluation import SQUARE_SCORES
+
+__all__ = [
+    'BitboardGameState',
+    'BoardView'
+]
+
+# Squares are numbered row * 8 + col, the same orientation as GameState.board :
+#   square 0 is a8 (row 0, col 0) and square 63 is h1 (row 7, col 7).
+FULL = 0xFFFFFFFFFFFFFFFF
+
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+
+ROW_MASKS = [0xFF << (8 * r) for r in range(8)]
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+PIECE_INDEX = {code: i for i, code in enumerate(PIECE_CODES)}
+EMPTY = '--'
+PIECE_SQUARE_KEYS = [PIECE_KEYS[code] for code in PIECE_CODES]
+PIECE_SQUARE_SCORES = [SQUARE_SCORES[code] for code in PIECE_CODES]
+
+# castling by colour : (right, squares that must be empty, squares the king crosses or lands on, king target)
+_CASTLING = (
+    ((CASTLE_WHITE_KING, 0x60 << 56, (61, 62), 62), (CASTLE_WHITE_QUEEN, 0x0E << 56, (59, 58), 58)),
+    ((CASTLE_BLACK_KING, 0x60, (5, 6), 6), (CASTLE_BLACK_QUEEN, 0x0E, (3, 2), 2)),
+)
+_CASTLE_RIGHTS = (CASTLE_WHITE_KING | CASTLE_WHITE_QUEEN, CASTLE_BLACK_KING | CASTLE_BLACK_QUEEN)
+# king target square -> rook (from, to) squares
+_CASTLE_ROOK_SQUARES = {62: (63, 61), 58: (56, 59), 6: (7, 5), 2: (0, 3)}
+
+
+def _leaper_attacks(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            end_row, end_col = r + dr, c + dc
+            if 0 <= end_row < 8 and 0 <= end_col < 8:
+                mask |= 1 << (end_row * 8 + end_col)
+        table.append(mask)
+    return table
+
+
+def _rays(dr, dc):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        end_row, end_col = r + dr, c + dc
+        while 0 <= end_row < 8 and 0 <= end_col < 8:
+            mask |= 1 << (end_row * 8 + end_col)
+            end_row += dr
+            end_col += dc
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_attacks(((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)))
+KING_ATTACKS = _leaper_attacks(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+PAWN_ATTACKS = [
+    _leaper_attacks(((-1, -1), (-1, 1))),  # white pawns capture towards row 0
+    _leaper_attacks(((1, -1), (1, 1))),  # black pawns capture towards row 7
+]
+
+# Rays whose square numbers increase away from the origin use the lowest set bit as first blocker,
+# the others use the highest one.
+POSITIVE_RAYS = [_rays(0, 1), _rays(1, -1), _rays(1, 0), _rays(1, 1)]
+NEGATIVE_RAYS = [_rays(0, -1), _rays(-1, 1), _rays(-1, 0), _rays(-1, -1)]
+
+ROOK_POSITIVE = (POSITIVE_RAYS[0], POSITIVE_RAYS[2])
+ROOK_NEGATIVE = (NEGATIVE_RAYS[0], NEGATIVE_RAYS[2])
+BISHOP_POSITIVE = (POSITIVE_RAYS[1], POSITIVE_RAYS[3])
+BISHOP_NEGATIVE = (NEGATIVE_RAYS[1], NEGATIVE_RAYS[3])
+
+
+def _between():
+    # BETWEEN[a][b] : squares strictly between a and b when they share a row, column or diagonal, 0 otherwise
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        for dr, dc in ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)):
+            mask = 0
+            end_row, end_col = r + dr, c + dc
+            while 0 <= end_row < 8 and 0 <= end_col < 8:
+                table[sq][end_row * 8 + end_col] = mask
+                mask |= 1 << (end_row * 8 + end_col)
+                end_row += dr
+                end_col += dc
+    return table
+
+
+BETWEEN = _between()
+
+
+def _make_slider(positive, negative):
+    # attacks along two positive and two negative rays, each cut behind its first blocker
+    (first, second), (third, fourth) = positive, negative
+
+    def scan(sq, occupied):
+        ray = first[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= first[(blockers & -blockers).bit_length() - 1]
+        result = ray
+        ray = second[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= second[(blockers & -blockers).bit_length() - 1]
+        result |= ray
+        ray = third[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= third[blockers.bit_length() - 1]
+        result |= ray
+        ray = fourth[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= fourth[blockers.bit_length() - 1]
+        return result | ray
+
+    return scan
+
+
+def _relevant_masks(positive, negative):
+    # squares whose occupancy changes a slider's attacks : its rays without their last square
+    masks = []
+    for sq in range(64):
+        mask = 0
+        for ray in positive:
+            if ray[sq]:
+                mask |= ray[sq] ^ (1 << (ray[sq].bit_length() - 1))
+        for ray in negative:
+            mask |= ray[sq] & (ray[sq] - 1)
+        masks.append(mask)
+    return masks
+
+
+class _LazyTable(dict):
+    """
+    Lookup table filled on first use : a missing key is computed by `fill(key)` and stored. Tables whose keys are
+    not bounded by construction are given a `limit` and start over once they reach it.
+    """
+    __slots__ = ('fill', 'limit')
+
+    def __init__(self, fill, limit=None):
+        super().__init__()
+        self.fill = fill
+        self.limit = limit
+
+    def __missing__(self, key):
+        if self.limit is not None and len(self) >= self.limit:
+            self.clear()
+        value = self[key] = self.fill(key)
+        return value
+
+
+def _moves_from(start_sq, targets):
+    # packed moves from start_sq to every square of the `targets` bitboard
+    moves = []
+    while targets:
+        target = targets & -targets
+        targets ^= target
+        moves.append(start_sq | (target.bit_length() - 1) << 6)
+    return tuple(moves)
+
+
+_PROMOTION_ROWS = ROW_MASKS[0] | ROW_MASKS[7]
+
+
+def _pawn_moves_to(shift, targets):
+    # packed moves of the pawns landing on `targets` from `shift` squares further, promotions on the last rows
+    moves = []
+    while targets:
+        target = targets & -targets
+        targets ^= target
+        end_sq = target.bit_length() - 1
+        if target & _PROMOTION_ROWS:
+            moves.extend((end_sq + shift) | end_sq << 6 | flags for flags in PROMOTIONS)
+        else:
+            moves.append((end_sq + shift) | end_sq << 6)
+    return tuple(moves)
+
+
+MOVE_LIST_LIMIT = 1024  # serialised target sets kept per table, a 20 s search fills fewer than 1000
+
+# slider attacks by square then by occupancy of the relevant mask (at most 4096 keys for a rook, 512 for a bishop)
+ROOK_MASKS = _relevant_masks(ROOK_POSITIVE, ROOK_NEGATIVE)
+BISHOP_MASKS = _relevant_masks(BISHOP_POSITIVE, BISHOP_NEGATIVE)
+_rook_scan = _make_slider(ROOK_POSITIVE, ROOK_NEGATIVE)
+_bishop_scan = _make_slider(BISHOP_POSITIVE, BISHOP_NEGATIVE)
+ROOK_TABLES = [_LazyTable(partial(_rook_scan, sq)) for sq in range(64)]
+BISHOP_TABLES = [_LazyTable(partial(_bishop_scan, sq)) for sq in range(64)]
+# packed moves by start square then target bitboard, and pawn moves by shift then target bitboard
+MOVE_LISTS = [_LazyTable(partial(_moves_from, sq), MOVE_LIST_LIMIT) for sq in range(64)]
+PAWN_MOVE_LISTS = {shift: _LazyTable(partial(_pawn_moves_to, shift), MOVE_LIST_LIMIT)
+                   for shift in (8, 16, 9, 7, -8, -16, -7, -9)}
+
+
+def rook_attacks(sq, occupied):
+    """ squares a rook on sq attacks with `occupied` squares blocking, captures included """
+    return ROOK_TABLES[sq][occupied & ROOK_MASKS[sq]]
+
+
+def bishop_attacks(sq, occupied):
+    """ squares a bishop on sq attacks with `occupied` squares blocking, captures included """
+    return BISHOP_TABLES[sq][occupied & BISHOP_MASKS[sq]]
+
+
+class BoardView:
+    """
+    Read-only 8x8 view over a BitboardGameState, indexable like GameState.board (board[r][c] -> 'wP').
+    Rows are handed out as tuples so callers can not write through the view. The state's own hot paths (Move
+    construction in make_packed_move and move generation) read its rows directly instead.
+    """
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    def __getitem__(self, r):
+        return tuple(self._rows[r])
+
+    def __len__(self):
+        return 8
+
+    def __iter__(self):
+        for r in range(8):
+            yield self[r]
+
+    def __repr__(self):
+        return f"BoardView({[list(row) for row in self]})"
+
+
+class BitboardGameState:
+    """
+    Bitboard backed drop-in for GameState.
+
+    One 64-bit integer per piece type and colour plus occupancy masks hold the position, move generation and
+    make/undo work on those masks. Attacks and the packed moves of a target set are table lookups (see _LazyTable),
+    the only per-square loop left is over the pieces of a type.
+    ``board`` is a read-only view, so GuiManager.draw_pieces and Move keep working.
+    """
+
+    def __init__(self):
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self._rows = [[EMPTY] * 8 for _ in range(8)]  # piece codes by row and column, written by _put / _remove
+        self.zobrist_key = 0  # 64-bit position key, _put / _remove and make / undo keep it current
+        self.eval_score = 0  # material plus piece-square total, positive for white, kept current by _put / _remove
+
+        initial = [
+            ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
+            ['bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'],
+            ['--', '--', '--', '--', '--', '--', '--', '--'],
+            ['--', '--', '--', '--', '--', '--', '--', '--'],
+            ['--', '--', '--', '--', '--', '--', '--', '--'],
+            ['--', '--', '--', '--', '--', '--', '--', '--'],
+            ['wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP'],
+            ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR'],
+        ]
+        for r, row in enumerate(initial):
+            for c, piece in enumerate(row):
+                if piece != EMPTY:
+                    self._put(PIECE_INDEX[piece], r * 8 + c)
+
+        self.board = BoardView(self._rows)
+        self.white_move = True
+        self.move_logs: List[Move] = []
+
+        self.check_mate = False
+        self.stale_mate = False
+
+        self.enpassant_possible = ()  # coord where enpassant capture is possible
+        self.enpassant_logs = []
+
+        self.castling_rights = CASTLE_ALL  # bitmask of the CASTLE_* rights of chess_engine.moves
+        self.castling_logs = []
+        self.zobrist_key ^= CASTLING_KEYS[self.castling_rights]
+
+        # position move_logs starts from, see from_fen
+        self.start_fen = INITIAL_FEN
+        self.start_halfmove_clock = 0
+        self.start_fullmove_number = 1
+
+    @classmethod
+    def from_fen(cls, fen):
+        """ :raises ValueError: on a malformed FEN """
+        game_state = cls()
+        game_state.load_fen(fen)
+        return game_state
+
+    def load_fen(self, fen):
+        """ replaces the position by `fen`, the move logs are cleared """
+        position = parse_fen(fen)
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        for row in self._rows:
+            row[:] = [EMPTY] * 8
+        self.zobrist_key = 0
+        self.eval_score = 0
+        for r, row in enumerate(position.board):
+            for c, piece in enumerate(row):
+                if piece != EMPTY:
+                    self._put(PIECE_INDEX[piece], r * 8 + c)
+
+        self.white_move = position.white_move
+        self.move_logs = []
+        self.check_mate = False
+        self.stale_mate = False
+        self.enpassant_possible = position.enpassant
+        self.enpassant_logs = []
+        if not self.white_move:
+            self.zobrist_key ^= SIDE_KEY
+        if self.enpassant_possible:
+            self.zobrist_key ^= ENPASSANT_KEYS[self.enpassant_possible[1]]
+        self.castling_rights = position.castling
+        self.castling_logs = []
+        self.zobrist_key ^= CASTLING_KEYS[self.castling_rights]
+
+        self.start_fen = fen
+        self.start_halfmove_clock = position.halfmove_clock
+        self.start_fullmove_number = position.fullmove_number
+
+    def to_fen(self):
+        return position_to_fen(self)
+
+    def _put(self, piece, sq):
+        bit = 1 << sq
+        self.bitboards[piece] |= bit
+        self.occupancy[piece // 6] |= bit
+        self.occupied |= bit
+        self._rows[sq >> 3][sq & 7] = PIECE_CODES[piece]
+        self.zobrist_key ^= PIECE_SQUARE_KEYS[piece][sq]
+        self.eval_score += PIECE_SQUARE_SCORES[piece][sq]
+
+    def _remove(self, piece, sq):
+        bit = 1 << sq
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece // 6] ^= bit
+        self.occupied ^= bit
+        self._rows[sq >> 3][sq & 7] = EMPTY
+        self.zobrist_key ^= PIECE_SQUARE_KEYS[piece][sq]
+        self.eval_score -= PIECE_SQUARE_SCORES[piece][sq]
+
+    def _king_square(self, colour):
+        return self.bitboards[colour * 6 + KING].bit_length() - 1
+
+    @property
+    def white_king_loc(self):
+        return divmod(self._king_square(WHITE), 8)
+
+    @property
+    def black_king_loc(self):
+        return divmod(self._king_square(BLACK), 8)
+
+    def is_empty(self, r, c):
+        return not self.occupied >> (r * 8 + c) & 1
+
+    def get_player_clr(self):
+        return "White" if self.white_move else "Black"
+
+    def make_move(self, move):
+        # squares and flags are decoded from the packed move once
+        packed = move.packed
+        start_sq = packed & SQUARE_MASK
+        end_sq = (packed >> 6) & SQUARE_MASK
+        flags = packed >> 12
+        moved = PIECE_INDEX[move.piece_moved]
+        colour = moved // 6
+
+        if flags == FLAG_ENPASSANT:
+            self._remove(PIECE_INDEX[move.piece_captured], (start_sq & ~7) | (end_sq & 7))
+        elif move.piece_captured != EMPTY:
+            self._remove(PIECE_INDEX[move.piece_captured], end_sq)
+
+        self._remove(moved, start_sq)
+        if flags & 8:
+            self._put(PIECE_INDEX[move.piece_moved[0] + PROMOTION_PIECES[flags & 3]], end_sq)
+        else:
+            self._put(moved, end_sq)
+
+        if flags == FLAG_CASTLE:
+            rook_from, rook_to = _CASTLE_ROOK_SQUARES[end_sq]
+            self._remove(colour * 6 + ROOK, rook_from)
+            self._put(colour * 6 + ROOK, rook_to)
+
+        self.move_logs.append(move)
+        self.enpassant_logs.append(self.enpassant_possible)
+        self.castling_logs.append(self.castling_rights)
+        self.white_move = not self.white_move
+        self.zobrist_key ^= SIDE_KEY
+
+        rights = self.castling_rights & CASTLING_MASKS[start_sq] & CASTLING_MASKS[end_sq]
+        if rights != self.castling_rights:
+            self.zobrist_key ^= CASTLING_KEYS[self.castling_rights] ^ CASTLING_KEYS[rights]
+            self.castling_rights = rights
+
+        if self.enpassant_possible:
+            self.zobrist_key ^= ENPASSANT_KEYS[self.enpassant_possible[1]]
+        if moved % 6 == PAWN and abs(start_sq - end_sq) == 16:
+            self.enpassant_possible = ((start_sq + end_sq) >> 4, start_sq & 7)
+            self.zobrist_key ^= ENPASSANT_KEYS[start_sq & 7]
+        else:
+            self.enpassant_possible = ()
+
+    def undo_last_move(self):
+        if self.move_logs:
+            last_move = self.move_logs.pop()
+            packed = last_move.packed
+            start_sq = packed & SQUARE_MASK
+            end_sq = (packed >> 6) & SQUARE_MASK
+            flags = packed >> 12
+            moved = PIECE_INDEX[last_move.piece_moved]
+            colour = moved // 6
+
+            if flags & 8:
+                self._remove(PIECE_INDEX[last_move.piece_moved[0] + PROMOTION_PIECES[flags & 3]], end_sq)
+            else:
+                self._remove(moved, end_sq)
+            self._put(moved, start_sq)
+
+            if flags == FLAG_CASTLE:
+                rook_from, rook_to = _CASTLE_ROOK_SQUARES[end_sq]
+                self._remove(colour * 6 + ROOK, rook_to)
+                self._put(colour * 6 + ROOK, rook_from)
+
+            if flags == FLAG_ENPASSANT:
+                self._put(PIECE_INDEX[last_move.piece_captured], (start_sq & ~7) | (end_sq & 7))
+            elif last_move.piece_captured != EMPTY:
+                self._put(PIECE_INDEX[last_move.piece_captured], end_sq)
+
+            self.white_move = not self.white_move
+            self.zobrist_key ^= SIDE_KEY
+
+            if self.enpassant_possible:
+                self.zobrist_key ^= ENPASSANT_KEYS[self.enpassant_possible[1]]
+            self.enpassant_possible = self.enpassant_logs.pop()
+            if self.enpassant_possible:
+                self.zobrist_key ^= ENPASSANT_KEYS[self.enpassant_possible[1]]
+
+            rights = self.castling_logs.pop()
+            self.zobrist_key ^= CASTLING_KEYS[self.castling_rights] ^ CASTLING_KEYS[rights]
+            self.castling_rights = rights
+
+            return True
+
+    def attackers_to(self, sq, by_colour):
+        """ bitboard of `by_colour` pieces attacking sq """
+        bitboards = self.bitboards
+        base = by_colour * 6
+        occupied = self.occupied
+
+        rook_like = bitboards[base + ROOK] | bitboards[base + QUEEN]
+        bishop_like = bitboards[base + BISHOP] | bitboards[base + QUEEN]
+
+        return (
+                (PAWN_ATTACKS[1 - by_colour][sq] & bitboards[base + PAWN])
+                | (KNIGHT_ATTACKS[sq] & bitboards[base + KNIGHT])
+                | (KING_ATTACKS[sq] & bitboards[base + KING])
+                | (rook_attacks(sq, occupied) & rook_like if rook_like else 0)
+                | (bishop_attacks(sq, occupied) & bishop_like if bishop_like else 0)
+        )
+
+    def square_under_attack(self, r, c):
+        return bool(self.attackers_to(r * 8 + c, BLACK if self.white_move else WHITE))
+
+    def is_square_attacked(self, r, c, by_colour):
+        return bool(self.attackers_to(r * 8 + c, WHITE if by_colour == 'w' else BLACK))
+
+    def in_check(self):
+        colour = WHITE if self.white_move else BLACK
+        return bool(self.attackers_to(self._king_square(colour), 1 - colour))
+
+    def get_valid_moves(self):
+        """ considering checks """
+        board = self._rows
+        moves = [Move.from_packed(move, board) for move in self.generate_moves([])]
+
+        if len(moves) == 0:
+            if self.in_check():
+                self.check_mate = True
+            else:
+                self.stale_mate = True
+        else:
+            self.stale_mate = self.check_mate = False
+
+        return moves
+
+    def generate_moves(self, moves, stage=STAGE_ALL):
+        """ appends the valid moves of `stage` to `moves` as packed integers, see GameState.generate_moves """
+        colour = WHITE if self.white_move else BLACK
+        is_legal = self._is_legal
+        king = self.bitboards[colour * 6 + KING]
+        king_sq = king.bit_length() - 1
+        in_check, pinned = self._checks_and_pins(colour, king_sq)
+        if in_check:
+            # every move is tested
+            moves.extend([move for move in self._generate_moves(colour, stage, []) if is_legal(move, colour)])
+        else:
+            # out of check only king moves, en passant and moves of pinned pieces can expose the king
+            unsafe = pinned | king
+            moves.extend([
+                move for move in self._generate_moves(colour, stage, [])
+                if not (unsafe >> (move & SQUARE_MASK) & 1 or move >> 12 == FLAG_ENPASSANT) or is_legal(move, colour)
+            ])
+            if stage & STAGE_QUIETS and self.castling_rights & _CASTLE_RIGHTS[colour]:
+                self._castle_moves(colour, king_sq, moves)
+        return moves
+
+    def _checks_and_pins(self, colour, king_sq):
+        """ :return: (bitboard of the pieces checking the `colour` king on king_sq, bitboard of its pinned pieces) """
+        bitboards = self.bitboards
+        base = (1 - colour) * 6
+        own = self.occupancy[colour]
+        occupied = self.occupied
+        checkers = (PAWN_ATTACKS[colour][king_sq] & bitboards[base + PAWN]) | (
+                KNIGHT_ATTACKS[king_sq] & bitboards[base + KNIGHT])
+        pinned = 0
+        for attacks, sliders in (
+                (rook_attacks, bitboards[base + ROOK] | bitboards[base + QUEEN]),
+                (bishop_attacks, bitboards[base + BISHOP] | bitboards[base + QUEEN])):
+            if not sliders:
+                continue
+            seen = attacks(king_sq, occupied)
+            checkers |= seen & sliders
+            # sliders seen from the king once the first own piece of every line is lifted pin that piece
+            blockers = seen & own
+            if blockers:
+                pinners = attacks(king_sq, occupied ^ blockers) & sliders & ~seen
+                while pinners:
+                    bit = pinners & -pinners
+                    pinners ^= bit
+                    pinned |= BETWEEN[king_sq][bit.bit_length() - 1] & own
+        return checkers, pinned
+
+    def _castle_moves(self, colour, king_sq, moves):
+        """ legal castling moves of the king on king_sq, not in check : empty path, no attacked square on its way """
+        enemy = 1 - colour
+
+        for right, empty, safe, end_sq in _CASTLING[colour]:
+            if self.castling_rights & right and not self.occupied & empty and not any(
+                    self.attackers_to(sq, enemy) for sq in safe):
+                moves.append(king_sq | end_sq << 6 | CASTLE_BITS)
+
+    def make_packed_move(self, packed):
+        """ plays a packed move of the current position """
+        self.make_move(Move.from_packed(packed, self._rows))
+
+    def is_legal_move(self, packed):
+        """ whether the packed move is valid in this position, see GameState.is_legal_move """
+        colour = WHITE if self.white_move else BLACK
+        start_sq = packed & SQUARE_MASK
+        end_sq = (packed >> 6) & SQUARE_MASK
+        flags = packed >> 12
+        piece = self._rows[start_sq >> 3][start_sq & 7]
+        if piece == EMPTY or piece[0] != ('w' if colour == WHITE else 'b'):
+            return False
+
+        kind = piece[1]
+        if kind == 'P':
+            candidates = []
+            self._pawn_moves(colour, STAGE_ALL, candidates)
+            return packed in candidates and self._is_legal(packed, colour)
+        if flags == FLAG_CASTLE:
+            if kind != 'K' or self.attackers_to(start_sq, 1 - colour):
+                return False
+            candidates = []
+            self._castle_moves(colour, start_sq, candidates)
+            return packed in candidates
+        if flags:
+            return False
+
+        if kind == 'N':
+            targets = KNIGHT_ATTACKS[start_sq]
+        elif kind == 'K':
+            targets = KING_ATTACKS[start_sq]
+        elif kind == 'B':
+            targets = bishop_attacks(start_sq, self.occupied)
+        elif kind == 'R':
+            targets = rook_attacks(start_sq, self.occupied)
+        else:
+            targets = rook_attacks(start_sq, self.occupied) | bishop_attacks(start_sq, self.occupied)
+        return bool((targets & ~self.occupancy[colour]) >> end_sq & 1) and self._is_legal(packed, colour)
+
+    def iter_moves(self, stage=STAGE_ALL):
+        """ lazily yields valid moves stage by stage, see GameState.iter_moves """
+        for current_stage in (STAGE_CAPTURES, STAGE_QUIETS):
+            if stage & current_stage:
+                for move in self.generate_moves([], current_stage):
+                    yield Move.from_packed(move, self._rows)
+
+    def _is_legal(self, move, colour):
+        """ whether the packed pseudo-legal `move` keeps the own king safe, tested on masks only """
+        start_sq = move & SQUARE_MASK
+        end_sq = (move >> 6) & SQUARE_MASK
+        start_bit = 1 << start_sq
+        captured = 1 << end_sq
+        occupied = (self.occupied ^ start_bit) | captured
+
+        if move >> 12 == FLAG_ENPASSANT:
+            captured = 1 << ((start_sq & 0x38) | (end_sq & 7))
+            occupied ^= captured
+
+        bitboards = self.bitboards
+        king = bitboards[colour * 6 + KING]
+        king_sq = end_sq if king & start_bit else king.bit_length() - 1
+        base = (1 - colour) * 6
+        alive = FULL ^ captured
+
+        if (PAWN_ATTACKS[colour][king_sq] & bitboards[base + PAWN] & alive) or (
+                KNIGHT_ATTACKS[king_sq] & bitboards[base + KNIGHT] & alive) or (
+                KING_ATTACKS[king_sq] & bitboards[base + KING]):
+            return False
+
+        rook_like = (bitboards[base + ROOK] | bitboards[base + QUEEN]) & alive
+        if rook_like and rook_attacks(king_sq, occupied) & rook_like:
+            return False
+        bishop_like = (bitboards[base + BISHOP] | bitboards[base + QUEEN]) & alive
+        if bishop_like and bishop_attacks(king_sq, occupied) & bishop_like:
+            return False
+
+        return True
+
+    def perft(self, depth):
+        """ number of leaf nodes `depth` plies below this position """
+        return perft(self, depth)
+
+    def divide(self, depth):
+        """ perft split by root move, a list of (move, nodes) """
+        return divide(self, depth)
+
+    def get_possible_moves(self, stage=STAGE_ALL):
+        """ without considering checks """
+        board = self._rows
+        colour = WHITE if self.white_move else BLACK
+        return [Move.from_packed(move, board) for move in self._generate_moves(colour, stage, [])]
+
+    def _generate_moves(self, colour, stage, moves):
+        """ pseudo-legal packed moves (start square | end square << 6 | flags << 12) """
+        self._pawn_moves(colour, stage, moves)
+        self._piece_moves(colour, stage, moves)
+        return moves
+
+    def _pawn_moves(self, colour, stage, moves):
+        pawns = self.bitboards[colour * 6 + PAWN]
+        empty = FULL ^ self.occupied
+        enemies = self.occupancy[1 - colour] if stage & STAGE_CAPTURES else 0
+
+        if colour == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty
+            targets = ((single, 8), (double, 16), ((pawns >> 9) & NOT_FILE_H & enemies, 9),
+                       ((pawns >> 7) & NOT_FILE_A & enemies, 7))
+            last_row = ROW_MASKS[0]
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty
+            targets = ((single, -8), (double, -16), ((pawns << 7) & NOT_FILE_H & enemies, -7),
+                       ((pawns << 9) & NOT_FILE_A & enemies, -9))
+            last_row = ROW_MASKS[7]
+
+        for i, (target_mask, shift) in enumerate(targets):
+            if i < 2:
+                # pushes : promotions go with the captures stage, the rest are quiet
+                target_mask &= (last_row if stage & STAGE_CAPTURES else 0) | (
+                    FULL ^ last_row if stage & STAGE_QUIETS else 0)
+            if target_mask:
+                moves.extend(PAWN_MOVE_LISTS[shift][target_mask])
+
+        if self.enpassant_possible and stage & STAGE_CAPTURES:
+            ep_sq = self.enpassant_possible[0] * 8 + self.enpassant_possible[1]
+            attackers = PAWN_ATTACKS[1 - colour][ep_sq] & pawns
+            while attackers:
+                bit = attackers & -attackers
+                attackers ^= bit
+                moves.append((bit.bit_length() - 1) | ep_sq << 6 | ENPASSANT_BITS)
+
+    def _piece_moves(self, colour, stage, moves):
+        bitboards = self.bitboards
+        base = colour * 6
+        occupied = self.occupied
+        allowed = (self.occupancy[1 - colour] if stage & STAGE_CAPTURES else 0) | (
+            FULL ^ occupied if stage & STAGE_QUIETS else 0)
+        queens = bitboards[base + QUEEN]
+
+        # attacks are table lookups, a queen is looked up in both slider tables
+        for pieces, table, masks in ((bitboards[base + KNIGHT], KNIGHT_ATTACKS, None),
+                                     (bitboards[base + BISHOP] | queens, BISHOP_TABLES, BISHOP_MASKS),
+                                     (bitboards[base + ROOK] | queens, ROOK_TABLES, ROOK_MASKS),
+                                     (bitboards[base + KING], KING_ATTACKS, None)):
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                sq = bit.bit_length() - 1
+                targets = (table[sq] if masks is None else table[sq][occupied & masks[sq]]) & allowed
+                moves.extend(MOVE_LISTS[sq][targets])
@@ -0,0 +1,240 @@
+import mmap
+import os
+import random
+import struct
+from collections import namedtuple, defaultdict
+
+from .engine import GameState
+from .moves import Move, FLAG_CASTLE, FLAG_ENPASSANT, PROMOTION_PIECES, SQUARE_MASK, promotion_flags
+
+__all__ = [
+    'BookEntry',
+    'OpeningBook',
+    'BookBuilder',
+    'encode_book_move',
+    'decode_book_move',
+    'ENTRY_BYTES'
+]
+
+# Polyglot entry layout, big-endian : key (8 bytes), move (2), weight (2), learn (4), sorted by key.
+# Keys are GameState.zobrist_key, not the Polyglot random table, so books are built with BookBuilder.
+_ENTRY = struct.Struct('>QHHI')
+_KEY = struct.Struct('>Q')
+ENTRY_BYTES = _ENTRY.size
+
+_MAX_WEIGHT = 0xFFFF
+_RESULT_WEIGHTS = {'1-0': (2, 0), '0-1': (0, 2), '1/2-1/2': (1, 1)}  # (white, black), unknown results weigh 1
+
+BookEntry = namedtuple('BookEntry', ['key', 'move', 'weight', 'learn'])
+
+
+def encode_book_move(move):
+    """
+    Polyglot move of a packed move : to file, to rank, from file, from rank (3 bits each, rank 1 is 0) and the
+    promotion piece (1-4 for NBRQ). Castling is encoded as the king taking its own rook.
+    """
+    start_sq = move & SQUARE_MASK
+    end_sq = (move >> 6) & SQUARE_MASK
+    flags = move >> 12
+    end_col = end_sq & 7
+    if flags == FLAG_CASTLE:
+        end_col = 7 if end_col == 6 else 0
+    promotion = (flags & 3) + 1 if flags & 8 else 0
+    return end_col | (7 - (end_sq >> 3)) << 3 | (start_sq & 7) << 6 | (7 - (start_sq >> 3)) << 9 | promotion << 12
+
+
+def decode_book_move(board, white_move, code):
+    """
+    Packed move of the Polyglot move `code` on `board`, worked out from the pieces without generating moves.
+    Only sanity checked (a piece of the side to move leaves the start square, none is captured), not validated.
+
+    :return: packed move or None
+    """
+    start_row, start_col = 7 - (code >> 9 & 7), code >> 6 & 7
+    end_row, end_col = 7 - (code >> 3 & 7), code & 7
+    promotion = code >> 12 & 7
+    colour = 'w' if white_move else 'b'
+    piece = board[start_row][start_col]
+    target = board[end_row][end_col]
+    if piece[0] != colour:
+        return None
+
+    flags = 0
+    if piece[1] == 'K' and target == colour + 'R' and start_col == 4 and start_row == end_row:
+        end_col = 6 if end_col == 7 else 2
+        flags = FLAG_CASTLE
+    elif target[0] == colour:
+        return None
+    elif piece[1] == 'P' and start_col != end_col and target == '--':
+        flags = FLAG_ENPASSANT
+    elif promotion:
+        if piece[1] != 'P' or not 1 <= promotion <= 4:
+            return None
+        flags = promotion_flags(PROMOTION_PIECES[promotion - 1])
+    return start_row * 8 + start_col | (end_row * 8 + end_col) << 6 | flags << 12
+
+
+class OpeningBook:
+    """
+    Read-only opening book file, memory mapped and searched by binary search on the position key.
+    Nothing is read up front : the pages a lookup touches come from the page cache, which every process mapping
+    the same file shares. Instances pickle as their path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = None
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size % ENTRY_BYTES:
+                raise ValueError(f"{path} is not an opening book, size {size} is not a multiple of {ENTRY_BYTES}")
+            if size:
+                # an empty file can not be mapped, it is an empty book
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(self._mmap, 'madvise'):
+                    self._mmap.madvise(mmap.MADV_RANDOM)
+        self.entries = size // ENTRY_BYTES
+
+    def __len__(self):
+        return self.entries
+
+    def __reduce__(self):
+        return self.__class__, (self.path,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def lookup(self, key):
+        """ :return: the BookEntry list of position `key`, in file order (heaviest first for built books) """
+        data = self._mmap
+        if data is None:
+            return []
+        # leftmost entry with this key
+        low, high = 0, self.entries
+        while low < high:
+            mid = (low + high) >> 1
+            if _KEY.unpack_from(data, mid * ENTRY_BYTES)[0] < key:
+                low = mid + 1
+            else:
+                high = mid
+
+        entries = []
+        while low < self.entries:
+            entry = _ENTRY.unpack_from(data, low * ENTRY_BYTES)
+            if entry[0] != key:
+                break
+            entries.append(BookEntry(*entry))
+            low += 1
+        return entries
+
+    def probe(self, game_state, validate=True):
+        """
+        :param validate: keep only moves found among the generated valid moves, so a book of unknown origin or
+            a key collision can not play an illegal move. With False moves are only decoded from the board,
+            which skips the move generation for books built from played games.
+        :return: list of (Move, weight) of the book moves of game_state, heaviest first
+        """
+        entries = self.lookup(game_state.zobrist_key)
+        if not entries:
+            return []
+        board = game_state.board
+        if validate:
+            by_code = {encode_book_move(move): move for move in game_state.generate_moves([])}
+            decode = by_code.get
+        else:
+            def decode(code):
+                return decode_book_move(board, game_state.white_move, code)
+
+        book_moves = []
+        for entry in entries:
+            packed = decode(entry.move) if entry.weight else None
+            if packed is not None:
+                book_moves.append((Move.from_packed(packed, board), entry.weight))
+        book_moves.sort(key=lambda item: -item[1])
+        return book_moves
+
+    def choose(self, game_state, best=False, rng=random, validate=True):
+        """
+        :param best: play the heaviest move instead of a weighted random one
+        :param validate: see probe
+        :return: a book Move for game_state, None when out of book
+        """
+        book_moves = self.probe(game_state, validate)
+        if not book_moves:
+            return None
+        if best:
+            return book_moves[0][0]
+        return rng.choices([move for move, _ in book_moves], weights=[weight for _, weight in book_moves])[0]
+
+
+class BookBuilder:
+    """
+    Collects (position, move) counts from played games and writes them as an OpeningBook file.
+
+    :param max_ply: only the first max_ply moves of every game are added
+    """
+
+    def __init__(self, max_ply=24):
+        self.max_ply = max_ply
+        self.games = 0
+        self._weights = defaultdict(int)  # (key, book move) -> weight
+
+    def __len__(self):
+        return len(self._weights)
+
+    def add_game(self, game_state, result=None):
+        """
+        Adds the moves of game_state.move_logs, replayed from its start position.
+
+        :param result: PGN result ('1-0', '0-1', '1/2-1/2'), moves of the winner weigh 2, of a draw 1,
+            of the loser 0. Unknown results weigh 1.
+        """
+        weights = _RESULT_WEIGHTS.get(result, (1, 1))
+        replay = type(game_state).from_fen(game_state.start_fen)
+        for move in game_state.move_logs[:self.max_ply]:
+            packed = move.packed
+            weight = weights[0 if replay.white_move else 1]
+            if weight:
+                self._weights[replay.zobrist_key, encode_book_move(packed)] += weight
+            replay.make_packed_move(packed)
+        self.games += 1
+
+    def add_pgn(self, source, state_cls=GameState, max_games=None):
+        """ adds every game of a PGN file, weighted by result, see chess_engine.pgn.replay_pgn """
+        from .pgn import replay_pgn
+
+        return replay_pgn(source, state_cls, on_game=lambda game, game_state: self.add_game(game_state, game.result),
+                          max_games=max_games)
+
+    def write(self, path, min_weight=1):
+        """
+        Writes the book sorted by key, heaviest move first. Weights of a position are scaled down to fit 16 bits.
+        The file is replaced atomically, processes that mapped the previous book keep reading it.
+
+        :param min_weight: moves with a lower total weight are left out
+        :return: number of entries written
+        """
+        positions = defaultdict(list)
+        for (key, move), weight in self._weights.items():
+            if weight >= min_weight:
+                positions[key].append((weight, move))
+
+        temp_path = f"{path}.tmp"
+        count = 0
+        with open(temp_path, 'wb') as file:
+            for key in sorted(positions):
+                moves = sorted(positions[key], key=lambda item: (-item[0], item[1]))
+                scale = max(1, -(-moves[0][0] // _MAX_WEIGHT))
+                for weight, move in moves:
+                    file.write(_ENTRY.pack(key, move, max(1, weight // scale), 0))
+                    count += 1
+        os.replace(temp_path, path)
+        return count
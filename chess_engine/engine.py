@@ -1,22 +1,67 @@
+import logging
 from typing import List
-from .moves import Move
-
-from logger.logger import get_custom_logger
+from .moves import Move, FLAG_ENPASSANT, FLAG_CASTLE, SQUARE_MASK, CASTLE_ALL, CASTLING_MASKS, \
+    CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN, CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN, PROMOTION_PIECES, promotion_flags
+from .fen import INITIAL_FEN, parse_fen, position_to_fen
+from .perft import perft, divide
+from .evaluation import SQUARE_SCORES, compute_score
+from .zobrist import PIECE_KEYS, ENPASSANT_KEYS, SIDE_KEY, CASTLING_KEYS, compute_hash
 
 __all__ = [
-    'GameState'
+    'GameState',
+    'STAGE_CAPTURES',
+    'STAGE_QUIETS',
+    'STAGE_ALL'
 ]
 
-log = get_custom_logger("CHESS-ENGINE")
+# Move generation stages, see GameState.iter_moves
+STAGE_CAPTURES = 1  # captures, en passant and promotions
+STAGE_QUIETS = 2
+STAGE_ALL = STAGE_CAPTURES | STAGE_QUIETS
+
+ENPASSANT_BITS = FLAG_ENPASSANT << 12
+CASTLE_BITS = FLAG_CASTLE << 12
+# flag bits of the four promotions of a pawn move, queen first
+PROMOTIONS = tuple(promotion_flags(piece) << 12 for piece in 'QNRB')
+
+# orthogonal directions first, diagonal after. check_for_pins_and_checks relies on this order
+KING_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+ROOK_DIRECTIONS = (0, 1, 2, 3)  # indexes into KING_DIRECTIONS
+BISHOP_DIRECTIONS = (4, 5, 6, 7)
+
+
+def _ray(r, c, dr, dc, length):
+    """ the (row, col, square) of up to `length` steps from (r, c) along (dr, dc), stopping at the edge """
+    ray = []
+    for i in range(1, length + 1):
+        end_row, end_col = r + dr * i, c + dc * i
+        if not (0 <= end_row < 8 and 0 <= end_col < 8):
+            break
+        ray.append((end_row, end_col, end_row * 8 + end_col))
+    return tuple(ray)
 
-ylog = log.ylog
-glog = log.glog
-blog = log.blog
-rlog = log.rlog
-clog = log.clog
+
+# Lookup tables by square, built once : the generators walk them with no offset arithmetic or bounds checks.
+# KNIGHT_TARGETS[sq] / KING_TARGETS[sq] : (row, col, square) of every target on the board
+# RAYS[sq][j] : (row, col, square) of the squares along KING_DIRECTIONS[j], nearest first
+KNIGHT_TARGETS = [sum((_ray(sq >> 3, sq & 7, dr, dc, 1) for dr, dc in KNIGHT_OFFSETS), ()) for sq in range(64)]
+KING_TARGETS = [sum((_ray(sq >> 3, sq & 7, dr, dc, 1) for dr, dc in KING_DIRECTIONS), ()) for sq in range(64)]
+RAYS = [tuple(_ray(sq >> 3, sq & 7, dr, dc, 7) for dr, dc in KING_DIRECTIONS) for sq in range(64)]
+
+# a plain library logger : it adds no handler and prints nothing unless the application configures logging,
+# so importing the engine has no side effects
+log = logging.getLogger(__name__)
+
+# trace calls on the move generation path are guarded so a disabled trace does not even build its message.
+# Read once at import : enable DEBUG for chess_engine.engine before importing it to trace move generation.
+_trace = log.isEnabledFor(logging.DEBUG)
 
 
 class GameState:
+    king_directions = KING_DIRECTIONS
+    knight_offsets = KNIGHT_OFFSETS
+
     def __init__(self):
         self.board = [
             ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
@@ -39,6 +84,8 @@ class GameState:
             'Q': self.get_queen_moves,
             'K': self.get_king_moves
         }
+        self.legal_generator_map = dict(self.move_generator_map, K=self.get_legal_king_moves)
+        self.pins = {}  # pinned square -> direction from king, only populated while generating valid moves
 
         self.white_king_loc = (7, 4)
         self.black_king_loc = (0, 4)
@@ -47,6 +94,57 @@ class GameState:
         self.stale_mate = False
 
         self.enpassant_possible = ()  # coord where enpassant capture is possible
+        self.enpassant_logs = []  # enpassant_possible before each logged move
+
+        self.castling_rights = CASTLE_ALL  # bitmask of the CASTLE_* rights of chess_engine.moves
+        self.castling_logs = []  # castling_rights before each logged move
+
+        # 64-bit position key, kept up to date by make_move / undo_last_move
+        self.zobrist_key = compute_hash(self.board, self.white_move, self.enpassant_possible, self.castling_rights)
+        # material plus piece-square total, positive for white, kept up to date like zobrist_key
+        self.eval_score = compute_score(self.board)
+
+        # position move_logs starts from, see from_fen
+        self.start_fen = INITIAL_FEN
+        self.start_halfmove_clock = 0
+        self.start_fullmove_number = 1
+
+    @classmethod
+    def from_fen(cls, fen):
+        """ :raises ValueError: on a malformed FEN """
+        game_state = cls()
+        game_state.load_fen(fen)
+        return game_state
+
+    def load_fen(self, fen):
+        """ replaces the position by `fen`, the move logs are cleared """
+        position = parse_fen(fen)
+        self.board = [list(row) for row in position.board]
+        self.white_move = position.white_move
+        self.move_logs = []
+
+        for r, row in enumerate(self.board):
+            for c, piece in enumerate(row):
+                if piece == 'wK':
+                    self.white_king_loc = (r, c)
+                elif piece == 'bK':
+                    self.black_king_loc = (r, c)
+
+        self.check_mate = False
+        self.stale_mate = False
+        self.enpassant_possible = position.enpassant
+        self.enpassant_logs = []
+        self.castling_rights = position.castling
+        self.castling_logs = []
+        self.zobrist_key = compute_hash(self.board, self.white_move, self.enpassant_possible, self.castling_rights)
+        self.eval_score = compute_score(self.board)
+
+        self.start_fen = fen
+        self.start_halfmove_clock = position.halfmove_clock
+        self.start_fullmove_number = position.fullmove_number
+
+    def to_fen(self):
+        return position_to_fen(self)
 
     def is_empty(self, r, c):
         return self.board[r][c] == '--'
@@ -55,233 +153,506 @@ class GameState:
         return "White" if self.white_move else "Black"
 
     def make_move(self, move):
-        self.board[move.start_row][move.start_col] = '--'
-        self.board[move.end_row][move.end_col] = move.piece_moved
+        # squares and flags are decoded from the packed move once
+        packed = move.packed
+        start_sq = packed & SQUARE_MASK
+        end_sq = (packed >> 6) & SQUARE_MASK
+        flags = packed >> 12
+        start_row, start_col = start_sq >> 3, start_sq & 7
+        end_row, end_col = end_sq >> 3, end_sq & 7
+        piece_moved = move.piece_moved
+        piece_captured = move.piece_captured
+        board = self.board
+
+        key = self.zobrist_key ^ SIDE_KEY ^ PIECE_KEYS[piece_moved][start_sq]
+        score = self.eval_score - SQUARE_SCORES[piece_moved][start_sq]
+        if piece_captured != '--' and flags != FLAG_ENPASSANT:
+            key ^= PIECE_KEYS[piece_captured][end_sq]
+            score -= SQUARE_SCORES[piece_captured][end_sq]
+
+        board[start_row][start_col] = '--'
+        board[end_row][end_col] = piece_moved
 
         self.move_logs.append(move)
+        self.enpassant_logs.append(self.enpassant_possible)
+        self.castling_logs.append(self.castling_rights)
         self.white_move = not self.white_move
 
-        if move.piece_moved == 'wK':
-            self.white_king_loc = (move.end_row, move.end_col)
-        elif move.piece_moved == 'bK':
-            self.black_king_loc = (move.end_row, move.end_col)
+        if piece_moved == 'wK':
+            self.white_king_loc = (end_row, end_col)
+        elif piece_moved == 'bK':
+            self.black_king_loc = (end_row, end_col)
 
         # Pawn promotion
-        if move.is_pawn_promotion:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + 'Q'
+        if flags & 8:
+            board[end_row][end_col] = piece_moved[0] + PROMOTION_PIECES[flags & 3]
+        key ^= PIECE_KEYS[board[end_row][end_col]][end_sq]
+        score += SQUARE_SCORES[board[end_row][end_col]][end_sq]
+
+        # Castling, the rook jumps over the king
+        if flags == FLAG_CASTLE:
+            rook_from, rook_to = (7, 5) if end_col == 6 else (0, 3)
+            rook = board[end_row][rook_from]
+            board[end_row][rook_from] = '--'
+            board[end_row][rook_to] = rook
+            key ^= PIECE_KEYS[rook][end_row * 8 + rook_from] ^ PIECE_KEYS[rook][end_row * 8 + rook_to]
+            score += SQUARE_SCORES[rook][end_row * 8 + rook_to] - SQUARE_SCORES[rook][end_row * 8 + rook_from]
+
+        rights = self.castling_rights & CASTLING_MASKS[start_sq] & CASTLING_MASKS[end_sq]
+        if rights != self.castling_rights:
+            key ^= CASTLING_KEYS[self.castling_rights] ^ CASTLING_KEYS[rights]
+            self.castling_rights = rights
 
         # EnPassant Move
-        if move.is_enpassant_move:
-            clog("Move is EnPassednt Move", 'enpassant')
-            self.board[move.start_row][move.end_col] = '--'
+        if flags == FLAG_ENPASSANT:
+            if _trace:
+                log.debug("Move is EnPassednt Move")
+            board[start_row][end_col] = '--'
+            key ^= PIECE_KEYS[piece_captured][start_row * 8 + end_col]
+            score -= SQUARE_SCORES[piece_captured][start_row * 8 + end_col]
 
         # update enPassant var
-        if move.piece_moved[1] == 'P' and abs(move.start_row - move.end_row) == 2:
-            glog(f"Updating enpassant var to {(move.start_row + move.end_row) // 2, move.start_col}")
-            self.enpassant_possible = ((move.start_row + move.end_row) // 2, move.start_col)
+        if self.enpassant_possible:
+            key ^= ENPASSANT_KEYS[self.enpassant_possible[1]]
+        if piece_moved[1] == 'P' and abs(start_row - end_row) == 2:
+            if _trace:
+                log.debug(f"Updating enpassant var to {(start_row + end_row) // 2, start_col}")
+            self.enpassant_possible = ((start_row + end_row) // 2, start_col)
+            key ^= ENPASSANT_KEYS[start_col]
         else:
-            glog("Resetting enpassant")
+            if _trace:
+                log.debug("Resetting enpassant")
             self.enpassant_possible = ()
 
+        self.zobrist_key = key
+        self.eval_score = score
+
     def undo_last_move(self):
         if self.move_logs:
             last_move = self.move_logs.pop()
-            self.board[last_move.start_row][last_move.start_col] = last_move.piece_moved
-            self.board[last_move.end_row][last_move.end_col] = last_move.piece_captured
+            packed = last_move.packed
+            start_sq = packed & SQUARE_MASK
+            end_sq = (packed >> 6) & SQUARE_MASK
+            flags = packed >> 12
+            start_row, start_col = start_sq >> 3, start_sq & 7
+            end_row, end_col = end_sq >> 3, end_sq & 7
+            piece_moved = last_move.piece_moved
+            piece_captured = last_move.piece_captured
+            board = self.board
+
+            key = self.zobrist_key ^ SIDE_KEY ^ PIECE_KEYS[board[end_row][end_col]][end_sq]
+            key ^= PIECE_KEYS[piece_moved][start_sq]
+            score = self.eval_score - SQUARE_SCORES[board[end_row][end_col]][end_sq]
+            score += SQUARE_SCORES[piece_moved][start_sq]
+
+            board[start_row][start_col] = piece_moved
+            board[end_row][end_col] = piece_captured
             self.white_move = not self.white_move
 
-            if last_move.piece_moved == 'wK':
-                self.white_king_loc = (last_move.start_row, last_move.start_col)
-            elif last_move.piece_moved == 'bK':
-                self.black_king_loc = (last_move.start_row, last_move.start_col)
+            if piece_moved == 'wK':
+                self.white_king_loc = (start_row, start_col)
+            elif piece_moved == 'bK':
+                self.black_king_loc = (start_row, start_col)
 
             # undo enPassant move
-            if last_move.is_enpassant_move:
-                self.board[last_move.end_row][last_move.end_col] = '--'
-                self.board[last_move.start_row][last_move.end_col] = last_move.piece_captured
-                self.enpassant_possible = (last_move.end_row, last_move.end_col)
-            # undo a 2 square pawn
-            if last_move.piece_moved[1] == 'P' and abs(last_move.start_row - last_move.end_row) == 2:
-                self.enpassant_possible = ()
-
+            if flags == FLAG_ENPASSANT:
+                board[end_row][end_col] = '--'
+                board[start_row][end_col] = piece_captured
+                key ^= PIECE_KEYS[piece_captured][start_row * 8 + end_col]
+                score += SQUARE_SCORES[piece_captured][start_row * 8 + end_col]
+            elif piece_captured != '--':
+                key ^= PIECE_KEYS[piece_captured][end_sq]
+                score += SQUARE_SCORES[piece_captured][end_sq]
+
+            # undo castling, the rook goes back to its corner
+            if flags == FLAG_CASTLE:
+                rook_from, rook_to = (7, 5) if end_col == 6 else (0, 3)
+                rook = board[end_row][rook_to]
+                board[end_row][rook_to] = '--'
+                board[end_row][rook_from] = rook
+                key ^= PIECE_KEYS[rook][end_row * 8 + rook_from] ^ PIECE_KEYS[rook][end_row * 8 + rook_to]
+                score += SQUARE_SCORES[rook][end_row * 8 + rook_from] - SQUARE_SCORES[rook][end_row * 8 + rook_to]
+
+            # restore the en passant square and castling rights the move was played from
+            if self.enpassant_possible:
+                key ^= ENPASSANT_KEYS[self.enpassant_possible[1]]
+            self.enpassant_possible = self.enpassant_logs.pop()
+            if self.enpassant_possible:
+                key ^= ENPASSANT_KEYS[self.enpassant_possible[1]]
+
+            rights = self.castling_logs.pop()
+            key ^= CASTLING_KEYS[self.castling_rights] ^ CASTLING_KEYS[rights]
+            self.castling_rights = rights
+
+            self.zobrist_key = key
+            self.eval_score = score
             return True
 
     def get_valid_moves(self):
-        """ considering checks """
-        tempEnPassantPossible = self.enpassant_possible
-
-        ylog(f"Getting valid moves for {self.get_player_clr()}")
-        moves = self.get_possible_moves()
-
-        ylog(f"{len(moves)} possible moves")
-
-        for i in range(len(moves) - 1, -1, -1):
-            self.make_move(moves[i])
-
-            self.white_move = not self.white_move
-            if self.in_check():
-                ylog(f"Move : {moves[i]} leaving king in check, removing this move from valid moves...")
-                moves.remove(moves[i])
-
-            self.white_move = not self.white_move
-            self.undo_last_move()
+        """ considering checks and pins, without playing the moves on the board """
+        if _trace:
+            log.debug(f"Getting valid moves for {self.get_player_clr()}")
+        in_check, pins, checks = self.check_for_pins_and_checks()
+        board = self.board
+        moves = [Move.from_packed(move, board) for move in self._generate_valid_moves(STAGE_ALL, pins, checks, [])]
 
         if len(moves) == 0:
-            ylog("NO VALID MOVES LEFT, Checking game state...")
-            if self.in_check():
-                rlog("CHECK MATE!")
+            if _trace:
+                log.debug("NO VALID MOVES LEFT, Checking game state...")
+            if in_check:
+                log.info("CHECK MATE!")
                 self.check_mate = True
             else:
-                rlog("STALE MATE!")
+                log.info("STALE MATE!")
                 self.stale_mate = True
         else:
             self.stale_mate = self.check_mate = False
 
-        self.enpassant_possible = tempEnPassantPossible
-        ylog(f"{len(moves)} valid moves")
+        if _trace:
+            log.debug(f"{len(moves)} valid moves")
         return moves
 
+    def generate_moves(self, moves, stage=STAGE_ALL):
+        """
+        Appends the valid moves of `stage` to `moves` (a list or a MoveStack buffer) as packed integers,
+        see chess_engine.moves. No Move object is created. check_mate / stale_mate are not updated.
+        """
+        _, pins, checks = self.check_for_pins_and_checks()
+        return self._generate_valid_moves(stage, pins, checks, moves)
+
+    def make_packed_move(self, packed):
+        """ plays a packed move of the current position """
+        self.make_move(Move.from_packed(packed, self.board))
+
+    def is_legal_move(self, packed):
+        """
+        Whether the packed move is valid in this position, e.g. a hash move whose entry may come from another
+        position. Only the moves of the piece on its start square are generated.
+        """
+        r, c = divmod(packed & SQUARE_MASK, 8)
+        if self.board[r][c][0] != ('w' if self.white_move else 'b'):
+            return False
+        _, pins, checks = self.check_for_pins_and_checks()
+        return packed in self._generate_valid_moves(STAGE_ALL, pins, checks, [], (r, c))
+
+    def iter_moves(self, stage=STAGE_ALL):
+        """
+        Lazily yields valid moves, captures and promotions (STAGE_CAPTURES) before quiet moves (STAGE_QUIETS).
+        A stage is only generated once the consumer asks for its first move, so a consumer that stops early
+        never pays for the rest. The position must be the same whenever the generator is resumed, i.e. undo
+        any move played in between. Unlike get_valid_moves, check_mate / stale_mate are not updated.
+        """
+        _, pins, checks = self.check_for_pins_and_checks()
+        for current_stage in (STAGE_CAPTURES, STAGE_QUIETS):
+            if stage & current_stage:
+                for move in self._generate_valid_moves(current_stage, pins, checks, []):
+                    yield Move.from_packed(move, self.board)
+
+    def _generate_valid_moves(self, stage, pins, checks, moves, square=None):
+        """ :param square: (row, col) to generate the moves of that piece only, all pieces by default """
+        self.pins = pins
+        king_r, king_c = self.white_king_loc if self.white_move else self.black_king_loc
+        king_sq = king_r * 8 + king_c
+        king_moves = square is None or square == (king_r, king_c)
+
+        if len(checks) > 1:
+            # double check, only the king can move
+            if king_moves:
+                self.get_legal_king_moves(king_r, king_c, moves, stage)
+        elif not checks and not (self.enpassant_possible and stage & STAGE_CAPTURES):
+            self._generate_moves(self.legal_generator_map, stage, moves, square)
+        else:
+            candidates = self._generate_moves(self.legal_generator_map, stage, [], square)
+            if self.enpassant_possible:
+                candidates = [
+                    move for move in candidates
+                    if move >> 12 != FLAG_ENPASSANT or not self._enpassant_exposes_king(move)
+                ]
+            if checks:
+                check_r, check_c, dr, dc = checks[0]
+                check_sq = check_r * 8 + check_c
+                if self.board[check_r][check_c][1] == 'N':
+                    valid_squares = {check_sq}
+                else:
+                    # squares between king and checker, checker included
+                    valid_squares = set()
+                    for _, _, square in RAYS[king_sq][KING_DIRECTIONS.index((dr, dc))]:
+                        valid_squares.add(square)
+                        if square == check_sq:
+                            break
+
+                candidates = [
+                    move for move in candidates if move & SQUARE_MASK == king_sq
+                    or (move >> 6) & SQUARE_MASK in valid_squares
+                    # en passant removing the checking pawn, which stands beside the moving one
+                    or (move >> 12 == FLAG_ENPASSANT and (move & 0x38) | ((move >> 6) & 7) == check_sq)
+                ]
+            moves.extend(candidates)
+
+        if not checks and stage & STAGE_QUIETS and self.castling_rights and king_moves:
+            self.get_castle_moves(king_r, king_c, moves)
+
+        self.pins = {}
+        return moves
+
+    def check_for_pins_and_checks(self):
+        """
+        Scans outward from the king of the side to move, once.
+        :return: (in_check, pins, checks) where pins maps a pinned square to the direction king -> piece
+                 and checks holds (row, col, dr, dc) of every checking piece.
+        """
+        pins = {}
+        checks = []
+        if self.white_move:
+            ally_clr, enemy_clr = 'w', 'b'
+            king_r, king_c = self.white_king_loc
+        else:
+            ally_clr, enemy_clr = 'b', 'w'
+            king_r, king_c = self.black_king_loc
+
+        board = self.board
+        rays = RAYS[king_r * 8 + king_c]
+        for j, (dr, dc) in enumerate(KING_DIRECTIONS):
+            possible_pin = ()
+            for i, (end_row, end_col, _) in enumerate(rays[j]):
+                end_piece = board[end_row][end_col]
+                if end_piece[0] == ally_clr:
+                    if possible_pin:
+                        # second allied piece, no pin along this direction
+                        break
+                    possible_pin = (end_row, end_col)
+                elif end_piece[0] == enemy_clr:
+                    kind = end_piece[1]
+                    # directions 0-3 are orthogonal, 4-7 diagonal, see KING_DIRECTIONS
+                    if (j < 4 and kind == 'R') or (j >= 4 and kind == 'B') or kind == 'Q' or (
+                            i == 0 and kind == 'K') or (
+                            i == 0 and kind == 'P' and j >= 4 and dr == (1 if enemy_clr == 'w' else -1)):
+                        if possible_pin:
+                            pins[possible_pin] = (dr, dc)
+                        else:
+                            checks.append((end_row, end_col, dr, dc))
+                    break
+
+        enemy_knight = enemy_clr + 'N'
+        for end_row, end_col, _ in KNIGHT_TARGETS[king_r * 8 + king_c]:
+            if board[end_row][end_col] == enemy_knight:
+                checks.append((end_row, end_col, end_row - king_r, end_col - king_c))
+
+        return len(checks) > 0, pins, checks
+
     def in_check(self):
         if self.white_move:
-            return self.square_under_attack(self.white_king_loc[0], self.white_king_loc[1])
+            return self.is_square_attacked(self.white_king_loc[0], self.white_king_loc[1], 'b')
         else:
-            return self.square_under_attack(self.black_king_loc[0], self.black_king_loc[1])
+            return self.is_square_attacked(self.black_king_loc[0], self.black_king_loc[1], 'w')
 
     def square_under_attack(self, r, c):
-        self.white_move = not self.white_move
-        ylog("Getting Opponent's moves...")
-        opponent_moves = self.get_possible_moves()
-        ylog(f"Opponent moves are : {len(opponent_moves)}")
+        return self.is_square_attacked(r, c, 'b' if self.white_move else 'w')
 
-        self.white_move = not self.white_move
-        for move in opponent_moves:
-            if move.end_row == r and move.end_col == c:
-                clog(f"Move: {move} leaving square in check, returning true.")
+    def is_square_attacked(self, r, c, by_colour):
+        """ looks outward from (r, c) for pieces of `by_colour` ('w' or 'b') attacking it """
+        board = self.board
+        sq = r * 8 + c
+
+        knight = by_colour + 'N'
+        for end_row, end_col, _ in KNIGHT_TARGETS[sq]:
+            if board[end_row][end_col] == knight:
                 return True
-        rlog("Opponent can not attack king, returning false")
+
+        # an attacking pawn sits one row "behind" the square from its own point of view
+        pawn_dr = 1 if by_colour == 'w' else -1
+        rays = RAYS[sq]
+        for j, (dr, dc) in enumerate(KING_DIRECTIONS):
+            for i, (end_row, end_col, _) in enumerate(rays[j]):
+                end_piece = board[end_row][end_col]
+                if end_piece == '--':
+                    continue
+                if end_piece[0] == by_colour:
+                    kind = end_piece[1]
+                    if kind == 'Q' or (j < 4 and kind == 'R') or (j >= 4 and kind == 'B') or (
+                            i == 0 and (kind == 'K' or (kind == 'P' and j >= 4 and dr == pawn_dr))):
+                        return True
+                break
+
         return False
 
-    def get_possible_moves(self):
+    def perft(self, depth):
+        """ number of leaf nodes `depth` plies below this position """
+        return perft(self, depth)
+
+    def divide(self, depth):
+        """ perft split by root move, a list of (move, nodes) """
+        return divide(self, depth)
+
+    def get_possible_moves(self, stage=STAGE_ALL):
         """ without considering checks """
-        moves = []
+        board = self.board
+        return [Move.from_packed(move, board) for move in self._generate_moves(self.move_generator_map, stage, [])]
+
+    def _generate_moves(self, generator_map, stage, moves, square=None):
+        if square is not None:
+            r, c = square
+            generator_map[self.board[r][c][1]](r, c, moves, stage)
+            return moves
+
         for r in range(len(self.board)):
             for c in range(len(self.board[r])):
                 turn = self.board[r][c][0]
                 if (turn == 'w' and self.white_move) or (turn == 'b' and not self.white_move):
                     piece = self.board[r][c][1]
-                    self.move_generator_map[piece](r, c, moves)
+                    generator_map[piece](r, c, moves, stage)
 
         return moves
 
-    def get_pawn_moves(self, r, c, moves):
-        if self.white_move:
-            if self.board[r - 1][c] == '--':
-                moves.append(Move((r, c), (r - 1, c), self.board))
-                if r == 6 and self.board[r - 2][c] == '--':
-                    moves.append(Move((r, c), (r - 2, c), self.board))
-
-            if c - 1 >= 0:
-                if self.board[r - 1][c - 1][0] == 'b':
-                    moves.append(Move((r, c), (r - 1, c - 1), self.board))
-                elif (r - 1, c - 1) == self.enpassant_possible:
-                    moves.append(Move((r, c), (r - 1, c - 1), self.board, is_enpassant=True))
-
-            if c + 1 <= 7:
-                if self.board[r - 1][c + 1][0] == 'b':
-                    moves.append(Move((r, c), (r - 1, c + 1), self.board))
-                elif (r - 1, c + 1) == self.enpassant_possible:
-                    moves.append(Move((r, c), (r - 1, c + 1), self.board, is_enpassant=True))
+    @staticmethod
+    def _pin_allows(pin_direction, dr, dc):
+        return pin_direction is None or pin_direction == (dr, dc) or pin_direction == (-dr, -dc)
 
-        else:
-            if self.board[r + 1][c] == '--':
-                moves.append(Move((r, c), (r + 1, c), self.board))
-                if r == 1 and self.board[r + 2][c] == "--":
-                    moves.append(Move((r, c), (r + 2, c), self.board))
-
-            if c - 1 >= 0:
-                if self.board[r + 1][c - 1][0] == 'w':
-                    moves.append(Move((r, c), (r + 1, c - 1), self.board))
-                elif (r + 1, c - 1) == self.enpassant_possible:
-                    moves.append(Move((r, c), (r + 1, c - 1), self.board, is_enpassant=True))
-
-                if c + 1 <= 7:
-                    if self.board[r + 1][c + 1][0] == 'w':
-                        moves.append(Move((r, c), (r + 1, c + 1), self.board))
-                    elif (r + 1, c + 1) == self.enpassant_possible:
-                        moves.append(Move((r, c), (r + 1, c + 1), self.board, is_enpassant=True))
-
-    def get_knight_moves(self, r, c, moves):
-        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-        enemy_color = 'b' if self.white_move else 'w'
+    def _enpassant_exposes_king(self, move):
+        """ en passant removes two pieces from one row, the only case pins can not describe """
+        r, c = divmod(move & SQUARE_MASK, 8)
+        end_row, end_col = divmod((move >> 6) & SQUARE_MASK, 8)
+        ally_clr = self.board[r][c][0]
+        king_r, king_c = self.white_king_loc if ally_clr == 'w' else self.black_king_loc
+        captured = self.board[r][end_col]
 
-        for m in knightMoves:
-            end_row = r + m[0]
-            end_col = c + m[1]
-
-            if 0 <= end_row < 8 and 0 < end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] == enemy_color or end_piece == '--':
-                    moves.append(Move((r, c), (end_row, end_col), self.board))
-
-    def get_bishop_moves(self, r, c, moves):
-        directions = ((-1, -1), (-1, 1), (1, -1), (1, 1))
-        enemy_color = "b" if self.white_move else "w"
-
-        for d in directions:
-            for i in range(1, 8):
-                end_row = r + d[0] * i
-                end_col = c + d[1] * i
-
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece == '--':
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-                    elif end_piece[0] == enemy_color:
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-                        break
+        self.board[r][c] = '--'
+        self.board[r][end_col] = '--'
+        self.board[end_row][end_col] = ally_clr + 'P'
+        exposed = self.is_square_attacked(king_r, king_c, 'b' if ally_clr == 'w' else 'w')
+        self.board[end_row][end_col] = '--'
+        self.board[r][end_col] = captured
+        self.board[r][c] = ally_clr + 'P'
+
+        return exposed
+
+    # The generators below append packed moves (start square | end square << 6 | flags << 12) to `moves`.
+
+    def get_pawn_moves(self, r, c, moves, stage=STAGE_ALL):
+        pin_direction = self.pins.get((r, c))
+        if self.white_move:
+            dr, start_row, enemy_clr = -1, 6, 'b'
+        else:
+            dr, start_row, enemy_clr = 1, 1, 'w'
+
+        start_sq = r * 8 + c
+        end_row = r + dr
+        # pushes to the last row are promotions and belong to the captures stage
+        promotion = end_row in (0, 7)
+        push_stage = STAGE_CAPTURES if promotion else STAGE_QUIETS
+        if stage & push_stage and self.board[end_row][c] == '--' and self._pin_allows(pin_direction, dr, 0):
+            if promotion:
+                moves.extend(start_sq | (end_row * 8 + c) << 6 | flags for flags in PROMOTIONS)
+            else:
+                moves.append(start_sq | (end_row * 8 + c) << 6)
+                if r == start_row and self.board[r + 2 * dr][c] == '--':
+                    moves.append(start_sq | ((r + 2 * dr) * 8 + c) << 6)
+
+        if not stage & STAGE_CAPTURES:
+            return
+
+        for dc in (-1, 1):
+            end_col = c + dc
+            if 0 <= end_col < 8 and self._pin_allows(pin_direction, dr, dc):
+                if self.board[end_row][end_col][0] == enemy_clr:
+                    if promotion:
+                        moves.extend(start_sq | (end_row * 8 + end_col) << 6 | flags for flags in PROMOTIONS)
                     else:
-                        break
-                else:
-                    break
+                        moves.append(start_sq | (end_row * 8 + end_col) << 6)
+                elif (end_row, end_col) == self.enpassant_possible:
+                    moves.append(start_sq | (end_row * 8 + end_col) << 6 | ENPASSANT_BITS)
 
-    def get_king_moves(self, r, c, moves):
-        king_moves = (
-            (-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1),
-            (1, -1), (1, 0), (1, 1)
-        )
-        ally_color = 'w' if self.white_move else 'b'
+    def get_knight_moves(self, r, c, moves, stage=STAGE_ALL):
+        if (r, c) in self.pins:
+            # a pinned knight can never stay on the pin line
+            return
 
-        for i in range(8):
-            end_row = r + king_moves[i][0]
-            end_col = c + king_moves[i][1]
+        enemy_color = 'b' if self.white_move else 'w'
+        board = self.board
+        start_sq = r * 8 + c
 
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally_color:
-                    moves.append(Move((r, c), (end_row, end_col), self.board))
+        for end_row, end_col, end_sq in KNIGHT_TARGETS[start_sq]:
+            end_piece = board[end_row][end_col]
+            if (end_piece == '--' and stage & STAGE_QUIETS) or (
+                    end_piece[0] == enemy_color and stage & STAGE_CAPTURES):
+                moves.append(start_sq | end_sq << 6)
 
-    def get_queen_moves(self, r, c, moves):
-        self.get_rook_moves(r, c, moves)
-        self.get_bishop_moves(r, c, moves)
+    def get_bishop_moves(self, r, c, moves, stage=STAGE_ALL):
+        self._get_sliding_moves(r, c, moves, stage, BISHOP_DIRECTIONS)
 
-    def get_rook_moves(self, r, c, moves):
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1))
-        enemy_clr = "b" if self.white_move else "w"
+    def get_rook_moves(self, r, c, moves, stage=STAGE_ALL):
+        self._get_sliding_moves(r, c, moves, stage, ROOK_DIRECTIONS)
 
-        for d in directions:
-            for i in range(1, 8):
-                end_row = r + d[0] * i
-                end_col = c + d[1] * i
-
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece == '--':
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-                    elif end_piece[0] == enemy_clr:
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-                        break
-                    else:
-                        # firendly piece
-                        break
+    def get_queen_moves(self, r, c, moves, stage=STAGE_ALL):
+        self.get_rook_moves(r, c, moves, stage)
+        self.get_bishop_moves(r, c, moves, stage)
+
+    def _get_sliding_moves(self, r, c, moves, stage, directions):
+        """ :param directions: indexes into KING_DIRECTIONS """
+        pin_direction = self.pins.get((r, c))
+        enemy_clr = "b" if self.white_move else "w"
+        board = self.board
+        start_sq = r * 8 + c
+        rays = RAYS[start_sq]
+        quiets = stage & STAGE_QUIETS
+
+        for j in directions:
+            if pin_direction is not None and not self._pin_allows(pin_direction, *KING_DIRECTIONS[j]):
+                continue
+
+            for end_row, end_col, end_sq in rays[j]:
+                end_piece = board[end_row][end_col]
+                if end_piece == '--':
+                    if quiets:
+                        moves.append(start_sq | end_sq << 6)
+                elif end_piece[0] == enemy_clr:
+                    if stage & STAGE_CAPTURES:
+                        moves.append(start_sq | end_sq << 6)
+                    break
                 else:
+                    # friendly piece
                     break
+
+    def get_king_moves(self, r, c, moves, stage=STAGE_ALL):
+        ally_color = 'w' if self.white_move else 'b'
+        board = self.board
+        start_sq = r * 8 + c
+
+        for end_row, end_col, end_sq in KING_TARGETS[start_sq]:
+            end_piece = board[end_row][end_col]
+            if end_piece[0] != ally_color and stage & (STAGE_QUIETS if end_piece == '--' else STAGE_CAPTURES):
+                moves.append(start_sq | end_sq << 6)
+
+    def get_legal_king_moves(self, r, c, moves, stage=STAGE_ALL):
+        """ king moves to squares not attacked once the king has left (r, c) """
+        ally_color = 'w' if self.white_move else 'b'
+        enemy_color = 'b' if self.white_move else 'w'
+        start_sq = r * 8 + c
+
+        # lift the king so sliders attacking through its current square are seen
+        board = self.board
+        king = board[r][c]
+        board[r][c] = '--'
+        for end_row, end_col, end_sq in KING_TARGETS[start_sq]:
+            end_piece = board[end_row][end_col]
+            if end_piece[0] != ally_color and stage & (STAGE_QUIETS if end_piece == '--' else STAGE_CAPTURES) \
+                    and not self.is_square_attacked(end_row, end_col, enemy_color):
+                moves.append(start_sq | end_sq << 6)
+        board[r][c] = king
+
+    def get_castle_moves(self, r, c, moves):
+        """ castling of the king on (r, c), which must not be in check """
+        if self.white_move:
+            king_side, queen_side, enemy_color = CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN, 'b'
+        else:
+            king_side, queen_side, enemy_color = CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN, 'w'
+        row = self.board[r]
+        start_sq = r * 8 + c
+
+        # the king may not pass through or land on an attacked square
+        if self.castling_rights & king_side and row[5] == '--' and row[6] == '--' \
+                and not self.is_square_attacked(r, 5, enemy_color) and not self.is_square_attacked(r, 6, enemy_color):
+            moves.append(start_sq | (r * 8 + 6) << 6 | CASTLE_BITS)
+        if self.castling_rights & queen_side and row[1] == '--' and row[2] == '--' and row[3] == '--' \
+                and not self.is_square_attacked(r, 3, enemy_color) and not self.is_square_attacked(r, 2, enemy_color):
+            moves.append(start_sq | (r * 8 + 2) << 6 | CASTLE_BITS)
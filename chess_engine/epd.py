@@ -0,0 +1,102 @@
+import gzip
+import os
+import re
+from collections import namedtuple
+
+from .engine import GameState
+
+__all__ = [
+    'EPDRecord',
+    'parse_epd',
+    'read_epd'
+]
+
+# an operand is a quoted string or a run of anything but blanks and semicolons, ';' closes an operation
+_TOKEN = re.compile(r'"([^"]*)"|(;)|([^\s;]+)')
+
+
+class EPDRecord(namedtuple('EPDRecord', ['fen', 'operations'])):
+    """
+    One position of an EPD (or plain FEN) file : ``fen`` is a full FEN, move counters included, ``operations``
+    maps every opcode to its operands, e.g. {'bm': ['Nf3'], 'id': ['WAC.001']}.
+    """
+    __slots__ = ()
+
+    @property
+    def id(self):
+        return self.operations.get('id', [None])[0]
+
+    @property
+    def best_moves(self):
+        return self.operations.get('bm', [])
+
+    @property
+    def avoid_moves(self):
+        return self.operations.get('am', [])
+
+    def game_state(self, state_cls=GameState):
+        return state_cls.from_fen(self.fen)
+
+
+def parse_epd(line):
+    """
+    Parses one EPD line, or a FEN line optionally followed by EPD operations.
+    The move counters come from the FEN fields, else from the hmvc / fmvn opcodes, else default to 0 and 1.
+
+    :raises ValueError: on a line with fewer than the 4 position fields, or an hmvc / fmvn without a number
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"EPD needs at least 4 fields : {line!r}")
+
+    position = fields[:4]
+    rest = fields[4] if len(fields) == 5 else ''
+
+    counters = rest.split(None, 2)
+    if len(counters) >= 2 and counters[0].isdigit() and counters[1].isdigit():
+        # FEN move counters
+        position += counters[:2]
+        rest = counters[2] if len(counters) == 3 else ''
+    operations = {}
+    opcode = None
+    for quoted, end, word in _TOKEN.findall(rest):
+        if end:
+            opcode = None
+        elif opcode is None:
+            opcode = word
+            operations[opcode] = []
+        else:
+            operations[opcode].append(word or quoted)
+
+    if len(position) == 4:
+        for opcode, default in (('hmvc', '0'), ('fmvn', '1')):
+            operands = operations.get(opcode, [default])
+            if not operands or not operands[0].isdigit():
+                raise ValueError(f"EPD {opcode} needs a move number : {line!r}")
+            position.append(operands[0])
+
+    return EPDRecord(' '.join(position), operations)
+
+
+def _open(source):
+    if hasattr(source, 'read'):
+        return source
+    if os.fspath(source).endswith('.gz'):
+        return gzip.open(source, 'rt', encoding='utf-8')
+    return open(source, 'r', encoding='utf-8')
+
+
+def read_epd(source):
+    """
+    Yields an EPDRecord for every position of `source`, a path (gzip compressed when it ends with .gz) or an
+    open text file. The file is read line by line, blank lines and lines starting with '#' are skipped.
+    """
+    stream = _open(source)
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield parse_epd(line)
+    finally:
+        if stream is not source:
+            stream.close()
@@ -0,0 +1,112 @@
+__all__ = [
+    'PIECE_VALUES',
+    'PIECE_SQUARE_TABLES',
+    'piece_square_value',
+    'SQUARE_SCORES',
+    'compute_score',
+    'evaluate'
+]
+
+PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+
+# Piece-square tables from white's point of view, laid out like GameState.board (row 0 is the 8th rank).
+# Black pieces read them with the row mirrored.
+PIECE_SQUARE_TABLES = {
+    'P': [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    'N': [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    'B': [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    'R': [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    'Q': [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    'K': [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+
+
+def piece_square_value(piece, r, c):
+    """ material plus placement of `piece` ('wN', 'bQ' ...) on (r, c), positive for white """
+    kind = piece[1]
+    if piece[0] == 'w':
+        return PIECE_VALUES[kind] + PIECE_SQUARE_TABLES[kind][r * 8 + c]
+    return -(PIECE_VALUES[kind] + PIECE_SQUARE_TABLES[kind][(7 - r) * 8 + c])
+
+
+# SQUARE_SCORES['wN'][row * 8 + col], piece_square_value of every piece on every square
+SQUARE_SCORES = {
+    colour + kind: [piece_square_value(colour + kind, r, c) for r in range(8) for c in range(8)]
+    for colour in 'wb' for kind in PIECE_VALUES
+}
+
+
+def compute_score(board):
+    """
+    Material plus placement of the whole board, positive for white. Game states keep it as the running total
+    eval_score, this is for initialisation and for verifying that total.
+    """
+    score = 0
+    for r in range(8):
+        row = board[r]
+        for c in range(8):
+            piece = row[c]
+            if piece != '--':
+                score += SQUARE_SCORES[piece][r * 8 + c]
+
+    return score
+
+
+def evaluate(game_state):
+    """ static evaluation in centipawns from the side to move's point of view, O(1) from game_state.eval_score """
+    score = game_state.eval_score
+    return score if game_state.white_move else -score
@@ -0,0 +1,136 @@
+from collections import namedtuple
+
+from .moves import CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN, CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN
+
+__all__ = [
+    'INITIAL_FEN',
+    'FenPosition',
+    'parse_fen',
+    'format_fen',
+    'position_to_fen'
+]
+
+INITIAL_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# board is 8 rows of 8 piece codes ('wP', '--' ...) laid out like GameState.board, row 0 is the 8th rank.
+# castling is a bitmask of the CASTLE_* rights of chess_engine.moves, enpassant the (row, col) a pawn can capture onto,
+# or ().
+FenPosition = namedtuple('FenPosition', [
+    'board', 'white_move', 'castling', 'enpassant', 'halfmove_clock', 'fullmove_number'
+])
+
+_FEN_TO_PIECE = {
+    **{letter: 'b' + letter.upper() for letter in 'pnbrqk'},
+    **{letter: 'w' + letter for letter in 'PNBRQK'},
+}
+_PIECE_TO_FEN = {piece: letter for letter, piece in _FEN_TO_PIECE.items()}
+
+# FEN letter -> (right, king square, rook square) as (row, col)
+_CASTLING = {
+    'K': (CASTLE_WHITE_KING, (7, 4), (7, 7)),
+    'Q': (CASTLE_WHITE_QUEEN, (7, 4), (7, 0)),
+    'k': (CASTLE_BLACK_KING, (0, 4), (0, 7)),
+    'q': (CASTLE_BLACK_QUEEN, (0, 4), (0, 0)),
+}
+
+
+def parse_fen(fen):
+    """
+    Parses a FEN string. The move counters may be left out, as in EPD, they then default to 0 and 1.
+
+    :raises ValueError: on a malformed FEN
+    """
+    fields = fen.split()
+    if len(fields) not in (4, 6):
+        raise ValueError(f"FEN needs 4 or 6 fields : {fen!r}")
+    placement, side, castling, enpassant = fields[:4]
+
+    board = []
+    for rank in placement.split('/'):
+        row = []
+        for char in rank:
+            if char.isdigit():
+                row.extend(['--'] * int(char))
+            elif char in _FEN_TO_PIECE:
+                row.append(_FEN_TO_PIECE[char])
+            else:
+                raise ValueError(f"invalid piece {char!r} in FEN : {fen!r}")
+        if len(row) != 8:
+            raise ValueError(f"FEN rank {rank!r} does not hold 8 squares : {fen!r}")
+        board.append(row)
+    if len(board) != 8:
+        raise ValueError(f"FEN placement needs 8 ranks : {fen!r}")
+
+    for king in ('wK', 'bK'):
+        if sum(row.count(king) for row in board) != 1:
+            raise ValueError(f"FEN needs exactly one {king} : {fen!r}")
+
+    if side not in ('w', 'b'):
+        raise ValueError(f"invalid side to move {side!r} in FEN : {fen!r}")
+    if castling != '-' and not set(castling) <= set(_CASTLING):
+        raise ValueError(f"invalid castling rights {castling!r} in FEN : {fen!r}")
+    castling_rights = 0
+    for letter in castling.strip('-'):
+        right, (king_r, king_c), (rook_r, rook_c) = _CASTLING[letter]
+        colour = 'w' if letter.isupper() else 'b'
+        # rights without their king and rook at home can not be used, they are dropped
+        if board[king_r][king_c] == colour + 'K' and board[rook_r][rook_c] == colour + 'R':
+            castling_rights |= right
+
+    if enpassant == '-':
+        enpassant_square = ()
+    elif len(enpassant) == 2 and enpassant[0] in 'abcdefgh' and enpassant[1] == ('6' if side == 'w' else '3'):
+        enpassant_square = (8 - int(enpassant[1]), 'abcdefgh'.index(enpassant[0]))
+    else:
+        raise ValueError(f"invalid en passant square {enpassant!r} in FEN : {fen!r}")
+
+    try:
+        halfmove_clock, fullmove_number = (int(fields[4]), int(fields[5])) if len(fields) == 6 else (0, 1)
+    except ValueError:
+        raise ValueError(f"invalid move counters in FEN : {fen!r}") from None
+
+    return FenPosition(board, side == 'w', castling_rights, enpassant_square, halfmove_clock, fullmove_number)
+
+
+def format_fen(board, white_move, castling=0, enpassant=(), halfmove_clock=0, fullmove_number=1):
+    """ FEN string of a position, arguments as in FenPosition """
+    ranks = []
+    for row in board:
+        rank = ''
+        empty = 0
+        for piece in row:
+            if piece == '--':
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += _PIECE_TO_FEN[piece]
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+
+    castling_field = ''.join(letter for letter, (right, _, _) in _CASTLING.items() if castling & right)
+    enpassant_field = 'abcdefgh'[enpassant[1]] + str(8 - enpassant[0]) if enpassant else '-'
+    return (f"{'/'.join(ranks)} {'w' if white_move else 'b'} {castling_field or '-'} {enpassant_field} "
+            f"{halfmove_clock} {fullmove_number}")
+
+
+def position_to_fen(game_state):
+    """
+    FEN of a GameState (or BitboardGameState). The move counters are counted on from the ones of its starting
+    position through move_logs.
+    """
+    plies = len(game_state.move_logs)
+    halfmove_clock = game_state.start_halfmove_clock + plies
+    for i, move in enumerate(reversed(game_state.move_logs)):
+        if move.piece_moved[1] == 'P' or move.piece_captured != '--':
+            halfmove_clock = i
+            break
+
+    # black moving first in the starting position shifts the move number by one ply
+    started_black = game_state.white_move == (plies % 2 == 1)
+    fullmove_number = game_state.start_fullmove_number + (plies + started_black) // 2
+
+    return format_fen(game_state.board, game_state.white_move, game_state.castling_rights,
+                      game_state.enpassant_possible, halfmove_clock, fullmove_number)
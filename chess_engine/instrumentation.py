@@ -0,0 +1,174 @@
+import functools
+import json
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from .bitboard import BitboardGameState
+from .engine import GameState
+from .moves import Move
+
+__all__ = [
+    'METHODS',
+    'MethodStats',
+    'Snapshot',
+    'enable',
+    'disable',
+    'is_enabled',
+    'reset',
+    'snapshot',
+    'instrumented',
+    'to_json',
+    'to_prometheus'
+]
+
+# GameState methods counted and timed
+METHODS = (
+    'get_valid_moves',
+    'get_possible_moves',
+    'generate_moves',
+    'square_under_attack',
+    'is_square_attacked',
+    'make_move',
+    'undo_last_move',
+)
+
+MethodStats = namedtuple('MethodStats', ['calls', 'seconds'])
+
+# methods maps 'Class.method' to MethodStats; nodes_per_sec is per wall-clock second.
+# nodes are make_move calls : perft counts its last ply from the generated move lists without making those moves,
+# so for a perft run nodes is the number of interior nodes, not the perft leaf count.
+Snapshot = namedtuple('Snapshot', ['elapsed', 'methods', 'move_allocations', 'nodes', 'nodes_per_sec'])
+
+# Instrumentation works by replacing the methods on their class while enabled and putting the originals back on
+# disable(), so a disabled engine runs its own code untouched : no flag test, no indirection.
+# Counters are plain lists updated without a lock, calls from several threads may be undercounted. Processes of a
+# ParallelPool or a match are not instrumented.
+_originals = {}  # (class, attribute) -> original function
+_counters = {}  # 'Class.method' -> [calls, seconds]
+_allocations = [0]
+_start = time.perf_counter()
+
+
+def _timed(function, counter):
+    perf_counter = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counter[0] += 1
+            counter[1] += perf_counter() - start
+
+    return wrapper
+
+
+def _counted_init(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        _allocations[0] += 1
+        function(*args, **kwargs)
+
+    return wrapper
+
+
+def _patch(cls, name, replacement):
+    _originals[cls, name] = cls.__dict__[name]
+    setattr(cls, name, replacement)
+
+
+def enable(classes=(GameState, BitboardGameState)):
+    """
+    Starts counting and timing METHODS of `classes` and Move allocations. Counters carry on from their current
+    values, see reset. Timings are inclusive : get_valid_moves includes the is_square_attacked calls it makes.
+    """
+    if _originals:
+        return
+    for cls in classes:
+        for name in METHODS:
+            if name in cls.__dict__:
+                counter = _counters.setdefault(f"{cls.__name__}.{name}", [0, 0.0])
+                _patch(cls, name, _timed(cls.__dict__[name], counter))
+    _patch(Move, '__init__', _counted_init(Move.__dict__['__init__']))
+
+
+def disable():
+    """ puts the original methods back, the counters are kept for snapshot """
+    for (cls, name), function in _originals.items():
+        setattr(cls, name, function)
+    _originals.clear()
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def reset():
+    """ zeroes the counters and restarts the nodes/sec clock """
+    global _start
+    for counter in _counters.values():
+        counter[0] = 0
+        counter[1] = 0.0
+    _allocations[0] = 0
+    _start = time.perf_counter()
+
+
+def snapshot():
+    """ :return: Snapshot of the counters since the last reset (or import) """
+    elapsed = time.perf_counter() - _start
+    methods = {name: MethodStats(calls, seconds) for name, (calls, seconds) in sorted(_counters.items())}
+    nodes = sum(stats.calls for name, stats in methods.items() if name.endswith('.make_move'))
+    return Snapshot(elapsed, methods, _allocations[0], nodes, nodes / elapsed if elapsed > 0 else 0.0)
+
+
+@contextmanager
+def instrumented(classes=(GameState, BitboardGameState)):
+    """ counters are reset, enabled for the block and disabled after it; yields snapshot to read them """
+    reset()
+    enable(classes)
+    try:
+        yield snapshot
+    finally:
+        disable()
+
+
+def to_json(snap=None, indent=None):
+    """ :param snap: Snapshot, a new one by default """
+    snap = snap or snapshot()
+    return json.dumps({
+        'elapsed': snap.elapsed,
+        'nodes': snap.nodes,
+        'nodes_per_sec': snap.nodes_per_sec,
+        'move_allocations': snap.move_allocations,
+        'methods': {name: stats._asdict() for name, stats in snap.methods.items()},
+    }, indent=indent)
+
+
+def to_prometheus(snap=None, prefix='chess_engine'):
+    """ Prometheus text exposition format, methods are labelled with their class (backend) and name """
+    snap = snap or snapshot()
+    lines = [
+        f"# HELP {prefix}_calls_total Calls of an instrumented engine method.",
+        f"# TYPE {prefix}_calls_total counter",
+    ]
+    labels = {name: 'backend="{}",method="{}"'.format(*name.split('.')) for name in snap.methods}
+    lines += [f"{prefix}_calls_total{{{labels[name]}}} {stats.calls}" for name, stats in snap.methods.items()]
+    lines += [
+        f"# HELP {prefix}_seconds_total Time spent in an instrumented engine method, callees included.",
+        f"# TYPE {prefix}_seconds_total counter",
+    ]
+    lines += [f"{prefix}_seconds_total{{{labels[name]}}} {stats.seconds:.9f}" for name, stats in snap.methods.items()]
+    lines += [
+        f"# HELP {prefix}_move_allocations_total Move objects created.",
+        f"# TYPE {prefix}_move_allocations_total counter",
+        f"{prefix}_move_allocations_total {snap.move_allocations}",
+        f"# HELP {prefix}_nodes_total make_move calls on any instrumented backend, bulk counted perft leaves excluded.",
+        f"# TYPE {prefix}_nodes_total counter",
+        f"{prefix}_nodes_total {snap.nodes}",
+        f"# HELP {prefix}_nodes_per_second Moves made per wall-clock second since the counters were reset.",
+        f"# TYPE {prefix}_nodes_per_second gauge",
+        f"{prefix}_nodes_per_second {snap.nodes_per_sec:.1f}",
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,275 @@
+import math
+import os
+import time
+from collections import namedtuple, Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .engine import GameState
+from .evaluation import evaluate
+from .fen import INITIAL_FEN
+from .moves import FLAG_ENPASSANT, SQUARE_MASK
+from .search import Searcher, MAX_PLY
+from .transposition import TranspositionTable
+from .uci import move_to_uci
+
+__all__ = [
+    'EngineConfig',
+    'Adjudication',
+    'SPRT',
+    'GameRecord',
+    'MatchResult',
+    'play_game',
+    'run_match',
+    'elo_difference',
+    'sprt_llr'
+]
+
+EngineConfig = namedtuple(
+    'EngineConfig', ['name', 'movetime', 'max_depth', 'nodes', 'tt_size_mb', 'state_cls', 'evaluate_fn', 'book',
+                     'tablebases'],
+    defaults=(100, MAX_PLY, None, 16, GameState, evaluate, None, None))
+EngineConfig.__doc__ = """
+One side of a match. movetime (milliseconds), max_depth and nodes limit every move; book and tablebases are
+paths, see chess_engine.book and chess_engine.tablebase. evaluate_fn must be a module level function.
+"""
+
+# Games end early once the result is clear :
+#   resign  both engines see a side ahead by resign_score centipawns for resign_plies plies in a row
+#   draw    after draw_after plies, both see |score| <= draw_score for draw_plies plies in a row
+#   length  a game reaching max_plies is drawn
+Adjudication = namedtuple(
+    'Adjudication', ['resign_score', 'resign_plies', 'draw_after', 'draw_score', 'draw_plies', 'max_plies'],
+    defaults=(1000, 6, 80, 10, 16, 400))
+
+# Sequential probability ratio test of H0 : elo = elo0 against H1 : elo = elo1
+SPRT = namedtuple('SPRT', ['elo0', 'elo1', 'alpha', 'beta'], defaults=(0, 5, 0.05, 0.05))
+
+GameRecord = namedtuple('GameRecord', ['white', 'black', 'opening', 'result', 'reason', 'moves'])
+
+
+class MatchResult(namedtuple('MatchResult', ['wins', 'losses', 'draws', 'elapsed', 'llr', 'sprt'])):
+    """ counts from the first engine's point of view, sprt is 'H0', 'H1' or None while undecided """
+    __slots__ = ()
+
+    @property
+    def games(self):
+        return self.wins + self.losses + self.draws
+
+    @property
+    def games_per_sec(self):
+        return self.games / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def elo(self):
+        """ (elo difference, 95% error margin) """
+        return elo_difference(self.wins, self.losses, self.draws)
+
+
+def _score_stats(wins, losses, draws):
+    games = wins + losses + draws
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    return games, score, variance
+
+
+def _elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_difference(wins, losses, draws):
+    """ :return: (elo difference, 95% error margin) of the logistic model, (0, inf) without games """
+    if not wins + losses + draws:
+        return 0.0, math.inf
+    games, score, variance = _score_stats(wins, losses, draws)
+    margin = 1.96 * math.sqrt(variance / games)
+    return _elo(score), (_elo(score + margin) - _elo(score - margin)) / 2
+
+
+def sprt_llr(wins, losses, draws, elo0, elo1):
+    """ log likelihood ratio of elo1 against elo0, the normal approximation of the trinomial GSPRT """
+    if not wins + losses + draws:
+        return 0.0
+    games, score, variance = _score_stats(wins, losses, draws)
+    if variance == 0:
+        return 0.0
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def _sprt_decision(llr, sprt):
+    if llr >= math.log((1 - sprt.beta) / sprt.alpha):
+        return 'H1'
+    if llr <= math.log(sprt.beta / (1 - sprt.alpha)):
+        return 'H0'
+    return None
+
+
+class _Player:
+    """
+    an EngineConfig ready to move, its table, book and tablebases last for one game. It plays on its own
+    position of its config's state_cls, every move of the game is made on it with make_packed_move.
+    """
+
+    def __init__(self, config, opening):
+        self.config = config
+        self.game_state = config.state_cls.from_fen(opening)
+        self.tt = TranspositionTable(config.tt_size_mb)
+        self.book = self.tablebases = None
+        if config.book:
+            from .book import OpeningBook
+
+            self.book = OpeningBook(config.book)
+        if config.tablebases:
+            from .tablebase import Tablebases
+
+            self.tablebases = Tablebases(config.tablebases)
+
+    def move(self, history):
+        """ :return: (packed move, score for the side to move or None) """
+        game_state = self.game_state
+        if self.book is not None:
+            move = self.book.choose(game_state)
+            if move is not None:
+                return move.packed, None
+        config = self.config
+        searcher = Searcher(game_state, tt=self.tt, evaluate_fn=config.evaluate_fn, tablebases=self.tablebases)
+        result = searcher.search(config.max_depth, movetime=config.movetime, nodes=config.nodes, history=history)
+        return result.best_move.packed, result.score
+
+
+def _insufficient_material(board):
+    pieces = [piece for row in board for piece in row if piece != '--' and piece[1] != 'K']
+    return not pieces or (len(pieces) == 1 and pieces[0][1] in 'NB')
+
+
+def play_game(white, black, opening=INITIAL_FEN, adjudication=Adjudication()):
+    """
+    Plays one game between two EngineConfigs from the FEN `opening`. Each side searches its own position, so the
+    two configs may use different state classes; the rules are judged on white's.
+
+    :return: GameRecord, result '1-0', '0-1' or '1/2-1/2'
+    """
+    players = {True: _Player(white, opening), False: _Player(black, opening)}
+    game_state = players[True].game_state
+    halfmove_clock = game_state.start_halfmove_clock
+    history = []
+    repetitions = Counter([game_state.zobrist_key])
+    moves = []
+    resign_streak = draw_streak = 0
+    white_ahead = True
+
+    while True:
+        if not game_state.generate_moves([]):
+            if game_state.in_check():
+                return GameRecord(white.name, black.name, opening, '0-1' if game_state.white_move else '1-0',
+                                  'checkmate', moves)
+            return GameRecord(white.name, black.name, opening, '1/2-1/2', 'stalemate', moves)
+        if repetitions[game_state.zobrist_key] >= 3:
+            return GameRecord(white.name, black.name, opening, '1/2-1/2', 'repetition', moves)
+        if halfmove_clock >= 100:
+            return GameRecord(white.name, black.name, opening, '1/2-1/2', 'fifty moves', moves)
+        if _insufficient_material(game_state.board):
+            return GameRecord(white.name, black.name, opening, '1/2-1/2', 'insufficient material', moves)
+        if len(moves) >= adjudication.max_plies:
+            return GameRecord(white.name, black.name, opening, '1/2-1/2', 'adjudication length', moves)
+
+        white_move = game_state.white_move
+        move, score = players[white_move].move(history)
+
+        if score is None:
+            # book move
+            resign_streak = draw_streak = 0
+        else:
+            white_score = score if white_move else -score
+            if abs(white_score) >= adjudication.resign_score:
+                resign_streak = resign_streak + 1 if (white_score > 0) == white_ahead else 1
+                white_ahead = white_score > 0
+            else:
+                resign_streak = 0
+            if len(moves) >= adjudication.draw_after and abs(white_score) <= adjudication.draw_score:
+                draw_streak += 1
+            else:
+                draw_streak = 0
+
+        history.append(game_state.zobrist_key)
+        start_sq = move & SQUARE_MASK
+        end_sq = (move >> 6) & SQUARE_MASK
+        piece = game_state.board[start_sq >> 3][start_sq & 7]
+        capture = game_state.board[end_sq >> 3][end_sq & 7] != '--' or move >> 12 == FLAG_ENPASSANT
+        for player in players.values():
+            player.game_state.make_packed_move(move)
+        moves.append(move_to_uci(move))
+        halfmove_clock = 0 if capture or piece[1] == 'P' else halfmove_clock + 1
+        repetitions[game_state.zobrist_key] += 1
+
+        if resign_streak >= adjudication.resign_plies:
+            return GameRecord(white.name, black.name, opening, '1-0' if white_ahead else '0-1',
+                              'adjudication resign', moves)
+        if draw_streak >= adjudication.draw_plies:
+            return GameRecord(white.name, black.name, opening, '1/2-1/2', 'adjudication draw', moves)
+
+
+def run_match(engine_a, engine_b, openings=(INITIAL_FEN,), games=100, processes=None,
+              adjudication=Adjudication(), sprt=None, on_game=None):
+    """
+    Plays `games` games between two EngineConfigs in parallel worker processes. Every opening FEN is played twice,
+    colours reversed, the openings are cycled through.
+
+    :param sprt: SPRT, the match stops as soon as it accepts a hypothesis
+    :param on_game: called as on_game(record, result) in the parent after every finished game
+    :return: MatchResult from engine_a's point of view
+    """
+    openings = list(openings) or [INITIAL_FEN]
+    processes = processes or os.cpu_count() or 1
+    # (white, black, opening, engine_a plays white)
+    schedule = (
+        (engine_a, engine_b, openings[i // 2 % len(openings)], True) if i % 2 == 0 else
+        (engine_b, engine_a, openings[i // 2 % len(openings)], False)
+        for i in range(games)
+    )
+
+    wins = losses = draws = 0
+    llr = 0.0
+    decision = None
+    start = time.perf_counter()
+    with ProcessPoolExecutor(processes) as executor:
+        pending = {}  # future -> engine_a plays white
+
+        def submit():
+            job = next(schedule, None)
+            if job is not None:
+                white, black, opening, a_white = job
+                pending[executor.submit(play_game, white, black, opening, adjudication)] = a_white
+
+        # one game per worker, a finished game is replaced at once; games still running when the SPRT
+        # decides are waited for but not counted
+        for _ in range(processes):
+            submit()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                a_white = pending.pop(future)
+                record = future.result()
+                if record.result == '1/2-1/2':
+                    draws += 1
+                elif (record.result == '1-0') == a_white:
+                    wins += 1
+                else:
+                    losses += 1
+                if sprt is not None and decision is None:
+                    llr = sprt_llr(wins, losses, draws, sprt.elo0, sprt.elo1)
+                    decision = _sprt_decision(llr, sprt)
+                if on_game is not None:
+                    on_game(record, MatchResult(wins, losses, draws, time.perf_counter() - start, llr, decision))
+
+            if decision is not None:
+                for future in pending:
+                    future.cancel()
+                break
+            for _ in done:
+                submit()
+
+    return MatchResult(wins, losses, draws, time.perf_counter() - start, llr, decision)
@@ -1,34 +1,144 @@
 import string
+from array import array
 
 __all__ = [
-    'Move'
+    'Move',
+    'MoveStack',
+    'pack_move',
+    'FLAG_ENPASSANT',
+    'FLAG_CASTLE',
+    'FLAG_PROMOTION',
+    'PROMOTION_PIECES',
+    'promotion_flags',
+    'CASTLE_WHITE_KING',
+    'CASTLE_WHITE_QUEEN',
+    'CASTLE_BLACK_KING',
+    'CASTLE_BLACK_QUEEN',
+    'CASTLE_ALL',
+    'CASTLING_MASKS',
+    'PIECE_CODES'
 ]
 
+# Packed moves are 16-bit integers : start square | end square << 6 | flags << 12, with square = row * 8 + col.
+FLAG_ENPASSANT = 1
+FLAG_CASTLE = 2  # king move of two squares, the rook is moved along
+PROMOTION_PIECES = 'NBRQ'  # promotion flags are 8 | index of the piece in PROMOTION_PIECES
+FLAG_PROMOTION = 8 | 3  # queen promotion
+
+SQUARE_MASK = 0x3F
+
+# every piece of GameState.board, numbered by the bitboard backend and the batch evaluator
+PIECE_CODES = [
+    'wP', 'wN', 'wB', 'wR', 'wQ', 'wK',
+    'bP', 'bN', 'bB', 'bR', 'bQ', 'bK'
+]
+MAX_MOVES = 256  # comfortably above the 218 legal moves of the richest known position
+
+
+# Castling rights, a bit per king and side
+CASTLE_WHITE_KING = 1
+CASTLE_WHITE_QUEEN = 2
+CASTLE_BLACK_KING = 4
+CASTLE_BLACK_QUEEN = 8
+CASTLE_ALL = 15
+
+# rights kept when a piece leaves or lands on a square : moving a king or a rook, or capturing a rook, loses them
+CASTLING_MASKS = [CASTLE_ALL] * 64
+CASTLING_MASKS[0] ^= CASTLE_BLACK_QUEEN  # a8
+CASTLING_MASKS[4] ^= CASTLE_BLACK_KING | CASTLE_BLACK_QUEEN  # e8
+CASTLING_MASKS[7] ^= CASTLE_BLACK_KING  # h8
+CASTLING_MASKS[56] ^= CASTLE_WHITE_QUEEN  # a1
+CASTLING_MASKS[60] ^= CASTLE_WHITE_KING | CASTLE_WHITE_QUEEN  # e1
+CASTLING_MASKS[63] ^= CASTLE_WHITE_KING  # h1
+
+
+def pack_move(start_sq, end_sq, flags=0):
+    return start_sq | end_sq << 6 | flags << 12
+
+
+def promotion_flags(piece):
+    """ flags of a promotion to `piece`, one of 'NBRQ' """
+    return 8 | PROMOTION_PIECES.index(piece)
+
 
 class Move:
+    """
+    A packed move (see pack_move) with the pieces it moves and captures, read from the board when it is built :
+    only these three slots are stored, the squares and flags are decoded from `packed` on access.
+    """
+    __slots__ = ('packed', 'piece_moved', 'piece_captured')
+
     rank_to_rows = {k: v for k, v in zip([str(i) for i in range(1, 9)], [i for i in range(8)][::-1])}
     rows_to_ranks = {v: k for k, v in rank_to_rows.items()}
 
     files_to_cols = {k: v for k, v in zip([i for i in string.ascii_lowercase[:8]], [i for i in range(8)])}
     cols_to_files = {v: k for k, v in files_to_cols.items()}
 
-    def __init__(self, start_sq, end_sq, board, is_enpassant=False):
+    def __init__(self, start_sq, end_sq, board, is_enpassant=False, is_castle=False, promotion_piece='Q'):
+        start_row, start_col = start_sq
+        end_row, end_col = end_sq
+        piece_moved = board[start_row][start_col]
+        flags = FLAG_ENPASSANT if is_enpassant else FLAG_CASTLE if is_castle else 0
+        if (piece_moved == 'wP' and end_row == 0) or (piece_moved == 'bP' and end_row == 7):
+            flags = promotion_flags(promotion_piece)
+        self.packed = (start_row * 8 + start_col) | (end_row * 8 + end_col) << 6 | flags << 12
+        self.piece_moved = piece_moved
+        self.piece_captured = board[end_row][end_col] if not is_enpassant else 'wP' if piece_moved == 'bP' else 'bP'
 
-        self.start_row, self.start_col = start_sq
-        self.end_row, self.end_col = end_sq
+    @classmethod
+    def from_packed(cls, packed, board):
+        """ wraps a packed move of the position `board` into a Move, only its pieces are read from the board """
+        move = cls.__new__(cls)
+        move.packed = packed
+        start_sq = packed & SQUARE_MASK
+        end_sq = (packed >> 6) & SQUARE_MASK
+        move.piece_moved = board[start_sq >> 3][start_sq & 7]
+        if packed >> 12 == FLAG_ENPASSANT:
+            move.piece_captured = 'wP' if move.piece_moved == 'bP' else 'bP'
+        else:
+            move.piece_captured = board[end_sq >> 3][end_sq & 7]
+        return move
 
-        self.move_id = self.start_row * 100 + self.start_col * 100 + self.end_row * 10 + self.end_col
+    @property
+    def start_row(self):
+        return (self.packed & SQUARE_MASK) >> 3
 
-        self.piece_moved = board[self.start_row][self.start_col]
-        self.piece_captured = board[self.end_row][self.end_col]
-        self.is_pawn_promotion = (
-                                         self.piece_moved == 'wP' and self.end_row == 0) or (
-                                         self.piece_moved == 'bP' and self.end_row == 7
-                                 )
+    @property
+    def start_col(self):
+        return self.packed & 7
 
-        self.is_enpassant_move = is_enpassant
-        if self.is_enpassant_move:
-            self.piece_captured = 'wP' if self.piece_moved == 'bP' else 'bP'
+    @property
+    def end_row(self):
+        return (self.packed >> 9) & 7
+
+    @property
+    def end_col(self):
+        return (self.packed >> 6) & 7
+
+    @property
+    def move_id(self):
+        """
+        start and end square plus the promotion piece, unique for every move of a position.
+        En passant and castling flags are left out, a move built from two clicked squares matches the generated one.
+        """
+        packed = self.packed
+        return packed if packed >> 15 else packed & 0xFFF
+
+    @property
+    def is_pawn_promotion(self):
+        return self.packed >> 15 == 1
+
+    @property
+    def promotion_piece(self):
+        return PROMOTION_PIECES[(self.packed >> 12) & 3] if self.packed >> 15 else None
+
+    @property
+    def is_enpassant_move(self):
+        return self.packed >> 12 == FLAG_ENPASSANT
+
+    @property
+    def is_castle_move(self):
+        return self.packed >> 12 == FLAG_CASTLE
 
     def get_chess_notation(self):
         return self.get_rank_file(self.start_row, self.start_col) + " -> " + self.get_rank_file(self.end_row,
@@ -41,8 +151,27 @@ class Move:
         if isinstance(other, Move):
             return self.move_id == other.move_id
 
+    def __hash__(self):
+        return self.move_id
+
     def __str__(self):
         return f"{self.get_chess_notation()}"
 
     def __repr__(self):
         return f"{self.get_chess_notation()}"
+
+
+class MoveStack:
+    """
+    One reusable array-backed buffer of packed moves per search ply, so generating moves at a node does not
+    allocate a list or any Move object.
+    """
+
+    def __init__(self, max_ply=128):
+        self.buffers = [array('H') for _ in range(max_ply + 1)]
+
+    def __getitem__(self, ply):
+        """ the emptied buffer of `ply` """
+        buffer = self.buffers[ply]
+        del buffer[:]
+        return buffer
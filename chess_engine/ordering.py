@@ -0,0 +1,126 @@
+from .engine import STAGE_CAPTURES, STAGE_QUIETS
+from .evaluation import PIECE_VALUES
+from .moves import MoveStack, FLAG_ENPASSANT, FLAG_CASTLE, PROMOTION_PIECES, SQUARE_MASK
+
+__all__ = [
+    'MoveOrderer',
+    'mvv_lva'
+]
+
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 24
+FIRST_KILLER_SCORE = 1 << 22
+SECOND_KILLER_SCORE = FIRST_KILLER_SCORE - 1
+HISTORY_LIMIT = 1 << 20  # history scores stay below the killer scores
+
+# attacker ranks, cheaper attackers are tried first on equal victims
+_ATTACKER_RANK = {'P': 0, 'N': 1, 'B': 2, 'R': 3, 'Q': 4, 'K': 5}
+
+
+def mvv_lva(move, board):
+    """
+    Most valuable victim, least valuable attacker, for a packed move of the position `board`.
+    Promotions count as winning the promoted piece.
+    """
+    start_sq = move & SQUARE_MASK
+    end_sq = (move >> 6) & SQUARE_MASK
+    flags = move >> 12
+
+    victim = board[end_sq >> 3][end_sq & 7]
+    value = PIECE_VALUES[victim[1]] if victim != '--' else PIECE_VALUES['P'] if flags == FLAG_ENPASSANT else 0
+    if flags & 8:
+        value += PIECE_VALUES[PROMOTION_PIECES[flags & 3]]
+    return value * 8 - _ATTACKER_RANK[board[start_sq >> 3][start_sq & 7][1]]
+
+
+def is_quiet(move, board):
+    end_sq = (move >> 6) & SQUARE_MASK
+    flags = move >> 12
+    return (flags == 0 or flags == FLAG_CASTLE) and board[end_sq >> 3][end_sq & 7] == '--'
+
+
+class MoveOrderer:
+    """
+    Orders packed moves for any alpha-beta search over GameState : hash move, captures by MVV-LVA, killer moves
+    of the ply, then quiet moves by their butterfly history score.
+    """
+
+    def __init__(self, max_ply=128):
+        self.max_ply = max_ply
+        self.killers = [[0, 0] for _ in range(max_ply + 1)]
+        self.move_stack = MoveStack(max_ply)
+        # history[colour][start square][end square], colour 0 is white
+        self.history = [[[0] * 64 for _ in range(64)] for _ in range(2)]
+
+    def clear(self):
+        self.killers = [[0, 0] for _ in range(self.max_ply + 1)]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in range(2)]
+
+    def new_search(self):
+        """ killers are position specific, history is only faded so it carries over between moves """
+        self.killers = [[0, 0] for _ in range(self.max_ply + 1)]
+        self._age_history()
+
+    def _age_history(self):
+        for side in self.history:
+            for row in side:
+                for i in range(64):
+                    row[i] >>= 1
+
+    def score_move(self, move, game_state, ply=0, hash_move=0):
+        """ sort key of the packed `move` in `game_state` """
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+
+        board = game_state.board
+        if not is_quiet(move, board):
+            return CAPTURE_SCORE + mvv_lva(move, board)
+
+        killers = self.killers[ply]
+        if move == killers[0]:
+            return FIRST_KILLER_SCORE
+        if move == killers[1]:
+            return SECOND_KILLER_SCORE
+
+        return self.history[0 if game_state.white_move else 1][move & SQUARE_MASK][(move >> 6) & SQUARE_MASK]
+
+    def order_moves(self, moves, game_state, ply=0, hash_move=0):
+        """ packed `moves` of game_state sorted best candidates first, as a new list """
+        score_move = self.score_move
+        return sorted(moves, key=lambda move: score_move(move, game_state, ply, hash_move), reverse=True)
+
+    def staged_moves(self, game_state, ply=0, hash_move=0):
+        """
+        Yields the packed valid moves of game_state stage by stage : the hash move first, once checked to be valid
+        here, then ordered captures, then quiet moves, which are only generated and ordered once every capture was
+        consumed. A hash move cutoff therefore generates nothing. Moves are generated into the reusable buffer
+        of `ply`.
+        """
+        if hash_move and game_state.is_legal_move(hash_move):
+            yield hash_move
+        else:
+            hash_move = 0
+
+        for stage in (STAGE_CAPTURES, STAGE_QUIETS):
+            for move in self.order_moves(game_state.generate_moves(self.move_stack[ply], stage), game_state, ply):
+                if move != hash_move:
+                    yield move
+
+    def record_cutoff(self, move, game_state, ply, depth):
+        """
+        The packed quiet `move` caused a beta cutoff in game_state : remember it as killer and reward it in
+        the history table.
+        """
+        if not is_quiet(move, game_state.board):
+            return
+
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        row = self.history[0 if game_state.white_move else 1][move & SQUARE_MASK]
+        end_sq = (move >> 6) & SQUARE_MASK
+        row[end_sq] += depth * depth
+        if row[end_sq] >= HISTORY_LIMIT:
+            self._age_history()
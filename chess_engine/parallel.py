@@ -0,0 +1,192 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .moves import Move
+from .ordering import MoveOrderer
+from .perft import perft
+from .search import Searcher, SearchResult, MATE_SCORE, MATE_BOUND, MAX_PLY
+from .transposition import TranspositionTable
+
+__all__ = [
+    'ParallelPool'
+]
+
+# Per worker process state, kept between tasks so the cache and move ordering statistics carry over
+_worker_tt = None
+_worker_orderer = None
+
+
+def _init_worker(tt_size_mb, shared_tt):
+    global _worker_tt, _worker_orderer
+    _worker_tt = shared_tt if shared_tt is not None else TranspositionTable(tt_size_mb)
+    _worker_orderer = MoveOrderer(MAX_PLY)
+
+
+def _serialise(game_state):
+    """ a position travels to the workers as its state class, its starting FEN and the packed moves played since """
+    return type(game_state), game_state.start_fen, [move.packed for move in game_state.move_logs]
+
+
+def _replay(state_cls, start_fen, moves):
+    """ :return: the position and the keys of every position played before it """
+    game_state = state_cls.from_fen(start_fen)
+    keys = []
+    for move in moves:
+        keys.append(game_state.zobrist_key)
+        game_state.make_packed_move(move)
+    return game_state, keys
+
+
+def _perft_root_move(state_cls, start_fen, moves, root_move, depth):
+    game_state, _ = _replay(state_cls, start_fen, moves)
+    game_state.make_packed_move(root_move)
+    return perft(game_state, depth - 1)
+
+
+def _search_root_move(state_cls, start_fen, moves, history, root_move, depth, deadline, nodes):
+    """
+    searches the position after root_move to `depth`
+    :return: (score for the root side, depth, pv, nodes), depth is below `depth` only if the limits interrupted it
+    """
+    game_state, keys = _replay(state_cls, start_fen, moves)
+    keys = list(history) + keys + [game_state.zobrist_key]
+    game_state.make_packed_move(root_move)
+
+    movetime = None if deadline is None else max(1, (deadline - time.time()) * 1000)
+    searcher = Searcher(game_state, tt=_worker_tt, orderer=_worker_orderer)
+    result = searcher.search(depth, movetime, nodes, history=keys)
+
+    # without a best move the child is mate or stalemate, its score is exact at any depth. A mate score is exact
+    # too : the child stops deepening once the mate lies inside its horizon, see Searcher.search
+    complete = result.best_move is None or abs(result.score) >= MATE_BOUND
+    child_depth = depth if complete else result.depth
+    return -result.score, child_depth, [move.packed for move in result.pv], result.nodes
+
+
+def _parent_score(score):
+    # a mate seen from the child is one ply further away from the root
+    if score >= MATE_BOUND:
+        return score - 1
+    if score <= -MATE_BOUND:
+        return score + 1
+    return score
+
+
+class ParallelPool:
+    """
+    Persistent pool of worker processes that splits perft and search at the root move list : every worker
+    replays the position, plays one root move and works on the subtree below it; the results are merged here.
+
+    The workers live until close() (or the end of a with block), so repeated calls do not pay process startup.
+    Each worker keeps its own transposition table of `tt_size_mb` between calls, unless `shared_tt`, a
+    SharedTranspositionTable, is given : all workers then probe and fill that one table.
+    """
+
+    def __init__(self, processes=None, tt_size_mb=16, shared_tt=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.shared_tt = shared_tt
+        self._executor = ProcessPoolExecutor(self.processes, initializer=_init_worker,
+                                             initargs=(tt_size_mb, shared_tt))
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def divide(self, game_state, depth):
+        """ like perft.divide, root moves are counted in parallel """
+        if depth <= 0:
+            return []
+
+        root_moves = game_state.generate_moves([])
+        if depth == 1:
+            counts = [1] * len(root_moves)
+        else:
+            position = _serialise(game_state)
+            futures = [self._executor.submit(_perft_root_move, *position, move, depth) for move in root_moves]
+            counts = [future.result() for future in futures]
+
+        board = game_state.board
+        return [(Move.from_packed(move, board), nodes) for move, nodes in zip(root_moves, counts)]
+
+    def perft(self, game_state, depth):
+        """ like perft.perft, root moves are counted in parallel """
+        if depth <= 0:
+            return 1
+        return sum(nodes for _, nodes in self.divide(game_state, depth))
+
+    def search(self, game_state, max_depth, movetime=None, nodes=None, history=()):
+        """
+        Root split search with iterative deepening : every depth is a wave in which each root move is searched by a
+        worker to depth - 1 with a full window. A wave only counts once all its root moves completed, the best
+        score of the last complete wave wins. The first wave runs without limits, so every root move is always
+        searched at least once; later waves stop at the deadline or once `nodes` is spent.
+
+        :param history: keys of the positions played before the game's first move, for repetition detection
+        :return: SearchResult, depth is the depth of the last complete wave, never above max_depth
+        """
+        start = time.perf_counter()
+        root_moves = game_state.generate_moves([])
+        if not root_moves:
+            return SearchResult(None, -MATE_SCORE if game_state.in_check() else 0, 0, [], 0, 0.0)
+        if max_depth <= 1:
+            # the children of a one ply search are only evaluated, not worth a round trip to the workers
+            _, keys = _replay(*_serialise(game_state))
+            return Searcher(game_state, tt=TranspositionTable(1)).search(1, movetime, nodes,
+                                                                         history=list(history) + keys)
+
+        deadline = time.time() + movetime / 1000 if movetime else None
+        position = _serialise(game_state)
+        history = tuple(history)
+
+        best = None
+        depth = 0
+        total_nodes = 0
+        for child_depth in range(1, max_depth):
+            first = child_depth == 1
+            if not first and ((deadline is not None and time.time() >= deadline) or
+                              (nodes is not None and total_nodes >= nodes)):
+                break
+            node_share = None if first or nodes is None else max(1, (nodes - total_nodes) // len(root_moves))
+            futures = [
+                self._executor.submit(_search_root_move, *position, history, move, child_depth,
+                                      None if first else deadline, node_share)
+                for move in root_moves
+            ]
+
+            wave = None
+            complete = True
+            for move, future in zip(root_moves, futures):
+                score, searched_depth, pv, searched = future.result()
+                total_nodes += searched
+                if searched_depth < child_depth:
+                    # interrupted by the limits, the whole wave is discarded
+                    complete = False
+                    continue
+                score = _parent_score(score)
+                if wave is None or score > wave[0]:
+                    wave = score, [move] + pv
+            if not complete:
+                break
+
+            best = wave
+            depth = child_depth + 1
+            if abs(best[0]) >= MATE_BOUND and MATE_SCORE - abs(best[0]) <= depth:
+                # a forced mate inside the horizon will not change with more depth
+                break
+
+        score, pv = best
+        board_moves = []
+        for packed in pv:
+            move = Move.from_packed(packed, game_state.board)
+            game_state.make_move(move)
+            board_moves.append(move)
+        for _ in board_moves:
+            game_state.undo_last_move()
+
+        return SearchResult(board_moves[0], score, depth, board_moves, total_nodes, time.perf_counter() - start)
@@ -0,0 +1,152 @@
+import time
+from collections import namedtuple
+
+from .moves import MoveStack
+
+__all__ = [
+    'perft',
+    'divide',
+    'run_perft_suite',
+    'PerftPosition',
+    'PerftResult',
+    'PERFT_POSITIONS'
+]
+
+PerftPosition = namedtuple('PerftPosition', ['name', 'factory', 'nodes'])
+PerftResult = namedtuple('PerftResult', ['name', 'depth', 'nodes', 'expected', 'elapsed', 'nps'])
+
+
+def _initial_position(state_cls):
+    return state_cls()
+
+
+def _fen_position(fen):
+    def factory(state_cls):
+        return state_cls.from_fen(fen)
+    return factory
+
+
+# Published node counts (chessprogramming.org, "Perft Results"). Deeper entries are listed for completeness,
+# pick the depth to run from the command line.
+PERFT_POSITIONS = [
+    PerftPosition('initial position', _initial_position, {
+        1: 20,
+        2: 400,
+        3: 8902,
+        4: 197281,
+        5: 4865609,
+        6: 119060324,
+    }),
+    PerftPosition('kiwipete', _fen_position(
+        'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'), {
+        1: 48,
+        2: 2039,
+        3: 97862,
+        4: 4085603,
+        5: 193690690,
+    }),
+    PerftPosition('position 3', _fen_position('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'), {
+        1: 14,
+        2: 191,
+        3: 2812,
+        4: 43238,
+        5: 674624,
+        6: 11030083,
+    }),
+    PerftPosition('position 4', _fen_position(
+        'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1'), {
+        1: 6,
+        2: 264,
+        3: 9467,
+        4: 422333,
+        5: 15833292,
+    }),
+    PerftPosition('position 5', _fen_position('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8'), {
+        1: 44,
+        2: 1486,
+        3: 62379,
+        4: 2103487,
+        5: 89941194,
+    }),
+    PerftPosition('position 6', _fen_position(
+        'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10'), {
+        1: 46,
+        2: 2079,
+        3: 89890,
+        4: 3894594,
+        5: 164075551,
+    }),
+    # only depth 4 is published, the shallower counts are those both backends agree on and lead to it
+    PerftPosition('stalemate and checkmate', _fen_position('8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1'), {
+        1: 37,
+        2: 183,
+        3: 6559,
+        4: 23527,
+    }),
+]
+
+
+def _perft(game_state, depth, move_stack):
+    # packed moves in one reusable buffer per depth, Move objects are only created for moves played
+    moves = game_state.generate_moves(move_stack[depth])
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        game_state.make_packed_move(move)
+        nodes += _perft(game_state, depth - 1, move_stack)
+        game_state.undo_last_move()
+    return nodes
+
+
+def perft(game_state, depth):
+    """
+    Counts leaf nodes `depth` plies below the current position using generate_moves, make_packed_move and
+    undo_last_move. The position (and its check_mate / stale_mate flags) is left as it was found.
+    """
+    if depth <= 0:
+        return 1
+
+    flags = game_state.check_mate, game_state.stale_mate
+    try:
+        return _perft(game_state, depth, MoveStack(depth))
+    finally:
+        game_state.check_mate, game_state.stale_mate = flags
+
+
+def divide(game_state, depth):
+    """ perft split by root move, returns a list of (move, nodes) in generation order """
+    if depth <= 0:
+        return []
+
+    flags = game_state.check_mate, game_state.stale_mate
+    try:
+        result = []
+        move_stack = MoveStack(depth)
+        for move in game_state.get_valid_moves():
+            game_state.make_move(move)
+            result.append((move, _perft(game_state, depth - 1, move_stack) if depth > 1 else 1))
+            game_state.undo_last_move()
+        return result
+    finally:
+        game_state.check_mate, game_state.stale_mate = flags
+
+
+def run_perft_suite(state_cls, max_depth, positions=PERFT_POSITIONS, perft_fn=perft):
+    """
+    yields a PerftResult for every position and depth up to max_depth that has a known node count,
+    perft_fn(game_state, depth) does the counting (ParallelPool.perft to use several processes)
+    """
+    for position in positions:
+        for depth in sorted(position.nodes):
+            if depth > max_depth:
+                break
+
+            game_state = position.factory(state_cls)
+            start = time.perf_counter()
+            nodes = perft_fn(game_state, depth)
+            elapsed = time.perf_counter() - start
+
+            yield PerftResult(position.name, depth, nodes, position.nodes[depth], elapsed,
+                              nodes / elapsed if elapsed > 0 else 0.0)
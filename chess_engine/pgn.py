@@ -0,0 +1,263 @@
+import gzip
+import os
+import re
+import time
+from collections import namedtuple
+
+from .engine import GameState
+from .moves import Move, FLAG_CASTLE, PROMOTION_PIECES, SQUARE_MASK
+
+__all__ = [
+    'PGNGame',
+    'ReplayStats',
+    'read_pgn',
+    'parse_san',
+    'move_to_san',
+    'replay_game',
+    'iter_positions',
+    'replay_pgn'
+]
+
+PGNGame = namedtuple('PGNGame', ['headers', 'moves', 'result'])  # moves are SAN strings
+
+_HEADER = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# comments, variations, NAGs, results and move numbers are all skipped, anything else is a move
+_TOKEN = re.compile(r'\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s{}();]+')
+_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+_SAN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?')
+
+
+class ReplayStats(namedtuple('ReplayStats', ['games', 'positions', 'errors', 'elapsed'])):
+    __slots__ = ()
+
+    @property
+    def games_per_sec(self):
+        return self.games / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def positions_per_sec(self):
+        return self.positions / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _open(source):
+    if hasattr(source, 'read'):
+        return source
+    if os.fspath(source).endswith('.gz'):
+        return gzip.open(source, 'rt', encoding='utf-8', errors='replace')
+    return open(source, 'r', encoding='utf-8', errors='replace')
+
+
+def _parse_movetext(text):
+    moves = []
+    result = '*'
+    depth = 0  # variation nesting
+    for token in _TOKEN.findall(text):
+        first = token[0]
+        if first == '(':
+            depth += 1
+        elif first == ')':
+            depth = max(0, depth - 1)
+        elif depth or first in '{;$' or token[-1] == '.':
+            continue
+        elif token in _RESULTS:
+            result = token
+        else:
+            moves.append(token)
+    return moves, result
+
+
+def read_pgn(source):
+    """
+    Yields a PGNGame for every game of `source`, a path (gzip compressed when it ends with .gz) or an open text
+    file. Games are read one at a time, memory use is bounded by the largest game.
+    Comments, variations and NAGs are dropped, moves are kept as SAN strings.
+    """
+    stream = _open(source)
+    try:
+        headers = {}
+        movetext = []
+        open_comment = False
+        for line in stream:
+            stripped = line.strip()
+            if not open_comment and stripped.startswith('['):
+                if movetext:
+                    yield PGNGame(headers, *_parse_movetext(' '.join(movetext)))
+                    headers = {}
+                    movetext = []
+                match = _HEADER.match(stripped)
+                if match:
+                    headers[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+            elif stripped and not (stripped.startswith('%') and not open_comment):
+                movetext.append(stripped)
+                # a brace comment may run over several lines, headers can not start inside it
+                open_comment = stripped.rfind('{') > stripped.rfind('}') or (open_comment and '}' not in stripped)
+
+        if movetext or headers:
+            yield PGNGame(headers, *_parse_movetext(' '.join(movetext)))
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+def parse_san(game_state, san, moves=None):
+    """
+    Resolves a SAN move ('Nf3', 'exd5', 'e8=Q+', 'O-O' ...) against the valid moves of game_state.
+
+    :param moves: packed valid moves of the position if already generated
+    :return: Move
+    :raises ValueError: if no valid move or more than one matches
+    """
+    if moves is None:
+        moves = game_state.generate_moves([])
+    board = game_state.board
+    text = san.rstrip('+#!?')
+
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        end_col = 6 if len(text) == 3 else 2
+        matches = [move for move in moves if move >> 12 == FLAG_CASTLE and (move >> 6) & 7 == end_col]
+    else:
+        match = _SAN.fullmatch(text)
+        if match is None:
+            raise ValueError(f"invalid SAN {san!r}")
+        piece, from_file, from_rank, target, promotion = match.groups()
+        piece = piece or 'P'
+        end_sq = (8 - int(target[1])) * 8 + 'abcdefgh'.index(target[0])
+        from_col = 'abcdefgh'.index(from_file) if from_file else None
+        from_row = 8 - int(from_rank) if from_rank else None
+
+        matches = []
+        for move in moves:
+            if (move >> 6) & SQUARE_MASK != end_sq or move >> 12 == FLAG_CASTLE:
+                continue
+            start_sq = move & SQUARE_MASK
+            if board[start_sq >> 3][start_sq & 7][1] != piece:
+                continue
+            if (from_col is not None and start_sq & 7 != from_col) or (
+                    from_row is not None and start_sq >> 3 != from_row):
+                continue
+            flags = move >> 12
+            if flags & 8:
+                # a promotion without its piece is taken as a queen
+                if PROMOTION_PIECES[flags & 3] != (promotion or 'Q'):
+                    continue
+            elif promotion:
+                continue
+            matches.append(move)
+
+    if len(matches) != 1:
+        raise ValueError(f"{'ambiguous' if matches else 'illegal'} move {san!r} in {game_state.to_fen()}")
+    return Move.from_packed(matches[0], board)
+
+
+def move_to_san(game_state, move, moves=None):
+    """
+    SAN of the valid `move` (Move or packed) of game_state, check and mate suffixes included.
+
+    :param moves: packed valid moves of the position if already generated
+    """
+    if moves is None:
+        moves = game_state.generate_moves([])
+    board = game_state.board
+    if isinstance(move, Move):
+        move = move.packed
+    start_sq = move & SQUARE_MASK
+    end_sq = (move >> 6) & SQUARE_MASK
+    flags = move >> 12
+    piece = board[start_sq >> 3][start_sq & 7][1]
+    target = 'abcdefgh'[end_sq & 7] + str(8 - (end_sq >> 3))
+    capture = board[end_sq >> 3][end_sq & 7] != '--' or flags == 1
+
+    if flags == FLAG_CASTLE:
+        san = 'O-O' if end_sq & 7 == 6 else 'O-O-O'
+    elif piece == 'P':
+        san = ('abcdefgh'[start_sq & 7] + 'x' if capture else '') + target
+        if flags & 8:
+            san += '=' + PROMOTION_PIECES[flags & 3]
+    else:
+        # disambiguate by file, else by rank, else by both
+        rivals = [
+            other & SQUARE_MASK for other in moves
+            if (other >> 6) & SQUARE_MASK == end_sq and other & SQUARE_MASK != start_sq
+            and board[(other & SQUARE_MASK) >> 3][other & 7][1] == piece
+        ]
+        origin = ''
+        if rivals:
+            if all(sq & 7 != start_sq & 7 for sq in rivals):
+                origin = 'abcdefgh'[start_sq & 7]
+            elif all(sq >> 3 != start_sq >> 3 for sq in rivals):
+                origin = str(8 - (start_sq >> 3))
+            else:
+                origin = 'abcdefgh'[start_sq & 7] + str(8 - (start_sq >> 3))
+        san = piece + origin + ('x' if capture else '') + target
+
+    game_state.make_packed_move(move)
+    if game_state.in_check():
+        san += '#' if not game_state.generate_moves([]) else '+'
+    game_state.undo_last_move()
+    return san
+
+
+def _start_state(game, state_cls):
+    fen = game.headers.get('FEN')
+    return state_cls.from_fen(fen) if fen else state_cls()
+
+
+def replay_game(game, state_cls=GameState, on_move=None):
+    """
+    Plays the moves of `game` with make_move from its starting position (FEN tag, else the initial position).
+
+    :param on_move: called as on_move(game_state, move) before every move is played
+    :return: the game state after the last move
+    :raises ValueError: on an invalid move
+    """
+    game_state = _start_state(game, state_cls)
+    for san in game.moves:
+        move = parse_san(game_state, san)
+        if on_move is not None:
+            on_move(game_state, move)
+        game_state.make_move(move)
+    return game_state
+
+
+def iter_positions(source, state_cls=GameState):
+    """
+    Yields (game, game_state, move) before every move of every game of `source` is played.
+    The same game state is updated in place, copy what has to outlive the iteration step.
+    A game with an invalid move ends at that move.
+    """
+    for game in read_pgn(source):
+        game_state = _start_state(game, state_cls)
+        for san in game.moves:
+            try:
+                move = parse_san(game_state, san)
+            except ValueError:
+                break
+            yield game, game_state, move
+            game_state.make_move(move)
+
+
+def replay_pgn(source, state_cls=GameState, on_move=None, on_game=None, max_games=None):
+    """
+    Streams and replays every game of `source`.
+
+    :param on_move: see replay_game
+    :param on_game: called as on_game(game, game_state) once a game was replayed
+    :param max_games: stop after this many games
+    :return: ReplayStats, games with an invalid move or FEN are skipped and counted as errors
+    """
+    games = positions = errors = 0
+    start = time.perf_counter()
+    for game in read_pgn(source):
+        if max_games is not None and games + errors >= max_games:
+            break
+        try:
+            game_state = replay_game(game, state_cls, on_move)
+        except ValueError:
+            errors += 1
+            continue
+        games += 1
+        positions += len(game.moves)
+        if on_game is not None:
+            on_game(game, game_state)
+
+    return ReplayStats(games, positions, errors, time.perf_counter() - start)
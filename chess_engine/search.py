@@ -0,0 +1,319 @@
+import time
+from collections import namedtuple, Counter
+
+from .engine import STAGE_CAPTURES
+from .evaluation import evaluate
+from .ordering import MoveOrderer, mvv_lva
+from .moves import Move
+from .transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+__all__ = [
+    'Searcher',
+    'SearchResult',
+    'MATE_SCORE',
+    'INFINITY'
+]
+
+MATE_SCORE = 30000
+MATE_BOUND = MATE_SCORE - 1000  # scores beyond this are mate scores
+INFINITY = 32000
+MAX_PLY = 128
+ASPIRATION_WINDOW = 50  # centipawns either side of the previous iteration's score
+
+SearchResult = namedtuple('SearchResult', ['best_move', 'score', 'depth', 'pv', 'nodes', 'elapsed'])
+
+
+class SearchStopped(Exception):
+    """ raised inside the tree once the deadline, node budget or a stop request is hit """
+
+
+def _score_to_tt(score, ply):
+    # mate scores are stored relative to the node, not to the root
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _tablebase_score(value, ply):
+    # tablebase values count plies to mate from the probed node
+    if value > 0:
+        return MATE_SCORE - ply - value
+    if value < 0:
+        return -MATE_SCORE + ply - value - 1
+    return 0
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Searcher:
+    """
+    Iterative deepening negamax alpha-beta with principal variation search, aspiration windows and a
+    transposition table, on top of a GameState (or any state exposing the same move API).
+
+    The search stops cleanly on a wall-clock deadline, a node budget or stop(); the result of the last
+    completed depth is returned.
+    """
+
+    def __init__(self, game_state, tt=None, evaluate_fn=evaluate, orderer=None, tablebases=None):
+        self.game_state = game_state
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.tablebases = tablebases  # chess_engine.tablebase.Tablebases, probed before searching a node
+        self.evaluate = evaluate_fn
+        self.orderer = orderer if orderer is not None else MoveOrderer(MAX_PLY)
+
+        self.nodes = 0
+        self._stop = False
+        self._deadline = None
+        self._node_limit = None
+        # occurrences of the keys on the path from the game start, a repetition test is one lookup
+        self._path_keys = Counter()
+        self._pv = [[] for _ in range(MAX_PLY + 2)]
+        self._root_moves = []
+        self._root_best = None
+
+    def stop(self):
+        """ asks a running search to return, safe to call from another thread """
+        self._stop = True
+
+    def set_movetime(self, movetime):
+        """ replaces the budget of a running search by `movetime` milliseconds from now (None for no limit) """
+        self._deadline = time.perf_counter() + movetime / 1000 if movetime else None
+
+    def search(self, max_depth=MAX_PLY, movetime=None, nodes=None, on_iteration=None, history=()):
+        """
+        :param max_depth: deepest iteration to run
+        :param movetime: wall-clock budget in milliseconds, None for no limit
+        :param nodes: node budget, None for no limit
+        :param on_iteration: called with a SearchResult after every completed depth
+        :param history: keys of the positions played before the current one, for repetition detection
+        :return: SearchResult of the last completed depth
+        """
+        game_state = self.game_state
+        start = time.perf_counter()
+        self._deadline = start + movetime / 1000 if movetime else None
+        self._node_limit = nodes
+        self._stop = False
+        self.nodes = 0
+        self._path_keys = Counter(history)
+        self._root_best = None
+        self.tt.new_search()
+        self.orderer.new_search()
+
+        flags = game_state.check_mate, game_state.stale_mate
+        base_ply = len(game_state.move_logs)
+
+        # the search works on packed moves, Move objects are only built for the reported results
+        self._root_moves = game_state.generate_moves([])
+        if not self._root_moves:
+            score = -MATE_SCORE if game_state.in_check() else 0
+            return SearchResult(None, score, 0, [], 0, 0.0)
+
+        if self.tablebases is not None:
+            move, value = self.tablebases.best_packed_move(game_state)
+            if move is not None:
+                game_state.check_mate, game_state.stale_mate = flags
+                return self._to_moves(SearchResult(None, _tablebase_score(value, 0), 0, [move], 0,
+                                                   time.perf_counter() - start))
+
+        self._root_moves = self.orderer.order_moves(self._root_moves, game_state)
+        result = SearchResult(None, 0, 0, self._root_moves[:1], 0, 0.0)
+        score = 0
+        try:
+            for depth in range(1, max_depth + 1):
+                score, pv = self._aspiration(depth, score)
+                result = SearchResult(None, score, depth, pv, self.nodes, time.perf_counter() - start)
+                if on_iteration is not None:
+                    on_iteration(self._to_moves(result))
+
+                if abs(score) >= MATE_BOUND and MATE_SCORE - abs(score) <= depth:
+                    # a forced mate inside the horizon will not change with more depth
+                    break
+        except SearchStopped:
+            # unwind the moves that were on the board when the search was interrupted
+            while len(game_state.move_logs) > base_ply:
+                game_state.undo_last_move()
+            if result.depth == 0 and self._root_best is not None:
+                result = result._replace(pv=[self._root_best])
+        finally:
+            game_state.check_mate, game_state.stale_mate = flags
+
+        return self._to_moves(result._replace(nodes=self.nodes, elapsed=time.perf_counter() - start))
+
+    def _to_moves(self, result):
+        """ result with its packed PV replayed into Move objects """
+        game_state = self.game_state
+        pv = []
+        for packed in result.pv:
+            move = Move.from_packed(packed, game_state.board)
+            game_state.make_move(move)
+            pv.append(move)
+        for _ in pv:
+            game_state.undo_last_move()
+
+        return result._replace(best_move=pv[0] if pv else None, pv=pv)
+
+    def _check_limits(self):
+        if self._stop or (self._deadline is not None and time.perf_counter() >= self._deadline) or (
+                self._node_limit is not None and self.nodes >= self._node_limit):
+            self._stop = True
+            raise SearchStopped()
+
+    def _aspiration(self, depth, previous_score):
+        if depth < 4 or abs(previous_score) >= MATE_BOUND:
+            return self._search_root(depth, -INFINITY, INFINITY)
+
+        delta = ASPIRATION_WINDOW
+        alpha, beta = previous_score - delta, previous_score + delta
+        while True:
+            score, pv = self._search_root(depth, alpha, beta)
+            if score <= alpha:
+                alpha = max(score - delta, -INFINITY)
+            elif score >= beta:
+                beta = min(score + delta, INFINITY)
+            else:
+                return score, pv
+
+            delta *= 2
+            if delta > 1000:
+                alpha, beta = -INFINITY, INFINITY
+
+    def _search_root(self, depth, alpha, beta):
+        game_state = self.game_state
+        key = game_state.zobrist_key
+        alpha_orig = alpha
+        best_score = -INFINITY
+        best_index = 0
+        pv = [self._root_moves[0]]
+
+        self._path_keys[key] += 1
+        for i, move in enumerate(self._root_moves):
+            game_state.make_packed_move(move)
+            if i == 0:
+                score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self._negamax(depth - 1, -alpha - 1, -alpha, 1)
+                if alpha < score < beta:
+                    score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            game_state.undo_last_move()
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    best_index = i
+                    pv = [move] + self._pv[1]
+                    self._root_best = move
+                    if alpha >= beta:
+                        break
+        self._path_keys[key] -= 1
+
+        if best_index:
+            # the best move leads the next iteration
+            self._root_moves.insert(0, self._root_moves.pop(best_index))
+
+        bound = LOWER_BOUND if best_score >= beta else EXACT if best_score > alpha_orig else UPPER_BOUND
+        self.tt.store(key, depth, best_score, bound, pv[0])
+        return best_score, pv
+
+    def _negamax(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 63 == 0:
+            self._check_limits()
+
+        self._pv[ply] = []
+        game_state = self.game_state
+        key = game_state.zobrist_key
+        if self._path_keys[key]:
+            return 0
+
+        if self.tablebases is not None:
+            value = self.tablebases.probe(game_state)
+            if value is not None:
+                return _tablebase_score(value, ply)
+
+        if depth <= 0 or ply >= MAX_PLY:
+            return self._quiescence(alpha, beta, ply)
+
+        pv_node = beta - alpha > 1
+        hash_move = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            hash_move = entry.move
+            if entry.depth >= depth and not pv_node:
+                score = _score_from_tt(entry.score, ply)
+                if entry.bound == EXACT or (entry.bound == LOWER_BOUND and score >= beta) or (
+                        entry.bound == UPPER_BOUND and score <= alpha):
+                    return score
+
+        alpha_orig = alpha
+        best_score = -INFINITY
+        best_move = None
+
+        self._path_keys[key] += 1
+        for i, move in enumerate(self.orderer.staged_moves(game_state, ply, hash_move)):
+            game_state.make_packed_move(move)
+            if i == 0:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                score = -self._negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            game_state.undo_last_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self._pv[ply] = [move] + self._pv[ply + 1]
+                    if alpha >= beta:
+                        self.orderer.record_cutoff(move, game_state, ply, depth)
+                        break
+        self._path_keys[key] -= 1
+
+        if best_move is None:
+            # no valid move, mate or stalemate
+            return -MATE_SCORE + ply if game_state.in_check() else 0
+
+        bound = LOWER_BOUND if best_score >= beta else EXACT if best_score > alpha_orig else UPPER_BOUND
+        self.tt.store(key, depth, _score_to_tt(best_score, ply), bound, best_move)
+        return best_score
+
+    def _quiescence(self, alpha, beta, ply):
+        """ captures and promotions only, until the position is quiet """
+        self.nodes += 1
+        if self.nodes & 63 == 0:
+            self._check_limits()
+
+        self._pv[ply] = []
+        game_state = self.game_state
+        stand_pat = self.evaluate(game_state)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        board = game_state.board
+        captures = game_state.generate_moves(self.orderer.move_stack[ply], STAGE_CAPTURES)
+        captures = sorted(captures, key=lambda move: mvv_lva(move, board), reverse=True)
+
+        for move in captures:
+            game_state.make_packed_move(move)
+            score = -self._quiescence(-beta, -alpha, ply + 1)
+            game_state.undo_last_move()
+
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+                self._pv[ply] = [move] + self._pv[ply + 1]
+
+        return alpha
@@ -0,0 +1,484 @@
+import mmap
+import os
+from array import array
+from itertools import product
+
+from .engine import GameState
+from .moves import Move, PROMOTION_PIECES, SQUARE_MASK
+
+__all__ = [
+    'Tablebases',
+    'generate_tablebase',
+    'TABLEBASE_MATERIALS',
+    'ILLEGAL',
+    'DRAW'
+]
+
+# Tables are signed bytes from the point of view of the side to move :
+#   0       draw
+#   +n      win, mate in n plies
+#   -(n+1)  loss, mated in n plies (-1 is checkmated)
+#   -128    not a position (illegal, or a board stored under another symmetry)
+DRAW = 0
+ILLEGAL = -128
+MAX_PLIES = 126
+
+TABLEBASE_MATERIALS = ('KQK', 'KRK', 'KPK', 'KBNK')
+TABLEBASE_SUFFIX = '.tb'
+
+# Only "king and pieces against a bare king" sets are generated, the pieces are kept in this order
+_PIECE_ORDER = 'QRBNP'
+_NO_MATING_MATERIAL = ('', 'B', 'N')
+_NEVER = 255  # move counter of a bare king position with a drawing move, it can not be lost
+
+_ORTHOGONAL = GameState.king_directions[:4]
+_DIAGONAL = GameState.king_directions[4:]
+_SLIDES = {'Q': GameState.king_directions, 'R': _ORTHOGONAL, 'B': _DIAGONAL}
+
+
+def _transpose(sq):
+    # mirror in the a1-h8 diagonal, (file, rank) -> (rank, file)
+    r, c = divmod(sq, 8)
+    return (7 - c) * 8 + 7 - r
+
+
+def _below_diagonal(sq):
+    """ 1 below the a1-h8 diagonal (rank < file), 0 on it, -1 above """
+    r, c = divmod(sq, 8)
+    rank = 7 - r
+    return (rank < c) - (rank > c)
+
+
+def _fold(sq, pawns):
+    """ square mapping taking the white king `sq` to files a-d, and for pawnless tables to the a1-d1-d4 triangle """
+    r, c = divmod(sq, 8)
+    flip_col = c > 3
+    flip_row = not pawns and r < 4
+    r, c = (7 - r if flip_row else r), (7 - c if flip_col else c)
+    transpose = not pawns and _below_diagonal(r * 8 + c) < 0
+
+    mapping = []
+    for other in range(64):
+        other_r, other_c = divmod(other, 8)
+        folded = (7 - other_r if flip_row else other_r) * 8 + (7 - other_c if flip_col else other_c)
+        mapping.append(_transpose(folded) if transpose else folded)
+    return tuple(mapping)
+
+
+_TRIANGLE = [sq for sq in range(64) if sq & 7 <= 3 and sq >> 3 >= 4 and _below_diagonal(sq) >= 0]
+_HALF_BOARD = [sq for sq in range(64) if sq & 7 <= 3]
+_FOLDS = {pawns: [_fold(sq, pawns) for sq in range(64)] for pawns in (False, True)}
+
+
+def _sort_pieces(placed):
+    """ (pieces, squares) of a list of (piece, square) in table order """
+    placed = sorted(placed, key=lambda item: _PIECE_ORDER.index(item[0]))
+    return ''.join(piece for piece, _ in placed), tuple(sq for _, sq in placed)
+
+
+class _Layout:
+    """
+    Index of a material set : side to move, folded white king, black king, then one square per piece.
+    Boards are folded to a single representative per symmetry class, so every position has exactly one index.
+    """
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.pawns = 'P' in pieces
+        self.king_squares = _TRIANGLE if not self.pawns else _HALF_BOARD
+        self._king_index = {sq: i for i, sq in enumerate(self.king_squares)}
+        self._folds = _FOLDS[self.pawns]
+        self.side_size = len(self.king_squares) * 64 ** (len(pieces) + 1)
+        self.size = 2 * self.side_size
+
+    def index(self, white_move, wk, bk, squares):
+        fold = self._folds[wk]
+        king = fold[wk]
+        folded = [fold[bk]]
+        folded.extend(fold[sq] for sq in squares)
+        if not self.pawns and _below_diagonal(king) == 0:
+            # the king on the diagonal does not pick a side, the first piece off it does
+            for sq in folded:
+                side = _below_diagonal(sq)
+                if side:
+                    if side < 0:
+                        folded = [_transpose(sq) for sq in folded]
+                    break
+
+        index = self._king_index[king]
+        for sq in folded:
+            index = index * 64 + sq
+        return index if white_move else index + self.side_size
+
+
+class _Generator:
+    """ retrograde analysis of one material set, see generate_tablebase """
+
+    def __init__(self, pieces, sub_value):
+        self.layout = _Layout(pieces)
+        self.pieces = pieces
+        self.sub_value = sub_value
+
+        self.state = GameState()
+        self.state.board = [['--'] * 8 for _ in range(8)]
+        self.state.castling_rights = 0
+        self.state.enpassant_possible = ()
+
+    def _place(self, wk, bk, squares):
+        board = self.state.board
+        board[wk >> 3][wk & 7] = 'wK'
+        board[bk >> 3][bk & 7] = 'bK'
+        for piece, sq in zip(self.pieces, squares):
+            board[sq >> 3][sq & 7] = 'w' + piece
+        self.state.white_king_loc = divmod(wk, 8)
+        self.state.black_king_loc = divmod(bk, 8)
+
+    def _clear(self, wk, bk, squares):
+        board = self.state.board
+        for sq in (wk, bk) + squares:
+            board[sq >> 3][sq & 7] = '--'
+
+    def _moves(self, white_move):
+        self.state.white_move = white_move
+        return self.state.generate_moves([])
+
+    def run(self):
+        layout = self.layout
+        half = layout.side_size
+        values = array('b', bytes(layout.size))
+        resolved = bytearray(layout.size)
+        counts = bytearray(half)
+
+        # events by distance in plies : black positions lost, white positions won, bare king moves leaving the table
+        black_lost = [array('I')]
+        white_won = {}
+        white_exits = {}
+        black_exits = {}
+
+        index = -1
+        for king in layout.king_squares:
+            for squares in product(range(64), repeat=len(self.pieces) + 1):
+                index += 1
+                wk = king
+                bk = squares[0]
+                squares = squares[1:]
+                if not self._possible(wk, bk, squares) or layout.index(True, wk, bk, squares) != index:
+                    values[index] = values[index + half] = ILLEGAL
+                    continue
+
+                self._place(wk, bk, squares)
+                if self.state.is_square_attacked(bk >> 3, bk & 7, 'w'):
+                    # white to move with the black king in check
+                    values[index] = ILLEGAL
+                elif layout.pawns:
+                    for distance in self._promotion_wins(wk, bk, squares):
+                        white_exits.setdefault(distance, array('I')).append(index)
+                self._count_black_moves(index, wk, bk, squares, values, resolved, counts, black_lost, black_exits)
+                self._clear(wk, bk, squares)
+
+        distance = 0
+        while distance < len(black_lost) or white_won or white_exits or black_exits:
+            if distance >= MAX_PLIES:
+                raise ValueError(f"K{self.pieces}K has mates longer than {MAX_PLIES} plies")
+
+            if distance < len(black_lost):
+                won = array('I')
+                for black in black_lost[distance]:
+                    for white in self._white_predecessors(black):
+                        if not resolved[white] and values[white] != ILLEGAL:
+                            resolved[white] = 1
+                            values[white] = distance + 1
+                            won.append(white)
+                if won:
+                    white_won[distance + 1] = won
+
+            won = white_won.pop(distance, array('I'))
+            for white in white_exits.pop(distance, ()):
+                if not resolved[white]:
+                    resolved[white] = 1
+                    values[white] = distance
+                    won.append(white)
+
+            lost = array('I')
+            for white in won:
+                for black in self._black_predecessors(white):
+                    self._lose_move(black, distance, values, resolved, counts, lost)
+            for black in black_exits.pop(distance, ()):
+                self._lose_move(black, distance, values, resolved, counts, lost)
+            if lost:
+                black_lost.extend(array('I') for _ in range(distance + 2 - len(black_lost)))
+                black_lost[distance + 1] = lost
+            distance += 1
+
+        return values
+
+    def _possible(self, wk, bk, squares):
+        occupied = {wk, bk, *squares}
+        if len(occupied) != len(squares) + 2:
+            return False
+        if abs((wk >> 3) - (bk >> 3)) <= 1 and abs((wk & 7) - (bk & 7)) <= 1:
+            return False
+        # no pawn on the first or last rank
+        return all(sq >> 3 not in (0, 7) for piece, sq in zip(self.pieces, squares) if piece == 'P')
+
+    def _promotion_wins(self, wk, bk, squares):
+        """ distances of the white wins by promotion, looked up in the promoted material's table """
+        for move in self._moves(True):
+            flags = move >> 12
+            if flags & 8:
+                start_sq = move & SQUARE_MASK
+                end_sq = (move >> 6) & SQUARE_MASK
+                placed = [(piece, end_sq if sq == start_sq else sq) for piece, sq in zip(self.pieces, squares)]
+                placed[[sq for _, sq in placed].index(end_sq)] = (PROMOTION_PIECES[flags & 3], end_sq)
+                value = self.sub_value(*_sort_pieces(placed), False, wk, bk)
+                if ILLEGAL < value < 0:
+                    yield -value
+
+    def _count_black_moves(self, index, wk, bk, squares, values, resolved, counts, black_lost, black_exits):
+        layout = self.layout
+        black = index + layout.side_size
+        moves = self._moves(False)
+        if not moves:
+            resolved[black] = 1
+            if self.state.is_square_attacked(bk >> 3, bk & 7, 'w'):
+                values[black] = -1
+                black_lost[0].append(index)
+            return
+
+        successors = set()
+        count = 0
+        for move in moves:
+            end_sq = (move >> 6) & SQUARE_MASK
+            if end_sq in squares:
+                # capture, the rest of the white material decides
+                placed = [(piece, sq) for piece, sq in zip(self.pieces, squares) if sq != end_sq]
+                rest, rest_squares = _sort_pieces(placed)
+                value = self.sub_value(rest, rest_squares, True, wk, end_sq)
+                if value <= 0:
+                    counts[index] = _NEVER
+                    return
+                black_exits.setdefault(value, array('I')).append(index)
+                count += 1
+            else:
+                successors.add(layout.index(True, wk, end_sq, squares))
+        # a move counts once per distinct successor, symmetric moves reach the same index
+        counts[index] = count + len(successors)
+
+    def _lose_move(self, black, distance, values, resolved, counts, lost):
+        """ one more move of `black` is known to lose, the position is lost once all of them do """
+        if counts[black] in (0, _NEVER) or resolved[black + self.layout.side_size]:
+            # a drawing move, already decided, or not a position
+            return
+        counts[black] -= 1
+        if not counts[black]:
+            resolved[black + self.layout.side_size] = 1
+            values[black + self.layout.side_size] = -(distance + 2)
+            lost.append(black)
+
+    def _decode(self, index):
+        """ (wk, bk, squares) of an index of the white side """
+        squares = []
+        for _ in range(len(self.pieces) + 1):
+            index, sq = divmod(index, 64)
+            squares.append(sq)
+        squares.reverse()
+        return self.layout.king_squares[index], squares[0], tuple(squares[1:])
+
+    def _white_predecessors(self, black):
+        """ white to move positions one white move before the black to move position `black` """
+        layout = self.layout
+        wk, bk, squares = self._decode(black)
+        occupied = {wk, bk, *squares}
+        for i, (piece, sq) in enumerate(zip(('K',) + tuple(self.pieces), (wk,) + squares)):
+            for origin in self._origins(piece, sq, occupied):
+                if i == 0:
+                    yield layout.index(True, origin, bk, squares)
+                else:
+                    yield layout.index(True, wk, bk, squares[:i - 1] + (origin,) + squares[i:])
+
+    def _black_predecessors(self, white):
+        """ distinct black to move positions one bare king move before the white to move position `white` """
+        layout = self.layout
+        wk, bk, squares = self._decode(white)
+        occupied = {wk, bk, *squares}
+        return {layout.index(False, wk, origin, squares) - layout.side_size
+                for origin in self._origins('K', bk, occupied)}
+
+    @staticmethod
+    def _origins(piece, sq, occupied):
+        """ empty squares a white `piece` on `sq` could have come from without capturing """
+        r, c = divmod(sq, 8)
+        if piece == 'P':
+            # white pawns move up the board, towards row 0
+            if r + 1 <= 6 and (r + 1) * 8 + c not in occupied:
+                yield (r + 1) * 8 + c
+                if r == 4 and 6 * 8 + c not in occupied:
+                    yield 6 * 8 + c
+        elif piece in ('K', 'N'):
+            for dr, dc in GameState.king_directions if piece == 'K' else GameState.knight_offsets:
+                end_r, end_c = r + dr, c + dc
+                if 0 <= end_r < 8 and 0 <= end_c < 8 and end_r * 8 + end_c not in occupied:
+                    yield end_r * 8 + end_c
+        else:
+            for dr, dc in _SLIDES[piece]:
+                end_r, end_c = r + dr, c + dc
+                while 0 <= end_r < 8 and 0 <= end_c < 8 and end_r * 8 + end_c not in occupied:
+                    yield end_r * 8 + end_c
+                    end_r, end_c = end_r + dr, end_c + dc
+
+
+def _material_name(pieces):
+    return f"K{pieces}K"
+
+
+def _parse_material(material):
+    """ :return: the white pieces of a 'K...K' material name, in table order """
+    material = material.upper()
+    if len(material) < 2 or material[0] != 'K' or material[-1] != 'K' or any(
+            piece not in _PIECE_ORDER for piece in material[1:-1]):
+        raise ValueError(f"unsupported material {material!r}, expected K + pieces + K against a bare king")
+    return ''.join(sorted(material[1:-1], key=_PIECE_ORDER.index))
+
+
+def generate_tablebase(material, directory, overwrite=False):
+    """
+    Generates the table of `material` (e.g. 'KQK', 'KBNK') by retrograde analysis from the mates, with the
+    GameState move rules, and writes it to `directory` along with the tables it converts into (captures and
+    promotions). Tables already in `directory` are reused unless `overwrite`.
+
+    :return: path of the written table
+    """
+    os.makedirs(directory, exist_ok=True)
+    tables = {}
+
+    def values_of(pieces):
+        if pieces not in tables:
+            path = os.path.join(directory, _material_name(pieces) + TABLEBASE_SUFFIX)
+            if os.path.exists(path) and not (overwrite and pieces == target):
+                with open(path, 'rb') as file:
+                    values = array('b', file.read())
+            else:
+                values = _Generator(pieces, sub_value).run()
+                temp_path = f"{path}.tmp"
+                with open(temp_path, 'wb') as file:
+                    values.tofile(file)
+                os.replace(temp_path, path)
+            tables[pieces] = (_Layout(pieces), values)
+        return tables[pieces]
+
+    def sub_value(pieces, squares, white_move, wk, bk):
+        if pieces in _NO_MATING_MATERIAL:
+            return DRAW
+        layout, values = values_of(pieces)
+        return values[layout.index(white_move, wk, bk, squares)]
+
+    target = _parse_material(material)
+    values_of(target)
+    return os.path.join(directory, _material_name(target) + TABLEBASE_SUFFIX)
+
+
+class Tablebases:
+    """
+    Tables generated by generate_tablebase in `directory`, memory mapped on first use.
+    A probe is a board scan and one indexed read. Instances pickle as their directory.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}  # pieces -> (_Layout, int8 memoryview) or None if there is no such file
+        self._mmaps = []
+        self.max_pieces = 2 + max(
+            (len(name) - 2 - len(TABLEBASE_SUFFIX) for name in os.listdir(directory) if name.endswith(TABLEBASE_SUFFIX)),
+            default=0)
+
+    def __reduce__(self):
+        return self.__class__, (self.directory,)
+
+    def close(self):
+        for table in self._tables.values():
+            if table is not None:
+                table[1].release()
+        for data in self._mmaps:
+            data.close()
+        self._tables = {}
+        self._mmaps = []
+
+    def _table(self, pieces):
+        if pieces not in self._tables:
+            layout = _Layout(pieces)
+            path = os.path.join(self.directory, _material_name(pieces) + TABLEBASE_SUFFIX)
+            table = None
+            if os.path.exists(path):
+                with open(path, 'rb') as file:
+                    if os.fstat(file.fileno()).st_size != layout.size:
+                        raise ValueError(f"{path} does not hold a {_material_name(pieces)} table")
+                    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._mmaps.append(data)
+                table = (layout, memoryview(data).cast('b'))
+            self._tables[pieces] = table
+        return self._tables[pieces]
+
+    def probe(self, game_state):
+        """ :return: the table value of game_state for the side to move (see DRAW, ILLEGAL), None if not covered """
+        if game_state.castling_rights:
+            return None
+        placed = {'w': [], 'b': []}
+        kings = {}
+        count = 0
+        for r, row in enumerate(game_state.board):
+            for c, piece in enumerate(row):
+                if piece != '--':
+                    count += 1
+                    if count > self.max_pieces:
+                        return None
+                    if piece[1] == 'K':
+                        kings[piece[0]] = r * 8 + c
+                    else:
+                        placed[piece[0]].append((piece[1], r * 8 + c))
+
+        if placed['w'] and placed['b']:
+            return None
+        if not placed['w'] and not placed['b']:
+            return DRAW
+        if placed['w']:
+            white_move = game_state.white_move
+            wk, bk = kings['w'], kings['b']
+            pieces, squares = _sort_pieces(placed['w'])
+        else:
+            # the same table with the colours swapped and the board mirrored top to bottom
+            white_move = not game_state.white_move
+            wk, bk = kings['b'] ^ 56, kings['w'] ^ 56
+            pieces, squares = _sort_pieces([(piece, sq ^ 56) for piece, sq in placed['b']])
+
+        if pieces in _NO_MATING_MATERIAL:
+            return DRAW
+        table = self._table(pieces)
+        if table is None:
+            return None
+        layout, values = table
+        return values[layout.index(white_move, wk, bk, squares)]
+
+    def best_packed_move(self, game_state):
+        """ :return: (packed move, value) keeping the table result for the side to move, (None, value) if none """
+        value = self.probe(game_state)
+        if value is None:
+            return None, None
+
+        best_move = None
+        best_rank = None
+        for move in game_state.generate_moves([]):
+            game_state.make_packed_move(move)
+            reply = self.probe(game_state)
+            game_state.undo_last_move()
+            if reply is None or reply == ILLEGAL:
+                continue
+            # quickest win, else draw, else longest defence
+            rank = 1000 + reply if reply < 0 else 0 if reply == DRAW else -1000 + reply
+            if best_rank is None or rank > best_rank:
+                best_move, best_rank = move, rank
+        return best_move, value
+
+    def best_move(self, game_state):
+        """ :return: a Move keeping the table result for the side to move, None if not covered """
+        move, _ = self.best_packed_move(game_state)
+        return Move.from_packed(move, game_state.board) if move is not None else None
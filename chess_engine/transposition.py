@@ -0,0 +1,286 @@
+import mmap
+import os
+import sys
+from array import array
+from collections import namedtuple
+
+__all__ = [
+    'TranspositionTable',
+    'SharedTranspositionTable',
+    'TTEntry',
+    'EXACT',
+    'LOWER_BOUND',
+    'UPPER_BOUND'
+]
+
+# Bound types, 0 marks an empty slot
+EXACT = 1
+LOWER_BOUND = 2  # fail high, score >= beta
+UPPER_BOUND = 3  # fail low, score <= alpha
+
+# Every slot is a single 64-bit word :
+#   bits  0-15  key check (top 16 bits of the position key)
+#   bits 16-31  packed best move
+#   bits 32-47  score, offset by 2 ** 15
+#   bits 48-55  depth
+#   bits 56-57  bound type
+#   bits 58-63  age (search generation)
+_SCORE_OFFSET = 1 << 15
+_AGE_MASK = 0x3F
+
+SLOT_BYTES = 8
+SLOTS_PER_BUCKET = 2  # slot 0 is depth-preferred, slot 1 is always-replace
+
+TTEntry = namedtuple('TTEntry', ['move', 'score', 'depth', 'bound'])
+
+
+def _pack_entry(check, move, score, depth, bound, age):
+    return (check | move << 16 | (score + _SCORE_OFFSET) << 32 | depth << 48 | bound << 56 | age << 58)
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results keyed by GameState.zobrist_key.
+
+    Memory is allocated once from ``size_mb``. Each bucket holds a depth-preferred and an always-replace slot;
+    entries from older searches (see new_search) are overwritten first.
+    """
+
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        buckets = max(1, (size_mb * 1024 * 1024) // (SLOT_BYTES * SLOTS_PER_BUCKET))
+        # round down to a power of two so the bucket index is a mask of the key
+        self.buckets = 1 << (buckets.bit_length() - 1)
+        self._mask = self.buckets - 1
+        self._table = array('Q', bytes(self.buckets * SLOTS_PER_BUCKET * SLOT_BYTES))
+
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """ starts a new generation, entries of older ones become the first candidates for replacement """
+        self.age = (self.age + 1) & _AGE_MASK
+
+    def clear(self):
+        self._table = array('Q', bytes(len(self._table) * SLOT_BYTES))
+        self.age = self.probes = self.hits = self.stores = 0
+
+    def probe(self, key):
+        """ :return: TTEntry for the position or None """
+        self.probes += 1
+        check = key >> 48
+        index = (key & self._mask) * SLOTS_PER_BUCKET
+        table = self._table
+
+        for slot in (index, index + 1):
+            data = table[slot]
+            if data and data & 0xFFFF == check:
+                self.hits += 1
+                return TTEntry(
+                    (data >> 16) & 0xFFFF,
+                    ((data >> 32) & 0xFFFF) - _SCORE_OFFSET,
+                    (data >> 48) & 0xFF,
+                    (data >> 56) & 0x3
+                )
+        return None
+
+    def store(self, key, depth, score, bound, move=0):
+        """
+        :param key: position key
+        :param depth: remaining search depth of the result, 0-255
+        :param score: score from the side to move's point of view, must fit in 16 signed bits
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param move: packed best move (see chess_engine.moves), 0 if unknown
+        """
+        self.stores += 1
+        check = key >> 48
+        index = (key & self._mask) * SLOTS_PER_BUCKET
+        table = self._table
+        age = self.age
+
+        preferred = table[index]
+        if preferred and preferred & 0xFFFF == check:
+            # same position, keep the deeper result unless the new one is exact
+            if depth >= (preferred >> 48) & 0xFF or bound == EXACT:
+                table[index] = _pack_entry(check, move or (preferred >> 16) & 0xFFFF, score, depth, bound, age)
+            return
+
+        if not preferred or (preferred >> 58) != age or depth >= (preferred >> 48) & 0xFF:
+            # demote the displaced entry into the always-replace slot
+            if preferred:
+                table[index + 1] = preferred
+            table[index] = _pack_entry(check, move, score, depth, bound, age)
+        else:
+            replace = table[index + 1]
+            if replace and replace & 0xFFFF == check and not move:
+                move = (replace >> 16) & 0xFFFF
+            table[index + 1] = _pack_entry(check, move, score, depth, bound, age)
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def hashfull(self):
+        """ permille of the first 1000 slots used by the current search, as reported by UCI engines """
+        sample = min(1000, len(self._table))
+        age = self.age
+        used = sum(1 for data in self._table[:sample] if data and (data >> 58) == age)
+        return used * 1000 // sample
+
+
+# shared slots are two words, see SharedTranspositionTable
+_SHARED_BUCKET_BYTES = SLOT_BYTES * 2 * SLOTS_PER_BUCKET
+
+
+def _attach_shared_memory(name):
+    from multiprocessing import resource_tracker, shared_memory
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+
+    # before 3.13 attaching registers the block with the resource tracker, which would unlink it when this
+    # process exits, under the feet of its creator
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    TranspositionTable in memory shared between processes, so several searches of the same position (Lazy SMP,
+    ParallelPool workers) fill and use one cache.
+
+    The table lives in a multiprocessing.shared_memory block, or in a memory mapped file when `path` is given.
+    Pass the `name` (or `path`) of an existing table to attach to it; instances pickle as such a reference.
+
+    Access is lockless : a slot is the pair (key ^ data, data) and a probe only trusts data whose XOR with the
+    first word gives back the full key. A slot torn by concurrent writers fails that test and reads as a miss.
+    Statistics (probes, hits, stores) and the age are per process.
+    """
+
+    def __init__(self, size_mb=16, name=None, path=None):
+        self.size_mb = size_mb
+        self.path = path
+        self._shm = self._mmap = None
+
+        size = max(1, (size_mb * 1024 * 1024) // _SHARED_BUCKET_BYTES) * _SHARED_BUCKET_BYTES
+        if path is not None:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                size = os.fstat(fd).st_size
+                self._mmap = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            buffer = self._mmap
+        elif name is None:
+            # imported here, plain tables do not load multiprocessing
+            from multiprocessing import shared_memory
+
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            buffer = self._shm.buf
+        else:
+            self._shm = _attach_shared_memory(name)
+            size = self._shm.size
+            buffer = self._shm.buf
+
+        # the block may be rounded up to whole pages, only use a power of two of buckets
+        buckets = size // _SHARED_BUCKET_BYTES
+        self.buckets = 1 << (buckets.bit_length() - 1)
+        self._mask = self.buckets - 1
+        self._bytes = memoryview(buffer)[:self.buckets * _SHARED_BUCKET_BYTES]
+        self._table = self._bytes.cast('Q')
+
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    @property
+    def name(self):
+        """ name of the shared memory block, None for a file backed table """
+        return self._shm.name if self._shm is not None else None
+
+    def __reduce__(self):
+        return self.__class__, (self.size_mb, self.name, self.path)
+
+    def close(self):
+        """ detaches this process from the table """
+        self._table.release()
+        self._bytes.release()
+        if self._shm is not None:
+            self._shm.close()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def unlink(self):
+        """ frees the table once every process closed it, call it once from the creator """
+        if self._shm is not None:
+            self._shm.unlink()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def clear(self):
+        self._bytes[:] = bytes(len(self._bytes))
+        self.age = self.probes = self.hits = self.stores = 0
+
+    def probe(self, key):
+        """ :return: TTEntry for the position or None """
+        self.probes += 1
+        index = (key & self._mask) * SLOTS_PER_BUCKET * 2
+        table = self._table
+
+        for slot in (index, index + 2):
+            data = table[slot + 1]
+            if data and table[slot] ^ data == key:
+                self.hits += 1
+                return TTEntry(
+                    (data >> 16) & 0xFFFF,
+                    ((data >> 32) & 0xFFFF) - _SCORE_OFFSET,
+                    (data >> 48) & 0xFF,
+                    (data >> 56) & 0x3
+                )
+        return None
+
+    def store(self, key, depth, score, bound, move=0):
+        """ same replacement scheme as TranspositionTable.store """
+        self.stores += 1
+        check = key >> 48
+        index = (key & self._mask) * SLOTS_PER_BUCKET * 2
+        table = self._table
+        age = self.age
+
+        preferred = table[index + 1]
+        if preferred and table[index] ^ preferred == key:
+            if depth >= (preferred >> 48) & 0xFF or bound == EXACT:
+                data = _pack_entry(check, move or (preferred >> 16) & 0xFFFF, score, depth, bound, age)
+                table[index] = key ^ data
+                table[index + 1] = data
+            return
+
+        data = _pack_entry(check, move, score, depth, bound, age)
+        if not preferred or (preferred >> 58) != age or depth >= (preferred >> 48) & 0xFF:
+            # demote the displaced entry into the always-replace slot
+            if preferred:
+                table[index + 2] = table[index]
+                table[index + 3] = preferred
+            table[index] = key ^ data
+            table[index + 1] = data
+        else:
+            replace = table[index + 3]
+            if replace and table[index + 2] ^ replace == key and not move:
+                data = _pack_entry(check, (replace >> 16) & 0xFFFF, score, depth, bound, age)
+            table[index + 2] = key ^ data
+            table[index + 3] = data
+
+    def hashfull(self):
+        sample = min(1000, len(self._table) // 2)
+        age = self.age
+        table = self._table
+        used = sum(1 for slot in range(1, sample * 2, 2) if table[slot] and (table[slot] >> 58) == age)
+        return used * 1000 // sample
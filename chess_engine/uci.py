@@ -0,0 +1,286 @@
+import sys
+import threading
+
+from .engine import GameState
+from .moves import PROMOTION_PIECES, SQUARE_MASK
+from .search import Searcher, MATE_SCORE, MATE_BOUND, MAX_PLY
+from .transposition import TranspositionTable
+
+__all__ = [
+    'UCIEngine',
+    'move_to_uci',
+    'parse_uci_move',
+    'time_budget'
+]
+
+ENGINE_NAME = 'Ai-ChessEngine'
+ENGINE_AUTHOR = 'foo290'
+
+MOVE_OVERHEAD = 30  # milliseconds kept back for the pipe and the GUI on every move
+MOVES_TO_GO = 30  # moves the remaining time is shared between without a movestogo
+
+_GO_VALUES = ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'depth', 'nodes', 'movetime', 'mate')
+
+
+def move_to_uci(move):
+    """ long algebraic notation of a packed move : e2e4, e1g1, e7e8q """
+    start_sq = move & SQUARE_MASK
+    end_sq = (move >> 6) & SQUARE_MASK
+    text = ('abcdefgh'[start_sq & 7] + str(8 - (start_sq >> 3)) +
+            'abcdefgh'[end_sq & 7] + str(8 - (end_sq >> 3)))
+    flags = move >> 12
+    if flags & 8:
+        text += PROMOTION_PIECES[flags & 3].lower()
+    return text
+
+
+def parse_uci_move(game_state, text, moves=None):
+    """
+    :param moves: packed valid moves of the position if already generated
+    :return: the packed valid move written `text` in long algebraic notation
+    :raises ValueError: if it is not a valid move of game_state
+    """
+    if moves is None:
+        moves = game_state.generate_moves([])
+    for move in moves:
+        if move_to_uci(move) == text:
+            return move
+    raise ValueError(f"illegal move {text!r} in {game_state.to_fen()}")
+
+
+def time_budget(time_left, increment=0, moves_to_go=None, overhead=MOVE_OVERHEAD):
+    """ milliseconds to spend on this move out of `time_left`, never more than the clock minus the overhead """
+    budget = time_left / (moves_to_go or MOVES_TO_GO) + increment * 3 / 4
+    return max(1, int(min(budget, time_left - overhead)))
+
+
+def _uci_score(score):
+    if abs(score) >= MATE_BOUND:
+        moves = (MATE_SCORE - abs(score) + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+class UCIEngine:
+    """
+    Universal Chess Interface front end. Commands are read and answered on the calling thread while searches run
+    on a worker thread, so stop, isready and ponderhit are handled at once during a search. Search progress is
+    streamed as info lines after every completed depth.
+
+    :param state_cls: GameState or BitboardGameState
+    """
+
+    def __init__(self, input=sys.stdin, output=sys.stdout, state_cls=GameState):
+        self.input = input
+        self.output = output
+        self.state_cls = state_cls
+
+        self.hash_mb = 16
+        self.tt = TranspositionTable(self.hash_mb)
+        self.move_overhead = MOVE_OVERHEAD
+        self.book = None
+        self.tablebases = None
+
+        self.game_state = state_cls()
+        self.history = []  # keys of the positions before the current one, for repetition detection
+
+        self._output_lock = threading.Lock()
+        self._searcher = None
+        self._thread = None
+        self._release = threading.Event()  # set once bestmove may be sent, see _cmd_go
+        self._ponder_budget = None
+
+    def send(self, line):
+        with self._output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self):
+        """ handles commands until quit or the end of the input """
+        for line in self.input:
+            if not self.handle(line):
+                break
+        self._stop_search()
+
+    def handle(self, line):
+        """ :return: False on quit """
+        tokens = line.split()
+        if not tokens:
+            return True
+        if tokens[0] == 'quit':
+            return False
+        command = getattr(self, '_cmd_' + tokens[0], None)
+        if command is None:
+            self.send(f"info string unknown command {tokens[0]}")
+        else:
+            command(tokens[1:])
+        return True
+
+    def _cmd_uci(self, args):
+        self.send(f"id name {ENGINE_NAME}")
+        self.send(f"id author {ENGINE_AUTHOR}")
+        self.send("option name Hash type spin default 16 min 1 max 4096")
+        self.send(f"option name Move Overhead type spin default {MOVE_OVERHEAD} min 0 max 5000")
+        self.send("option name Ponder type check default false")
+        self.send("option name BookFile type string default <empty>")
+        self.send("option name TablebasePath type string default <empty>")
+        self.send("uciok")
+
+    def _cmd_debug(self, args):
+        pass
+
+    def _cmd_isready(self, args):
+        self.send("readyok")
+
+    def _cmd_setoption(self, args):
+        text = ' '.join(args)
+        if not text.startswith('name '):
+            return
+        name, _, value = text[5:].partition(' value ')
+        name = name.strip().lower()
+        value = value.strip()
+
+        self._stop_search()
+        try:
+            if name == 'hash':
+                self.hash_mb = max(1, int(value))
+                self.tt = TranspositionTable(self.hash_mb)
+            elif name == 'move overhead':
+                self.move_overhead = max(0, int(value))
+            elif name == 'bookfile':
+                from .book import OpeningBook
+
+                self.book = OpeningBook(value) if value and value != '<empty>' else None
+            elif name == 'tablebasepath':
+                from .tablebase import Tablebases
+
+                self.tablebases = Tablebases(value) if value and value != '<empty>' else None
+        except (OSError, ValueError) as error:
+            self.send(f"info string option {name} : {error}")
+
+    def _cmd_ucinewgame(self, args):
+        self._stop_search()
+        self.tt.clear()
+
+    def _cmd_position(self, args):
+        self._stop_search()
+        if 'moves' in args:
+            split = args.index('moves')
+            args, moves = args[:split], args[split + 1:]
+        else:
+            moves = []
+
+        try:
+            if args and args[0] == 'fen':
+                game_state = self.state_cls.from_fen(' '.join(args[1:]))
+            else:
+                game_state = self.state_cls()
+        except ValueError as error:
+            self.send(f"info string {error}")
+            return
+
+        history = []
+        for text in moves:
+            try:
+                move = parse_uci_move(game_state, text)
+            except ValueError as error:
+                self.send(f"info string {error}")
+                break
+            history.append(game_state.zobrist_key)
+            game_state.make_packed_move(move)
+
+        self.game_state = game_state
+        self.history = history
+
+    def _cmd_go(self, args):
+        self._stop_search()
+        options = {}
+        for i, token in enumerate(args):
+            if token in _GO_VALUES and i + 1 < len(args):
+                try:
+                    options[token] = int(args[i + 1])
+                except ValueError:
+                    pass
+        infinite = 'infinite' in args
+        ponder = 'ponder' in args
+
+        if self.book is not None and not (infinite or ponder):
+            move = self.book.choose(self.game_state)
+            if move is not None:
+                self.send(f"bestmove {move_to_uci(move.packed)}")
+                return
+
+        white = self.game_state.white_move
+        clock = options.get('wtime' if white else 'btime')
+        if 'movetime' in options:
+            budget = max(1, options['movetime'] - self.move_overhead)
+        elif clock is not None:
+            budget = time_budget(clock, options.get('winc' if white else 'binc', 0), options.get('movestogo'),
+                                 self.move_overhead)
+        else:
+            budget = None
+        max_depth = options.get('depth', MAX_PLY)
+        if 'mate' in options:
+            max_depth = min(max_depth, 2 * options['mate'])
+
+        # infinite and ponder searches hold their bestmove back until stop or ponderhit
+        self._ponder_budget = budget if ponder else None
+        if infinite or ponder:
+            self._release.clear()
+            budget = None
+        else:
+            self._release.set()
+
+        self._searcher = Searcher(self.game_state, tt=self.tt, tablebases=self.tablebases)
+        self._thread = threading.Thread(
+            target=self._search, args=(self._searcher, max_depth, budget, options.get('nodes')), daemon=True)
+        self._thread.start()
+
+    def _search(self, searcher, max_depth, movetime, nodes):
+        """ always answers with a bestmove : should the search fail, the first valid move, or 0000 without one """
+        game_state = searcher.game_state
+        ply = len(game_state.move_logs)
+        moves = game_state.generate_moves([])
+        bestmove = move_to_uci(moves[0]) if moves else "0000"
+        try:
+            result = searcher.search(max_depth, movetime=movetime, nodes=nodes, on_iteration=self._info,
+                                     history=self.history)
+            if len(result.pv) > 1:
+                bestmove = f"{move_to_uci(result.pv[0].packed)} ponder {move_to_uci(result.pv[1].packed)}"
+            elif result.best_move is not None:
+                bestmove = move_to_uci(result.best_move.packed)
+        except Exception as error:
+            self.send(f"info string search failed : {error!r}")
+            # the moves the search was inside of are taken back, the position stays usable
+            while len(game_state.move_logs) > ply:
+                game_state.undo_last_move()
+        finally:
+            self._release.wait()
+            self.send(f"bestmove {bestmove}")
+
+    def _info(self, result):
+        elapsed = max(result.elapsed, 1e-6)
+        pv = ' '.join(move_to_uci(move.packed) for move in result.pv)
+        self.send(f"info depth {result.depth} score {_uci_score(result.score)} nodes {result.nodes} "
+                  f"nps {int(result.nodes / elapsed)} time {int(result.elapsed * 1000)} pv {pv}")
+
+    def _cmd_ponderhit(self, args):
+        # the predicted move was played, the ponder search goes on as a normal search on the clock
+        if self._searcher is not None:
+            self._searcher.set_movetime(self._ponder_budget)
+        self._release.set()
+
+    def _cmd_stop(self, args):
+        self._stop_search()
+
+    def _stop_search(self):
+        thread = self._thread
+        if thread is None:
+            return
+        self._release.set()
+        while thread.is_alive():
+            # repeated, a stop landing before the search started would be reset by it
+            self._searcher.stop()
+            thread.join(0.005)
+        self._thread = None
+
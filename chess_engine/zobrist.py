@@ -0,0 +1,49 @@
+import random
+
+__all__ = [
+    'PIECE_KEYS',
+    'ENPASSANT_KEYS',
+    'SIDE_KEY',
+    'CASTLING_KEYS',
+    'compute_hash'
+]
+
+# Fixed seed, so keys are identical across runs and processes (hash tables, books and tablebases stay valid).
+_rng = random.Random(0x2F1C_9A6B_53D4_E807)
+
+# PIECE_KEYS['wP'][row * 8 + col]
+PIECE_KEYS = {
+    piece: [_rng.getrandbits(64) for _ in range(64)]
+    for piece in ('wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK')
+}
+ENPASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)]  # by column of the en passant square
+SIDE_KEY = _rng.getrandbits(64)  # present when black is to move
+
+# CASTLING_KEYS[rights] for the castling rights bitmask of chess_engine.moves, the XOR of one key per right
+_CASTLING_RIGHT_KEYS = [_rng.getrandbits(64) for _ in range(4)]
+CASTLING_KEYS = [0] * 16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights >> _bit & 1:
+            CASTLING_KEYS[_rights] ^= _CASTLING_RIGHT_KEYS[_bit]
+
+
+def compute_hash(board, white_move, enpassant_possible, castling_rights=0):
+    """
+    Computes the position key from scratch. Game states keep their key up to date incrementally,
+    this is for initialisation and for verifying the incremental key.
+    """
+    key = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece != '--':
+                key ^= PIECE_KEYS[piece][r * 8 + c]
+
+    if enpassant_possible:
+        key ^= ENPASSANT_KEYS[enpassant_possible[1]]
+    key ^= CASTLING_KEYS[castling_rights]
+    if not white_move:
+        key ^= SIDE_KEY
+
+    return key
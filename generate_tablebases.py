@@ -0,0 +1,24 @@
+import argparse
+import sys
+import time
+
+from chess_engine.tablebase import generate_tablebase, TABLEBASE_MATERIALS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates endgame tablebases by retrograde analysis.")
+    parser.add_argument('directory', help="directory the tables are written to")
+    parser.add_argument('materials', nargs='*', default=list(TABLEBASE_MATERIALS),
+                        help=f"material sets against a bare king (default: {' '.join(TABLEBASE_MATERIALS)})")
+    parser.add_argument('--overwrite', action='store_true', help="regenerate tables already in the directory")
+    args = parser.parse_args(argv)
+
+    for material in args.materials:
+        start = time.perf_counter()
+        path = generate_tablebase(material, args.directory, overwrite=args.overwrite)
+        print(f"{material:<8}{path}  {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
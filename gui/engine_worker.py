@@ -0,0 +1,110 @@
+import threading
+from collections import deque
+
+__all__ = [
+    "EngineWorker",
+    "Job",
+    "snapshot"
+]
+
+
+def snapshot(game_state):
+    """
+    Private copy of game_state for a background job : its start position replayed with the same moves, so the
+    move logs and castling / en passant history match. The GUI keeps playing on the original meanwhile.
+
+    :return: (copy, keys of the positions before the current one)
+    """
+    copy = type(game_state).from_fen(game_state.start_fen)
+    history = []
+    for move in game_state.move_logs:
+        history.append(copy.zobrist_key)
+        copy.make_packed_move(move.packed)
+    return copy, history
+
+
+class Job:
+    """
+    Handle of a job submitted to an EngineWorker. Poll done() from the GUI loop, then read result().
+
+    :param on_cancel: called by cancel() while the job runs, to interrupt it (Searcher.stop for a search)
+    """
+
+    def __init__(self, fn, args, on_cancel=None):
+        self.fn = fn
+        self.args = args
+        self.on_cancel = on_cancel
+        self.cancelled = False
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def cancel(self):
+        """ the job is skipped if it did not start yet, interrupted otherwise; its result is never used """
+        self.cancelled = True
+        if self.on_cancel is not None and not self._done.is_set():
+            self.on_cancel()
+
+    def done(self):
+        return self._done.is_set() and not self.cancelled
+
+    def result(self, timeout=None):
+        """ :raises: the exception the job raised """
+        self._done.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self):
+        if not self.cancelled:
+            try:
+                self._result = self.fn(*self.args)
+            except Exception as error:
+                self._error = error
+        self._done.set()
+
+
+class EngineWorker:
+    """
+    One background thread running engine jobs (valid moves, searches, analysis) in submission order, so the pygame
+    loop keeps drawing and handling events at its frame rate while the engine works. Jobs must work on their own
+    GameState, see snapshot.
+    """
+
+    def __init__(self):
+        self._jobs = deque()
+        self._wakeup = threading.Condition()
+        self._closed = False
+        self._current = None
+        self._thread = threading.Thread(target=self._loop, name="EngineWorker", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, on_cancel=None):
+        """ :return: Job running fn(*args) """
+        job = Job(fn, args, on_cancel)
+        with self._wakeup:
+            self._jobs.append(job)
+            self._wakeup.notify()
+        return job
+
+    def close(self):
+        """ cancels the running and queued jobs, the thread ends once the running one returns """
+        with self._wakeup:
+            for job in self._jobs:
+                job.cancel()
+            if self._current is not None:
+                self._current.cancel()
+            self._closed = True
+            self._wakeup.notify()
+
+    def _loop(self):
+        while True:
+            with self._wakeup:
+                while not self._jobs and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                job = self._current = self._jobs.popleft()
+            job._run()
+            with self._wakeup:
+                self._current = None
@@ -1,9 +1,11 @@
-from chess_engine import GameState, Move
+# the logger package configures the engine's loggers when imported, it comes before the engine
+from logger.logger import get_custom_logger
+from chess_engine import GameState, Move, Searcher, TranspositionTable
 import pygame
 import os
+from .engine_worker import EngineWorker, snapshot
 from .ui_effects import theme, Colors
 from typing import List
-from logger.logger import get_custom_logger
 
 log = get_custom_logger("ChessEngine")
 
@@ -12,12 +14,24 @@ __all__ = [
 ]
 
 
+def _valid_moves_job(game_state):
+    moves = game_state.get_valid_moves()
+    return moves, game_state.check_mate, game_state.stale_mate
+
+
+def _search_job(searcher, movetime, history):
+    return searcher.search(movetime=movetime, history=history).best_move
+
+
 class GuiManager:
     WIDTH = HEIGHT = 780
     DIMENSIONS = 8
     SQ_SIZE = HEIGHT // DIMENSIONS
 
     MAX_FPS = 15
+    ANIMATION_FPS = 60
+    ANIMATION_FRAMES_PER_SQUARE = 5
+    AI_MOVETIME = 1000  # milliseconds per AI move
     IMAGES = {}
 
     def __init__(self):
@@ -40,6 +54,28 @@ class GuiManager:
         self.board_clr = self.default_board_clr
         self.flip_colors_mode = False
         self.all_themes = theme.get_all_themes()
+        self.color_flip_mode_index = 0
+
+        # engine work runs on the worker thread, the main loop polls the jobs once per frame
+        self.worker = EngineWorker()
+        self.tt = TranspositionTable()
+        self.ai_players = set()  # white_move values the engine plays
+        self.valid_moves = []
+        self.moves_job = None
+        self.ai_job = None
+        self.animation = None  # (move, start time in ms) while a move slides to its square
+
+        # frames only repaint what changed : _drawn holds the (piece, highlight) last drawn on every square
+        self.moves_from = {}  # (row, col) -> set of target squares of the valid moves
+        self.highlights = {}
+        self.font = None
+        self._texts = {}
+        self._board_surfaces = {}  # theme colours -> pre-rendered empty board
+        self._drawn = [None] * (self.DIMENSIONS * self.DIMENSIONS)
+        self._drawn_theme = None
+        self._drawn_turn = None
+        self._drawn_text = None
+        self._sprite_rect = None
 
     def set_board_color(self, color: List[Colors]):
         self.board_clr = color
@@ -50,96 +86,272 @@ class GuiManager:
     def turn_off_color_flips(self):
         self.flip_colors_mode = False
 
+    def set_ai_players(self, white=False, black=True):
+        self.ai_players = {colour for colour, enabled in ((True, white), (False, black)) if enabled}
+
     def highlight_turn(self, turn):
-        if turn:
-            pygame.draw.rect(self.screen, pygame.Color('red'), pygame.Rect(0, 0, self.WIDTH, 5))
-            pygame.draw.rect(self.screen, pygame.Color('green'), pygame.Rect(0, self.HEIGHT-5, self.WIDTH, 5))
-        else:
-            pygame.draw.rect(self.screen, pygame.Color('green'), pygame.Rect(0, 0, self.WIDTH, 5))
-            pygame.draw.rect(self.screen, pygame.Color('red'), pygame.Rect(0, self.HEIGHT - 5, self.WIDTH, 5))
+        """ red and green bars at the top and bottom edges, :return: their Rects """
+        top = pygame.Rect(0, 0, self.WIDTH, 5)
+        bottom = pygame.Rect(0, self.HEIGHT - 5, self.WIDTH, 5)
+        pygame.draw.rect(self.screen, pygame.Color('red' if turn else 'green'), top)
+        pygame.draw.rect(self.screen, pygame.Color('green' if turn else 'red'), bottom)
+        return [top, bottom]
+
+    def atlas_path(self):
+        return os.path.join(self.pieces_dir, f".atlas_{self.SQ_SIZE}.png")
+
+    def build_atlas(self):
+        """ :return: Surface of the 12 piece images side by side, in self.pieces order, scaled to SQ_SIZE """
+        atlas = pygame.Surface((self.SQ_SIZE * len(self.pieces), self.SQ_SIZE), pygame.SRCALPHA)
+        for i, piece in enumerate(self.pieces):
+            image = pygame.image.load(os.path.join(self.pieces_dir, f"{piece}.png")).convert_alpha()
+            atlas.blit(pygame.transform.smoothscale(image, (self.SQ_SIZE, self.SQ_SIZE)), (i * self.SQ_SIZE, 0))
+        return atlas
+
+    def load_atlas(self):
+        """
+        The piece atlas for SQ_SIZE : one image decoded from the cache file when it is newer than every piece
+        image, otherwise built and written to the cache for the next launch.
+        """
+        path = self.atlas_path()
+        sources = [os.path.join(self.pieces_dir, f"{piece}.png") for piece in self.pieces]
+        try:
+            if os.path.getmtime(path) >= max(os.path.getmtime(source) for source in sources):
+                atlas = pygame.image.load(path).convert_alpha()
+                if atlas.get_size() == (self.SQ_SIZE * len(self.pieces), self.SQ_SIZE):
+                    return atlas
+        except (OSError, pygame.error):
+            pass
+
+        atlas = self.build_atlas()
+        temp_path = f"{path[:-4]}.{os.getpid()}.png"
+        try:
+            pygame.image.save(atlas, temp_path)
+            os.replace(temp_path, path)
+        except (OSError, pygame.error) as error:
+            log.warning(f"Piece atlas not cached : {error}")
+        return atlas
 
     def load_images(self):
-        for piece in self.pieces:
-            self.IMAGES[piece] = pygame.transform.scale(
-                pygame.image.load(
-                    os.path.join(self.pieces_dir, f"{piece}.png")), (self.SQ_SIZE, self.SQ_SIZE)
-            )
-
-    def highlight_move(self, game_state: GameState, valid_move, square_selected):
+        atlas = self.load_atlas()
+        for i, piece in enumerate(self.pieces):
+            self.IMAGES[piece] = atlas.subsurface((i * self.SQ_SIZE, 0, self.SQ_SIZE, self.SQ_SIZE))
+
+        self.highlights = {}
+        for name, colour in (('selected', 'blue'), ('target', 'green')):
+            s = pygame.Surface((self.SQ_SIZE, self.SQ_SIZE))
+            s.set_alpha(50)
+            s.fill(pygame.Color(colour))
+            self.highlights[name] = s
+
+    def board_surface(self):
+        """ the empty board in the current theme, rendered once per theme """
+        key = tuple(tuple(colour) for colour in self.board_clr)
+        surface = self._board_surfaces.get(key)
+        if surface is None:
+            surface = pygame.Surface((self.WIDTH, self.HEIGHT)).convert()
+            for r in range(self.DIMENSIONS):
+                for c in range(self.DIMENSIONS):
+                    surface.fill(self.board_clr[(r + c) % 2], self.square_rect(r, c))
+            self._board_surfaces[key] = surface
+        return surface
+
+    def square_rect(self, r, c):
+        return pygame.Rect(c * self.SQ_SIZE, r * self.SQ_SIZE, self.SQ_SIZE, self.SQ_SIZE)
+
+    def index_moves(self, valid_moves):
+        """ target squares of valid_moves per start square, so highlighting a selection does not scan the list """
+        self.moves_from = {}
+        for move in valid_moves:
+            self.moves_from.setdefault((move.start_row, move.start_col), set()).add((move.end_row, move.end_col))
+
+    def invalidate(self, rect=None):
+        """ the squares under `rect` (all squares if None) are repainted on the next frame """
+        if rect is None:
+            self._drawn = [None] * (self.DIMENSIONS * self.DIMENSIONS)
+            self._drawn_turn = self._drawn_text = None
+            return
+        last = self.DIMENSIONS - 1
+        for r in range(max(0, rect.top // self.SQ_SIZE), min(last, (rect.bottom - 1) // self.SQ_SIZE) + 1):
+            for c in range(max(0, rect.left // self.SQ_SIZE), min(last, (rect.right - 1) // self.SQ_SIZE) + 1):
+                self._drawn[r * self.DIMENSIONS + c] = None
+
+    def get_text(self, text):
+        """ :return: (Surface, Rect) of `text` centered on the board, rendered once """
+        if text not in self._texts:
+            if self.font is None:
+                self.font = pygame.font.SysFont("Helvetica", 32, True, False)
+            text_object = self.font.render(text, False, pygame.Color((255, 89, 223)))
+            text_loc = text_object.get_rect(center=(self.WIDTH // 2, self.HEIGHT // 2))
+            self._texts[text] = (text_object, text_loc)
+        return self._texts[text]
+
+    def draw_square(self, r, c, piece, highlight, board_surface):
+        rect = self.square_rect(r, c)
+        if highlight == 'animation':
+            # landing square of the animated move, the captured piece stays until the mover arrives
+            pygame.draw.rect(self.screen, pygame.Color('white'), rect)
+        else:
+            self.screen.blit(board_surface, rect, rect)
+            if highlight is not None:
+                self.screen.blit(self.highlights[highlight], rect)
+        if piece != '--':
+            self.screen.blit(self.IMAGES[piece], rect)
+        return rect
+
+    def draw_game_state(self, game_state, square_selected):
+        """ repaints the squares whose piece, highlight or theme changed since the last frame, :return: their Rects """
+        theme_key = tuple(tuple(colour) for colour in self.board_clr)
+        if theme_key != self._drawn_theme:
+            self._drawn_theme = theme_key
+            self.invalidate()
+
+        board = game_state.board
+        selected = None
+        targets = ()
         if square_selected:
             r, c = square_selected
-
-            if game_state.board[r][c][0] == ('w' if game_state.white_move else 'b'):
-                s = pygame.Surface((self.SQ_SIZE, self.SQ_SIZE))
-                s.set_alpha(50)
-                s.fill(pygame.Color('blue'))
-                self.screen.blit(s, (c * self.SQ_SIZE, r * self.SQ_SIZE))
-
-                s.fill(pygame.Color('green'))
-                for move in valid_move:
-                    if move.start_row == r and move.start_col == c:
-                        self.screen.blit(s, (move.end_col * self.SQ_SIZE, move.end_row * self.SQ_SIZE))
-
-    def draw_text(self, text):
-        font = pygame.font.SysFont("Helvetica", 32, True, False)
-        text_object = font.render(text, False, pygame.Color((255, 89, 223)))
-
-        text_loc = pygame.Rect(0, 0, self.WIDTH, self.HEIGHT).move(
-            self.WIDTH / 2 - text_object.get_width() / 2,
-            self.HEIGHT / 2 - text_object.get_height() / 2
-        )
-
-        self.screen.blit(text_object, text_loc)
-
-    def draw_game_state(self, game_state, valid_move, square_selected):
-        self.draw_board()
-        self.highlight_move(game_state, valid_move, square_selected)
-        self.draw_pieces(game_state.board)
-
-    def draw_board(self):
-        for r in range(self.DIMENSIONS):
-            for c in range(self.DIMENSIONS):
-                color = self.board_clr[(r + c) % 2]
-                pygame.draw.rect(
-                    self.screen, color, pygame.Rect(c * self.SQ_SIZE, r * self.SQ_SIZE, self.SQ_SIZE, self.SQ_SIZE)
-                )
-
-    def draw_pieces(self, board):
+            if board[r][c][0] == ('w' if game_state.white_move else 'b'):
+                selected = square_selected
+                targets = self.moves_from.get(square_selected, ())
+        landing = None
+        if self.animation is not None:
+            move = self.animation[0]
+            landing = (move.end_row, move.end_col)
+
+        board_surface = self.board_surface()
+        drawn = self._drawn
+        dirty = []
         for r in range(self.DIMENSIONS):
+            row = board[r]
             for c in range(self.DIMENSIONS):
-                piece = board[r][c]
-                if piece != '--':
-                    self.screen.blit(
-                        self.IMAGES[piece], pygame.Rect(c * self.SQ_SIZE, r * self.SQ_SIZE, self.SQ_SIZE, self.SQ_SIZE)
-                    )
-
-    def animate_move(self, move, board, clock):
+                square = (r, c)
+                if square == landing:
+                    key = (self.animation[0].piece_captured, 'animation')
+                elif square == selected:
+                    key = (row[c], 'selected')
+                elif square in targets:
+                    key = (row[c], 'target')
+                else:
+                    key = (row[c], None)
+                index = r * self.DIMENSIONS + c
+                if drawn[index] != key:
+                    drawn[index] = key
+                    dirty.append(self.draw_square(r, c, key[0], key[1], board_surface))
+        return dirty
+
+    def animate_move(self, move):
+        """ starts sliding `move`, already made on the board, to its square; draw_animation draws the frames """
+        self.animation = (move, pygame.time.get_ticks())
+
+    def animation_position(self):
+        """ :return: (row, col) of the sliding piece, fractional, or None once it has arrived """
+        move, start = self.animation
         dr = move.end_row - move.start_row
         dc = move.end_col - move.start_col
 
-        fps = 5
-        frame_count = (abs(dr) + abs(dc)) * fps
-
-        for frame in range(frame_count + 1):
-            r, c = (move.start_row + dr * frame / frame_count, move.start_col + dc * frame / frame_count)
-            self.draw_board()
-            self.draw_pieces(board)
-            end_sq = pygame.Rect(move.end_col * self.SQ_SIZE, move.end_row * self.SQ_SIZE, self.SQ_SIZE, self.SQ_SIZE)
-
-            pygame.draw.rect(self.screen, pygame.Color('white'), end_sq)
-            if move.piece_captured != '--':
-                self.screen.blit(self.IMAGES[move.piece_captured], end_sq)
-
-            self.screen.blit(self.IMAGES[move.piece_moved],
-                             pygame.Rect(c * self.SQ_SIZE, r * self.SQ_SIZE, self.SQ_SIZE, self.SQ_SIZE))
-            pygame.display.flip()
-            clock.tick(60)
+        frame_count = (abs(dr) + abs(dc)) * self.ANIMATION_FRAMES_PER_SQUARE
+        frame = (pygame.time.get_ticks() - start) * self.ANIMATION_FPS // 1000
+        if frame >= frame_count:
+            return None
+        return move.start_row + dr * frame / frame_count, move.start_col + dc * frame / frame_count
+
+    def draw_frame(self, square_selected):
+        """
+        Draws the changes since the last frame : squares, the sliding piece of an animation, the game over text
+        and the turn bars.
+
+        :return: Rects to pass to pygame.display.update
+        """
+        # the squares the sliding piece covered last frame are repainted under it
+        if self._sprite_rect is not None:
+            self.invalidate(self._sprite_rect)
+            self._sprite_rect = None
+        position = None
+        if self.animation is not None:
+            position = self.animation_position()
+            if position is None:
+                self.animation = None
+
+        text = None
+        if self.game_state.check_mate:
+            text = "Black wins" if self.game_state.white_move else "white wins"
+        elif self.game_state.stale_mate:
+            text = "Stale mate"
+        if text != self._drawn_text:
+            for changed in (self._drawn_text, text):
+                if changed is not None:
+                    self.invalidate(self.get_text(changed)[1])
+            self._drawn_text = text
+
+        dirty = self.draw_game_state(self.game_state, square_selected)
+
+        if position is not None:
+            r, c = position
+            self._sprite_rect = pygame.Rect(int(c * self.SQ_SIZE), int(r * self.SQ_SIZE), self.SQ_SIZE, self.SQ_SIZE)
+            self.screen.blit(self.IMAGES[self.animation[0].piece_moved], self._sprite_rect)
+            dirty.append(self._sprite_rect)
+
+        if text is not None:
+            text_object, text_loc = self.get_text(text)
+            if text_loc.collidelist(dirty) != -1:
+                self.screen.blit(text_object, text_loc)
+                dirty.append(text_loc)
+
+        turn = self.game_state.white_move
+        if turn != self._drawn_turn or any(rect.top < 5 or rect.bottom > self.HEIGHT - 5 for rect in dirty):
+            self._drawn_turn = turn
+            dirty.extend(self.highlight_turn(turn))
+        return dirty
+
+    def play_move(self, move):
+        log.info(f'Piece Moved : {move.get_chess_notation()}')
+        log.info(f"TURN : {'White' if self.game_state.white_move else 'Black'}")
+
+        self.game_state.make_move(move)
+        self.animate = self.move_made = True
+
+        if self.flip_colors_mode:
+            if self.color_flip_mode_index >= len(self.all_themes):
+                self.color_flip_mode_index = 0
+            self.set_board_color(getattr(theme, self.all_themes[self.color_flip_mode_index]))
+            self.color_flip_mode_index += 1
+
+    def request_valid_moves(self):
+        """ cancels the running engine jobs and generates the moves of the new position in the background """
+        for job in (self.moves_job, self.ai_job):
+            if job is not None:
+                job.cancel()
+        self.ai_job = None
+        self.valid_moves = []
+        self.moves_from = {}
+        self.game_state.check_mate = self.game_state.stale_mate = False
+        position, _ = snapshot(self.game_state)
+        self.moves_job = self.worker.submit(_valid_moves_job, position)
+
+    def poll_engine(self):
+        """ picks up finished jobs, never waits for one """
+        if self.moves_job is not None and self.moves_job.done():
+            self.valid_moves, self.game_state.check_mate, self.game_state.stale_mate = self.moves_job.result()
+            self.moves_job = None
+            self.index_moves(self.valid_moves)
+            log.debug(f"{len(self.valid_moves)} valid moves")
+
+            if self.valid_moves and self.game_state.white_move in self.ai_players:
+                position, history = snapshot(self.game_state)
+                searcher = Searcher(position, tt=self.tt)
+                self.ai_job = self.worker.submit(_search_job, searcher, self.AI_MOVETIME, history,
+                                                 on_cancel=searcher.stop)
+
+        if self.ai_job is not None and self.ai_job.done() and self.animation is None:
+            move = self.ai_job.result()
+            self.ai_job = None
+            if move is not None:
+                self.play_move(Move.from_packed(move.packed, self.game_state.board))
 
     def run_main_loop(self):
         self.load_images()
-        valid_moves = self.game_state.get_valid_moves()
-
-        color_flip_mode_index = 0
+        self.request_valid_moves()
 
         square_selected = ()  # row and col
         player_clicks = []  # have two tuples, where user clicks
@@ -149,9 +361,13 @@ class GuiManager:
                 if e.type == pygame.QUIT:
                     self.running = False
 
+                elif e.type == pygame.VIDEOEXPOSE:
+                    # the window was uncovered, the whole board is drawn again
+                    self.invalidate()
+
                 # mouse events
                 elif e.type == pygame.MOUSEBUTTONDOWN:
-                    if not self.game_over:
+                    if not self.game_over and self.game_state.white_move not in self.ai_players:
                         loc = pygame.mouse.get_pos()
                         log.debug(f"Click detected at : {loc}")
 
@@ -170,21 +386,12 @@ class GuiManager:
                         if len(player_clicks) == 2:
                             move = Move(player_clicks[0], player_clicks[1], self.game_state.board)
 
-                            if move in valid_moves:
+                            if move in self.valid_moves:
+                                # play the generated move, it carries the en passant flag the click cannot know
                                 log.info("Move is valid.")
-                                log.info(f'Piece Moved : {move.get_chess_notation()}')
-                                log.info(f"TURN : {'White' if self.game_state.white_move else 'Black'}")
-
-                                self.game_state.make_move(move)
-                                self.animate = self.move_made = True
+                                self.play_move(self.valid_moves[self.valid_moves.index(move)])
                                 square_selected = ()
                                 player_clicks = []
-
-                                if self.flip_colors_mode:
-                                    if color_flip_mode_index >= len(self.all_themes):
-                                        color_flip_mode_index = 0
-                                    self.set_board_color(getattr(theme, self.all_themes[color_flip_mode_index]))
-                                    color_flip_mode_index += 1
                             else:
                                 player_clicks = [square_selected]
 
@@ -195,34 +402,30 @@ class GuiManager:
                             self.game_state.undo_last_move() else log.error("Undo requested but there is no last moves")
                         self.move_made = True
                         self.animate = False
+                        self.animation = None
 
                     if e.key == pygame.K_r:  # Reset the game
-                        game_state = GameState()
-                        valid_moves = game_state.get_valid_moves()
+                        self.game_state = GameState()
                         square_selected = ()
                         player_clicks = []
-                        self.move_made = self.animate = False
+                        self.move_made = True
+                        self.animate = False
+                        self.animation = None
 
             if self.move_made:
                 if self.animate:
-                    self.animate_move(self.game_state.move_logs[-1], self.game_state.board, self.clock)
-                valid_moves = self.game_state.get_valid_moves()
+                    self.animate_move(self.game_state.move_logs[-1])
                 log.debug("Move was made, generating next moves...")
+                self.request_valid_moves()
                 self.move_made = self.animate = False
 
-            self.draw_game_state(self.game_state, valid_moves, square_selected)
+            self.poll_engine()
 
-            if self.game_state.check_mate:
-                self.game_over = True
-                if self.game_state.white_move:
-                    self.draw_text("Black wins")
-                else:
-                    self.draw_text("white wins")
-            elif self.game_state.stale_mate:
-                self.game_over = True
-                self.draw_text("Stale mate")
+            self.game_over = self.game_state.check_mate or self.game_state.stale_mate
+            dirty = self.draw_frame(square_selected)
+            if dirty:
+                pygame.display.update(dirty)
 
-            self.highlight_turn(self.game_state.white_move)
+            self.clock.tick(self.ANIMATION_FPS if self.animation is not None else self.MAX_FPS)
 
-            self.clock.tick(self.MAX_FPS)
-            pygame.display.flip()
+        self.worker.close()
@@ -1,5 +1,9 @@
-from .logger import get_custom_logger
+from .logger import get_custom_logger, get_log_level, configure_engine_loggers
 
 __all__ = [
-    'get_custom_logger'
+    'get_custom_logger',
+    'get_log_level',
+    'configure_engine_loggers'
 ]
+
+configure_engine_loggers()
@@ -12,6 +12,27 @@ COMBINED_LOG_FILE_NAME = 'logfile.log'
 
 LOG_ON_CONSOLE = True  # If true, will also display logs on console.
 
+# Logging levels, per logger name. Loggers not listed use DEFAULT_LOG_LEVEL.
+# Calls below a logger's level are no-ops : nothing is formatted or printed.
+# Names under chess_engine are the engine's standard library loggers, set when the logger package is imported.
+# Everything logs at WARNING, set a name to 'DEBUG' here to trace it, e.g. 'chess_engine.engine': 'DEBUG'.
+DEFAULT_LOG_LEVEL = 'WARNING'
+LOG_LEVELS = {
+    'chess_engine': 'WARNING',  # move generation traces sit on the hot path
+    'ChessEngine': 'WARNING',  # GUI
+}
+
+# Level of the colored console logs (_Logger.ylog, glog, ...)
+COLOR_LOG_LEVELS = {
+    'ylog': 'DEBUG',
+    'glog': 'DEBUG',
+    'plog': 'DEBUG',
+    'clog': 'DEBUG',
+    'blog': 'DEBUG',
+    'rlog': 'INFO',
+    'wlog': 'DEBUG',
+}
+
 FULL_FILE_PATH = os.path.join(LOG_FILE_PATH, COMBINED_LOG_FILE_NAME)
 
 # Backup location is set to this very directory.
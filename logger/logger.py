@@ -4,9 +4,14 @@ import sys
 from logger import configs as cfg
 
 __all__ = [
-    'get_custom_logger'
+    'get_custom_logger',
+    'get_log_level',
+    'configure_engine_loggers'
 ]
 
+# prefix of the engine's standard library loggers (logging.getLogger(__name__) in chess_engine)
+ENGINE_LOGGER = 'chess_engine'
+
 
 class CustomFormatter(logging.Formatter):
     """
@@ -72,40 +77,85 @@ def _get_global_file_handler(valid_file_path, level, formatter) -> logging.FileH
     return global_file_handler
 
 
+def _noop(msg, prefix="LOG"):
+    """ stands in for colored log methods below the logger's level """
+
+
 class _Logger(logging.Logger):
-    def __init__(self, name):
-        super().__init__(name)
+    # colored log method name -> color
+    COLORS = {
+        'ylog': cfg.high_yellow,
+        'glog': cfg.high_green,
+        'plog': cfg.high_purple,
+        'clog': cfg.high_cyan,
+        'blog': cfg.high_blue,
+        'rlog': cfg.high_red,
+        'wlog': cfg.high_white,
+    }
+
+    def __init__(self, name, level=logging.NOTSET):
+        super().__init__(name, level)
+        self._bind_color_logs()
+
+    def setLevel(self, level):
+        super().setLevel(level)
+        # these loggers are not registered with logging's manager, which only resets the caches of its own
+        self._cache.clear()
+        self._bind_color_logs()
+
+    def _bind_color_logs(self):
+        """
+        Binds every colored log method to a printing function or, below the logger's level, to a no-op,
+        so disabled calls skip the formatting and the print.
+        Callers that kept a reference (ylog = log.ylog) keep the binding of that time.
+        """
+        for method, color in self.COLORS.items():
+            level = logging.getLevelName(cfg.COLOR_LOG_LEVELS.get(method, 'DEBUG'))
+            setattr(self, method, self._make_color_log(color) if self.isEnabledFor(level) else _noop)
 
-    def ylog(self, msg, prefix="LOG"):
-        print(f"{cfg.high_yellow}[{prefix.upper()}] [{self.name}] : {msg}{cfg.reset}")
+    def _make_color_log(self, color):
+        name = self.name
 
-    def glog(self, msg, prefix="LOG"):
-        print(f"{cfg.high_green}[{prefix.upper()}] [{self.name}] : {msg}{cfg.reset}")
+        def color_log(msg, prefix="LOG"):
+            print(f"{color}[{prefix.upper()}] [{name}] : {msg}{cfg.reset}")
 
-    def plog(self, msg, prefix="LOG"):
-        print(f"{cfg.high_purple}[{prefix.upper()}] [{self.name}] : {msg}{cfg.reset}")
+        return color_log
 
-    def clog(self, msg, prefix="LOG"):
-        print(f"{cfg.high_cyan}[{prefix.upper()}] [{self.name}] : {msg}{cfg.reset}")
 
-    def blog(self, msg, prefix="LOG"):
-        print(f"{cfg.high_blue}[{prefix.upper()}] [{self.name}] : {msg}{cfg.reset}")
+def get_log_level(name) -> int:
+    """
+    :param name: name of the logger
+    :return: logging level configured for it in configs.LOG_LEVELS, configs.DEFAULT_LOG_LEVEL otherwise.
+    """
+    return logging.getLevelName(cfg.LOG_LEVELS.get(name, cfg.DEFAULT_LOG_LEVEL))
 
-    def rlog(self, msg, prefix="LOG"):
-        print(f"{cfg.high_red}[{prefix.upper()}] [{self.name}] : {msg}{cfg.reset}")
 
-    def wlog(self, msg, prefix="LOG"):
-        print(f"{cfg.high_white}[{prefix.upper()}] [{self.name}] : {msg}{cfg.reset}")
+def configure_engine_loggers():
+    """
+    Applies configs.LOG_LEVELS to the engine's standard library loggers and, with configs.LOG_ON_CONSOLE, gives
+    the chess_engine logger a console handler. The engine configures no logging itself, see chess_engine/__init__.
+    Calling it again only updates the levels.
+    Engine modules read their trace flag once when imported : set the levels before the engine is imported.
+    """
+    for name, level in cfg.LOG_LEVELS.items():
+        if name == ENGINE_LOGGER or name.startswith(ENGINE_LOGGER + '.'):
+            logging.getLogger(name).setLevel(level)
+
+    engine_logger = logging.getLogger(ENGINE_LOGGER)
+    if cfg.LOG_ON_CONSOLE and not engine_logger.handlers:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(CustomFormatter())
+        engine_logger.addHandler(stream_handler)
 
 
-def get_custom_logger(name, level=logging.DEBUG, console_output: bool = True,
+def get_custom_logger(name, level=None, console_output: bool = True,
                       make_combined_logs: bool = cfg.COMBINED_LOGGING,
                       make_individual_logs: bool = cfg.INDIVIDUAL_LOGGING
                       ) -> logging.Logger:
     """
     This function is supposed to be called whenever you want to make a logger.
     :param name: name of the module, set it to __name__
-    :param level: level of logging. default if debug.
+    :param level: level of logging. If None, the level configured for `name` in configs is used.
     :param console_output: If true, will also display logs on console.
     :param make_combined_logs: If True, will make a single file to dump all logs from every module of project.
     :param make_individual_logs: if True, the log file name will be same as python modules which are logging it.
@@ -114,7 +164,10 @@ def get_custom_logger(name, level=logging.DEBUG, console_output: bool = True,
 
     formatter = CustomFormatter()
 
-    _logger = _Logger(name)
+    if level is None:
+        level = get_log_level(name)
+
+    _logger = _Logger(name, level)
 
     log_file_path: str = cfg.LOG_FILE_PATH
 
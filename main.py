@@ -1,7 +1,18 @@
-from gui.gui_manager import GuiManager
-from gui.ui_effects import theme
+import argparse
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plays chess in a window, against a friend or the engine.")
+    parser.add_argument('--ai', choices=('white', 'black', 'both'), help="side(s) the engine plays")
+    parser.add_argument('--movetime', type=int, help="engine milliseconds per move, 1000 by default")
+    args = parser.parse_args()
+
+    # pygame is only loaded once the arguments are known to be valid
+    from gui.gui_manager import GuiManager
+
     manager = GuiManager()
     manager.turn_on_color_flips()
+    if args.ai:
+        manager.set_ai_players(white=args.ai in ('white', 'both'), black=args.ai in ('black', 'both'))
+    if args.movetime:
+        manager.AI_MOVETIME = args.movetime
     manager.run_main_loop()
@@ -0,0 +1,68 @@
+import argparse
+import sys
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.epd import read_epd
+from chess_engine.match import EngineConfig, Adjudication, SPRT, run_match
+
+BACKENDS = {
+    'mailbox': GameState,
+    'bitboard': BitboardGameState,
+}
+
+
+def parse_engine(spec):
+    """ 'name=new,movetime=50,depth=8,nodes=20000,hash=16,backend=bitboard,book=book.bin,tablebases=tb' """
+    try:
+        fields = dict(item.split('=', 1) for item in spec.split(',') if item)
+        # a depth or node limit alone searches without a clock
+        default_movetime = None if 'depth' in fields or 'nodes' in fields else 100
+        return EngineConfig(
+            name=fields.get('name', spec),
+            movetime=int(fields['movetime']) if 'movetime' in fields else default_movetime,
+            max_depth=int(fields.get('depth', 128)),
+            nodes=int(fields['nodes']) if 'nodes' in fields else None,
+            tt_size_mb=int(fields.get('hash', 16)),
+            state_cls=BACKENDS[fields.get('backend', 'mailbox')],
+            book=fields.get('book'),
+            tablebases=fields.get('tablebases'))
+    except (KeyError, ValueError) as error:
+        raise argparse.ArgumentTypeError(f"bad engine {spec!r} : {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plays engine-vs-engine games in parallel and reports Elo and SPRT.")
+    parser.add_argument('-a', '--engine-a', type=parse_engine, required=True, metavar='SPEC',
+                        help="name=...,movetime=ms,depth=...,nodes=...,hash=mb,backend=...,book=...,tablebases=...")
+    parser.add_argument('-b', '--engine-b', type=parse_engine, required=True, metavar='SPEC')
+    parser.add_argument('-o', '--openings', help="EPD or FEN file, every position is played with both colours")
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="worker processes, default one per CPU")
+    parser.add_argument('--sprt', type=float, nargs=2, metavar=('ELO0', 'ELO1'), help="stop once the test decides")
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--max-plies', type=int, default=Adjudication().max_plies)
+    args = parser.parse_args(argv)
+
+    openings = [record.fen for record in read_epd(args.openings)] if args.openings else []
+    sprt = SPRT(args.sprt[0], args.sprt[1], args.alpha, args.beta) if args.sprt else None
+
+    def report(record, result):
+        elo, margin = result.elo
+        print(f"{result.games:>6} {record.white} - {record.black} {record.result:<8}{record.reason:<24}"
+              f"+{result.wins} -{result.losses} ={result.draws}  elo {elo:+.1f} +/- {margin:.1f}"
+              + (f"  llr {result.llr:.2f}" if sprt else ''))
+
+    result = run_match(args.engine_a, args.engine_b, openings, args.games, args.jobs,
+                       Adjudication(max_plies=args.max_plies), sprt, on_game=report)
+    elo, margin = result.elo
+    print(f"{args.engine_a.name} vs {args.engine_b.name} : +{result.wins} -{result.losses} ={result.draws}, "
+          f"elo {elo:+.1f} +/- {margin:.1f}, {result.games_per_sec:.2f} games/sec")
+    if sprt:
+        print(f"SPRT ({sprt.elo0:g}, {sprt.elo1:g}) llr {result.llr:.2f} : "
+              f"{ {'H1': 'H1 accepted', 'H0': 'H0 accepted'}.get(result.sprt, 'undecided') }")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import argparse
+import sys
+
+from chess_engine import GameState, BitboardGameState, instrumentation
+from chess_engine.parallel import ParallelPool
+from chess_engine.perft import run_perft_suite, perft, PERFT_POSITIONS
+
+BACKENDS = {
+    'mailbox': GameState,
+    'bitboard': BitboardGameState,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the perft regression suite against the move generator.")
+    parser.add_argument('-d', '--depth', type=int, default=3, help="deepest depth to run for every position")
+    parser.add_argument('-b', '--backend', choices=sorted(BACKENDS), default='mailbox')
+    parser.add_argument('--divide', action='store_true', help="print per root move counts of the first position")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="worker processes, root moves are split between them")
+    parser.add_argument('--stats', choices=('json', 'prometheus'),
+                        help="count and time the move generator and print the counters, with --jobs 1 only")
+    args = parser.parse_args(argv)
+    if args.stats and args.jobs > 1:
+        # worker processes are not instrumented, their counters would be silently missing
+        parser.error("--stats counts this process only, it can not be combined with --jobs above 1")
+
+    state_cls = BACKENDS[args.backend]
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+
+    pool = ParallelPool(args.jobs) if args.jobs > 1 else None
+    if args.stats:
+        instrumentation.reset()
+        instrumentation.enable((state_cls,))
+    try:
+        if args.divide:
+            game_state = PERFT_POSITIONS[0].factory(state_cls)
+            split = pool.divide(game_state, args.depth) if pool else game_state.divide(args.depth)
+            for move, nodes in split:
+                print(f"{move}: {nodes}")
+            print(f"Total: {sum(nodes for _, nodes in split)}")
+            return 0
+
+        print(f"{'position':<24}{'depth':>6}{'nodes':>14}{'expected':>14}{'seconds':>10}{'nodes/sec':>12}")
+        for result in run_perft_suite(state_cls, args.depth, perft_fn=pool.perft if pool else perft):
+            status = 'ok' if result.nodes == result.expected else 'FAIL'
+            failures += status != 'ok'
+            total_nodes += result.nodes
+            total_time += result.elapsed
+            print(f"{result.name:<24}{result.depth:>6}{result.nodes:>14}{result.expected:>14}"
+                  f"{result.elapsed:>10.3f}{result.nps:>12.0f}  {status}")
+    finally:
+        if pool:
+            pool.close()
+        instrumentation.disable()
+
+    print(f"{total_nodes} nodes in {total_time:.3f}s ({total_nodes / total_time if total_time else 0:.0f} nodes/sec), "
+          f"{failures} failure(s)")
+    if args.stats == 'json':
+        print(instrumentation.to_json(indent=2))
+    elif args.stats == 'prometheus':
+        print(instrumentation.to_prometheus(), end='')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import argparse
+import sys
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.pgn import replay_pgn
+
+BACKENDS = {
+    'mailbox': GameState,
+    'bitboard': BitboardGameState,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streams a PGN file and replays every game through the game state.")
+    parser.add_argument('path', help="PGN file, gzip compressed when it ends with .gz")
+    parser.add_argument('-b', '--backend', choices=sorted(BACKENDS), default='mailbox')
+    parser.add_argument('-n', '--limit', type=int, default=None, help="stop after this many games")
+    args = parser.parse_args(argv)
+
+    stats = replay_pgn(args.path, BACKENDS[args.backend], max_games=args.limit)
+    print(f"{stats.games} games, {stats.positions} positions, {stats.errors} error(s) in {stats.elapsed:.3f}s "
+          f"({stats.games_per_sec:.0f} games/sec, {stats.positions_per_sec:.0f} positions/sec)")
+    return 1 if stats.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
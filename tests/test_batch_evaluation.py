@@ -0,0 +1,66 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.batch_evaluation import evaluate_batch, encode_boards, encode_planes
+from chess_engine.evaluation import evaluate
+from chess_engine.moves import PIECE_CODES
+from chess_engine.perft import PERFT_POSITIONS
+
+
+def _random_positions(state_cls, count, seed):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game_state = PERFT_POSITIONS[rng.randrange(len(PERFT_POSITIONS))].factory(state_cls)
+        for _ in range(rng.randrange(40)):
+            moves = game_state.generate_moves([])
+            if not moves:
+                break
+            game_state.make_packed_move(rng.choice(moves))
+        positions.append(game_state)
+    return positions
+
+
+@pytest.mark.parametrize('state_cls', [GameState, BitboardGameState], ids=lambda cls: cls.__name__)
+def test_matches_evaluate(state_cls):
+    positions = _random_positions(state_cls, 200, state_cls.__name__)
+    scores = evaluate_batch(positions)
+    assert scores.shape == (200,)
+    assert scores.tolist() == [evaluate(game_state) for game_state in positions]
+
+
+def test_mixed_backends_in_one_batch():
+    positions = _random_positions(GameState, 20, 1) + _random_positions(BitboardGameState, 20, 1)
+    assert evaluate_batch(iter(positions)).tolist() == [evaluate(game_state) for game_state in positions]
+
+
+def test_planes():
+    game_state = GameState()
+    codes = encode_boards([game_state])
+    planes = encode_planes(codes=codes)
+    assert planes.shape == (1, 12, 64)
+    for i, piece in enumerate(PIECE_CODES):
+        expected = [game_state.board[sq >> 3][sq & 7] == piece for sq in range(64)]
+        assert planes[0, i].tolist() == [int(value) for value in expected]
+    assert (encode_planes([game_state]) == planes).all()
+
+
+def test_empty_input():
+    assert evaluate_batch([]).shape == (0,)
+    assert encode_boards([]).shape == (0, 64)
+    assert encode_planes([]).shape == (0, 12, 64)
+
+
+def test_does_not_load_the_bitboard_backend():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', "import sys, chess_engine.batch_evaluation; "
+                             "print('chess_engine.bitboard' in sys.modules)"], cwd=root, capture_output=True,
+                            text=True, check=True).stdout
+    assert output.split() == ['False']
@@ -0,0 +1,32 @@
+import random
+
+from chess_engine import bitboard
+from chess_engine.bitboard import rook_attacks, bishop_attacks, _LazyTable, _moves_from
+
+
+def test_slider_tables_match_the_ray_scan():
+    """ table lookups give the attacks of a scan along the rays, for any occupancy """
+    rng = random.Random(0)
+    for _ in range(2000):
+        sq = rng.randrange(64)
+        occupied = rng.getrandbits(64) & rng.getrandbits(64)
+        assert rook_attacks(sq, occupied) == bitboard._rook_scan(sq, occupied)
+        assert bishop_attacks(sq, occupied) == bitboard._bishop_scan(sq, occupied)
+        # squares outside the relevant masks never change the attacks
+        assert rook_attacks(sq, occupied | ~bitboard.ROOK_MASKS[sq] & bitboard.FULL) == rook_attacks(sq, occupied)
+
+
+def test_move_lists():
+    assert _moves_from(9, 1 << 0 | 1 << 63) == (9 | 0 << 6, 9 | 63 << 6)
+    assert _moves_from(9, 0) == ()
+    # white pushes onto row 0 are promotions to every piece
+    assert len(bitboard.PAWN_MOVE_LISTS[8][1 << 3 | 1 << 20]) == 5
+
+
+def test_lazy_table_limit():
+    calls = []
+    table = _LazyTable(lambda key: calls.append(key) or key * 2, limit=2)
+    assert (table[1], table[2], table[1]) == (2, 4, 2)
+    assert calls == [1, 2]
+    table[3]
+    assert len(table) == 1 and table[1] == 2 and calls == [1, 2, 3, 1]
@@ -0,0 +1,90 @@
+import io
+import random
+
+import pytest
+
+from chess_engine import GameState, BitboardGameState, OpeningBook, BookBuilder
+from chess_engine.book import encode_book_move, decode_book_move, ENTRY_BYTES
+
+BACKENDS = [GameState, BitboardGameState]
+
+FENS = [
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 b kq - 0 1',
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+]
+
+PGN = '''[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 1-0
+
+[Result "0-1"]
+
+1. e4 c5 2. Nf3 d6 0-1
+
+[Result "1/2-1/2"]
+
+1. d4 d5 1/2-1/2
+'''
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+@pytest.mark.parametrize('fen', FENS)
+def test_encode_decode_round_trip(state_cls, fen):
+    # castling, en passant and every promotion piece are among these moves
+    game_state = state_cls.from_fen(fen)
+    for move in game_state.generate_moves([]):
+        code = encode_book_move(move)
+        assert decode_book_move(game_state.board, game_state.white_move, code) == move
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    builder = BookBuilder()
+    stats = builder.add_pgn(io.StringIO(PGN))
+    assert stats.games == 3
+    path = str(tmp_path / 'book.bin')
+    assert builder.write(path) == len(builder)
+    return path
+
+
+def test_book_probe(book_path):
+    with OpeningBook(book_path) as book:
+        assert len(book) * ENTRY_BYTES == len(open(book_path, 'rb').read())
+        game_state = GameState()
+        # e4 won once and lost once (2 + 0), d4 was drawn (1)
+        assert [(move.packed, weight) for move, weight in book.probe(game_state)] == [
+            (52 | 36 << 6, 2), (51 | 35 << 6, 1)]
+        assert book.choose(game_state, best=True).packed == 52 | 36 << 6
+
+        game_state.make_packed_move(52 | 36 << 6)
+        # moves of the losing side weigh nothing : 1... e5 lost and is left out, 1... c5 won
+        assert [move.packed for move, _ in book.probe(game_state)] == [10 | 26 << 6]
+
+
+def test_book_choose_is_weighted_and_validated(book_path):
+    with OpeningBook(book_path) as book:
+        game_state = BitboardGameState()
+        rng = random.Random(1)
+        chosen = {book.choose(game_state, rng=rng).packed for _ in range(50)}
+        assert chosen == {52 | 36 << 6, 51 | 35 << 6}
+        assert [move.packed for move, _ in book.probe(game_state, validate=False)] == [
+            move.packed for move, _ in book.probe(game_state)]
+
+        game_state = GameState.from_fen('4k3/8/8/8/8/8/8/4K3 w - - 0 1')
+        assert book.choose(game_state) is None
+
+
+def test_empty_book(tmp_path):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    with OpeningBook(str(path)) as book:
+        assert len(book) == 0
+        assert book.choose(GameState()) is None
+
+
+def test_rejects_truncated_file(tmp_path):
+    path = tmp_path / 'broken.bin'
+    path.write_bytes(bytes(ENTRY_BYTES + 1))
+    with pytest.raises(ValueError):
+        OpeningBook(str(path))
@@ -0,0 +1,79 @@
+import io
+import random
+
+import pytest
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.epd import parse_epd, read_epd
+from chess_engine.fen import INITIAL_FEN, parse_fen, format_fen
+
+BACKENDS = [GameState, BitboardGameState]
+
+FENS = [
+    INITIAL_FEN,
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+    'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 b - - 12 10',
+]
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_parse_format_round_trip(fen):
+    assert format_fen(*parse_fen(fen)) == fen
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+@pytest.mark.parametrize('fen', FENS)
+def test_state_round_trip(state_cls, fen):
+    assert state_cls.from_fen(fen).to_fen() == fen
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_round_trip_after_moves(state_cls):
+    rng = random.Random(7)
+    game_state = state_cls.from_fen(FENS[1])
+    for _ in range(60):
+        moves = game_state.generate_moves([])
+        if not moves:
+            break
+        game_state.make_packed_move(rng.choice(moves))
+        copy = state_cls.from_fen(game_state.to_fen())
+        assert copy.to_fen() == game_state.to_fen()
+        assert copy.zobrist_key == game_state.zobrist_key
+        assert sorted(copy.generate_moves([])) == sorted(game_state.generate_moves([]))
+
+
+def test_fen_rejects_bad_field_count():
+    with pytest.raises(ValueError):
+        parse_fen('8/8/8/8/8/8/8/K1k5 w -')
+
+
+def test_epd_operations_and_counters():
+    record = parse_epd('r1b1k2r/ppppnppp/2n2q2/2b5/3NP3/2P1B3/PP3PPP/RN1QKB1R w KQkq - '
+                       'bm Nxc6; id "position 1"; hmvc 3; fmvn 7;')
+    assert record.fen == 'r1b1k2r/ppppnppp/2n2q2/2b5/3NP3/2P1B3/PP3PPP/RN1QKB1R w KQkq - 3 7'
+    assert record.best_moves == ['Nxc6']
+    assert record.id == 'position 1'
+
+
+def test_epd_fen_counters_take_precedence():
+    record = parse_epd(FENS[5] + ' bm Bxf6;')
+    assert record.fen == FENS[5]
+    assert record.best_moves == ['Bxf6']
+
+
+@pytest.mark.parametrize('line', [
+    '8/8/8/8/8/8/8/K1k5 w -',
+    '8/8/8/8/8/8/8/K1k5 w - - hmvc;',
+    '8/8/8/8/8/8/8/K1k5 w - - fmvn x;',
+])
+def test_epd_rejects_malformed_lines(line):
+    with pytest.raises(ValueError):
+        parse_epd(line)
+
+
+def test_read_epd_skips_blanks_and_comments():
+    records = list(read_epd(io.StringIO('# suite\n\n' + '\n'.join(FENS) + '\n')))
+    assert [record.fen for record in records] == FENS
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.evaluation import compute_score
+from chess_engine.perft import PERFT_POSITIONS
+from chess_engine.uci import parse_uci_move
+from chess_engine.zobrist import compute_hash
+
+BACKENDS = [GameState, BitboardGameState]
+
+
+def _from_scratch(game_state):
+    return (compute_hash(game_state.board, game_state.white_move, game_state.enpassant_possible,
+                         game_state.castling_rights), compute_score(game_state.board))
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+@pytest.mark.parametrize('position', PERFT_POSITIONS, ids=lambda position: position.name)
+def test_incremental_key_and_score(state_cls, position):
+    """ random games : after every move and every undo the running key and score match a full recomputation """
+    rng = random.Random(position.name)
+    for _ in range(5):
+        game_state = position.factory(state_cls)
+        trail = [(game_state.zobrist_key, game_state.eval_score)]
+        assert trail[0] == _from_scratch(game_state)
+        for _ in range(80):
+            moves = game_state.generate_moves([])
+            if not moves:
+                break
+            game_state.make_packed_move(rng.choice(moves))
+            trail.append((game_state.zobrist_key, game_state.eval_score))
+            assert trail[-1] == _from_scratch(game_state)
+
+        while game_state.move_logs:
+            trail.pop()
+            game_state.undo_last_move()
+            assert (game_state.zobrist_key, game_state.eval_score) == trail[-1] == _from_scratch(game_state)
+
+
+def test_backends_agree():
+    rng = random.Random(11)
+    states = [state_cls() for state_cls in BACKENDS]
+    for _ in range(120):
+        moves = sorted(states[0].generate_moves([]))
+        assert moves == sorted(states[1].generate_moves([]))
+        if not moves:
+            break
+        move = rng.choice(moves)
+        for game_state in states:
+            game_state.make_packed_move(move)
+        assert states[0].zobrist_key == states[1].zobrist_key
+        assert states[0].eval_score == states[1].eval_score
+
+
+def test_transpositions_share_a_key():
+    first, second = GameState(), GameState()
+    for game_state, moves in ((first, ('g1f3', 'g8f6', 'b1c3')), (second, ('b1c3', 'g8f6', 'g1f3'))):
+        for text in moves:
+            game_state.make_packed_move(parse_uci_move(game_state, text))
+    assert first.zobrist_key == second.zobrist_key
+    assert first.zobrist_key != GameState().zobrist_key
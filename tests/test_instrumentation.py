@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+import perft as perft_cli
+from chess_engine import GameState, BitboardGameState, instrumentation
+from chess_engine.perft import perft
+
+
+def test_disabled_engine_runs_its_own_code():
+    make_move = GameState.__dict__['make_move']
+    with instrumentation.instrumented((GameState,)):
+        assert GameState.__dict__['make_move'] is not make_move
+        assert instrumentation.is_enabled()
+    assert GameState.__dict__['make_move'] is make_move
+    assert not instrumentation.is_enabled()
+
+
+@pytest.mark.parametrize('state_cls', [GameState, BitboardGameState], ids=lambda cls: cls.__name__)
+def test_counts_make_move_calls(state_cls):
+    with instrumentation.instrumented((state_cls,)) as snapshot:
+        perft(state_cls(), 2)
+    snap = snapshot()
+    # bulk counting at depth 1 : the 20 root moves are made, the 400 leaves are only generated
+    assert snap.nodes == 20
+    assert snap.methods[f"{state_cls.__name__}.make_move"].calls == 20
+    assert json.loads(instrumentation.to_json(snap))['nodes'] == 20
+    assert 'chess_engine_nodes_total 20\n' in instrumentation.to_prometheus(snap)
+
+
+def test_perft_cli_stats(capsys):
+    assert perft_cli.main(['-d', '1', '--stats', 'json']) == 0
+    output = capsys.readouterr().out
+    assert json.loads(output[output.index('{'):])['methods']
+    assert not instrumentation.is_enabled()
+
+
+def test_perft_cli_rejects_stats_with_jobs(capsys):
+    with pytest.raises(SystemExit) as error:
+        perft_cli.main(['-d', '1', '--stats', 'json', '--jobs', '2'])
+    assert error.value.code == 2
+    assert '--stats' in capsys.readouterr().err
@@ -0,0 +1,51 @@
+import logging
+import os
+import subprocess
+import sys
+
+import logger
+from logger import configs, get_custom_logger, get_log_level
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                          check=True).stdout.split()
+
+
+def test_engine_import_has_no_side_effects():
+    assert _run("import sys, logging, chess_engine; from chess_engine import GameState; "
+                "print('logger' in sys.modules, 'pygame' in sys.modules, "
+                "bool(logging.getLogger('chess_engine').handlers))") == ['False', 'False', 'False']
+
+
+def test_logger_package_configures_engine_loggers():
+    assert configs.LOG_LEVELS['chess_engine'] == 'WARNING'
+    assert logging.getLogger('chess_engine.engine').getEffectiveLevel() == logging.WARNING
+    # imported first, as the GUI does, the engine's trace flag follows the configuration
+    assert _run("import logger; from chess_engine import engine; print(engine._trace)") == ['False']
+
+
+def test_warning_is_the_default_level(capsys):
+    assert configs.DEFAULT_LOG_LEVEL == 'WARNING'
+    assert get_log_level('ChessEngine') == get_log_level('not-configured') == logging.WARNING
+    # the GUI's colored logs print nothing unless a lower level is asked for
+    log = get_custom_logger('ChessEngine', console_output=False)
+    log.ylog('hidden')
+    log.rlog('hidden')
+    assert capsys.readouterr().out == ''
+
+
+def test_configure_is_idempotent():
+    engine_logger = logging.getLogger('chess_engine')
+    handlers = list(engine_logger.handlers)
+    logger.configure_engine_loggers()
+    assert engine_logger.handlers == handlers
+
+
+def test_colored_logs_below_level_are_noops(capsys):
+    log = get_custom_logger('test-logger', level=logging.INFO, console_output=False)
+    log.ylog('hidden')
+    log.rlog('shown')
+    assert capsys.readouterr().out.count('\n') == 1
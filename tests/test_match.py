@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.match import EngineConfig, Adjudication, play_game, run_match, elo_difference, sprt_llr
+from chess_engine.uci import parse_uci_move
+
+FAST = Adjudication(max_plies=20)
+
+
+def _config(name, state_cls=GameState):
+    return EngineConfig(name, movetime=None, max_depth=1, state_cls=state_cls)
+
+
+@pytest.mark.parametrize('white_cls, black_cls', [(GameState, BitboardGameState), (BitboardGameState, GameState)])
+def test_mixed_backends(white_cls, black_cls):
+    record = play_game(_config('white', white_cls), _config('black', black_cls), adjudication=FAST)
+    assert (record.result, record.reason) == ('1/2-1/2', 'adjudication length')
+    # every move of the record is valid on either backend
+    for state_cls in (GameState, BitboardGameState):
+        game_state = state_cls()
+        for text in record.moves:
+            game_state.make_packed_move(parse_uci_move(game_state, text))
+
+
+def test_game_ending_rules():
+    mated = play_game(_config('a'), _config('b'), 'rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3')
+    assert (mated.result, mated.reason, mated.moves) == ('0-1', 'checkmate', [])
+    bare = play_game(_config('a'), _config('b'), '4k3/8/8/8/8/8/8/4KB2 w - - 0 1')
+    assert (bare.result, bare.reason) == ('1/2-1/2', 'insufficient material')
+
+
+def test_elo_and_sprt():
+    assert elo_difference(0, 0, 0) == (0.0, math.inf)
+    elo, margin = elo_difference(60, 40, 0)
+    assert 60 < elo < 80 and margin > 0
+    assert elo_difference(50, 50, 10)[0] == 0.0
+    assert sprt_llr(60, 40, 0, 0, 5) > 0 > sprt_llr(40, 60, 0, 0, 5)
+
+
+def test_run_match():
+    results = []
+    result = run_match(_config('a'), _config('b', BitboardGameState), games=4, processes=2, adjudication=FAST,
+                       on_game=lambda record, so_far: results.append(record))
+    assert result.games == 4 == len(results)
+    # every opening is played twice, colours reversed
+    assert sorted(record.white for record in results) == ['a', 'a', 'b', 'b']
@@ -0,0 +1,49 @@
+import pytest
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.moves import Move, FLAG_ENPASSANT, FLAG_CASTLE, PROMOTION_PIECES
+
+BACKENDS = [GameState, BitboardGameState]
+
+FENS = [
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 b kq - 0 1',
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+]
+
+
+def _fields(move):
+    return (move.start_row, move.start_col, move.end_row, move.end_col, move.move_id, move.packed,
+            move.piece_moved, move.piece_captured, move.is_pawn_promotion, move.promotion_piece,
+            move.is_enpassant_move, move.is_castle_move)
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+@pytest.mark.parametrize('fen', FENS)
+def test_from_packed_matches_constructor(state_cls, fen):
+    """ a move wrapped from its packed form decodes the same fields as one built from its squares """
+    game_state = state_cls.from_fen(fen)
+    for packed in game_state.generate_moves([]):
+        start_sq, end_sq, flags = packed & 63, (packed >> 6) & 63, packed >> 12
+        built = Move(divmod(start_sq, 8), divmod(end_sq, 8), game_state.board,
+                     is_enpassant=flags == FLAG_ENPASSANT, is_castle=flags == FLAG_CASTLE,
+                     promotion_piece=PROMOTION_PIECES[flags & 3] if flags & 8 else 'Q')
+        wrapped = Move.from_packed(packed, game_state.board)
+        assert _fields(wrapped) == _fields(built)
+        assert wrapped == built and hash(wrapped) == hash(built)
+
+
+def test_move_fields():
+    game_state = GameState.from_fen(FENS[2])
+    enpassant = Move((3, 4), (2, 5), game_state.board, is_enpassant=True)
+    assert enpassant.piece_captured == 'bP' and enpassant.is_enpassant_move and not enpassant.is_castle_move
+    assert enpassant.promotion_piece is None
+    # the flags are not part of move_id, a move built from two clicked squares matches the generated one
+    assert enpassant == Move((3, 4), (2, 5), game_state.board)
+
+    game_state = GameState.from_fen(FENS[1])
+    promotion = Move((6, 1), (7, 0), game_state.board, promotion_piece='N')
+    assert (promotion.piece_moved, promotion.piece_captured) == ('bP', 'wR')
+    assert promotion.is_pawn_promotion and promotion.promotion_piece == 'N'
+    assert promotion != Move((6, 1), (7, 0), game_state.board, promotion_piece='Q')
+    assert str(promotion) == 'b2 -> a1'
@@ -0,0 +1,37 @@
+import pytest
+
+from chess_engine import GameState, BitboardGameState, MoveOrderer
+from chess_engine.perft import PERFT_POSITIONS
+
+BACKENDS = [GameState, BitboardGameState]
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+@pytest.mark.parametrize('position', PERFT_POSITIONS, ids=lambda position: position.name)
+def test_is_legal_move_agrees_with_generation(state_cls, position):
+    game_state = position.factory(state_cls)
+    legal = set(game_state.generate_moves([]))
+    candidates = legal | {start | end << 6 | flags << 12 for start in range(64) for end in range(64)
+                          for flags in (0, 1, 2, 11)}
+    for move in candidates:
+        assert game_state.is_legal_move(move) == (move in legal), move
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_staged_moves_lead_with_hash_move_once(state_cls):
+    game_state = PERFT_POSITIONS[1].factory(state_cls)
+    legal = sorted(game_state.generate_moves([]))
+    orderer = MoveOrderer()
+    for hash_move in (legal[0], legal[-1]):
+        staged = list(orderer.staged_moves(game_state, 0, hash_move))
+        assert staged[0] == hash_move
+        assert sorted(staged) == legal
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_staged_moves_skip_invalid_hash_move(state_cls):
+    game_state = state_cls()
+    legal = sorted(game_state.generate_moves([]))
+    # e1e2 : the king is blocked by its own pawn
+    staged = list(MoveOrderer().staged_moves(game_state, 0, 60 | 52 << 6))
+    assert sorted(staged) == legal
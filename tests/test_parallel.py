@@ -0,0 +1,49 @@
+import pytest
+
+from chess_engine import GameState, BitboardGameState, ParallelPool, Searcher
+from chess_engine.perft import PERFT_POSITIONS, divide
+from chess_engine.uci import move_to_uci
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with ParallelPool(2) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize('state_cls', [GameState, BitboardGameState], ids=lambda cls: cls.__name__)
+def test_perft_and_divide(pool, state_cls):
+    game_state = PERFT_POSITIONS[1].factory(state_cls)
+    assert pool.perft(game_state, 3) == PERFT_POSITIONS[1].nodes[3]
+    assert [(move.packed, nodes) for move, nodes in pool.divide(game_state, 2)] == [
+        (move.packed, nodes) for move, nodes in divide(game_state, 2)]
+
+
+def test_search(pool):
+    game_state = GameState.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    result = pool.search(game_state, 4)
+    assert move_to_uci(result.best_move.packed) == 'a1a8'
+    assert result.score > 20000
+    assert game_state.to_fen() == '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'
+
+
+def test_search_scores_every_root_move_under_a_tiny_budget(pool):
+    game_state = PERFT_POSITIONS[1].factory(GameState)
+    result = pool.search(game_state, 6, movetime=1)
+    # the first wave always completes, whatever the budget
+    assert result.depth >= 2
+    assert result.best_move.packed in game_state.generate_moves([])
+
+
+@pytest.mark.parametrize('fen', ['k7/8/2K5/8/8/8/8/7R w - - 0 1', '3r2k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1'])
+def test_search_depth_matches_serial_search(pool, fen):
+    # mates found by the children end their deepening early, the waves still count as complete
+    serial = Searcher(GameState.from_fen(fen)).search(5)
+    result = pool.search(GameState.from_fen(fen), 5)
+    assert result.depth == serial.depth
+    assert result.score == serial.score
+
+
+@pytest.mark.parametrize('max_depth', [1, 2, 3])
+def test_search_depth_never_exceeds_max_depth(pool, max_depth):
+    assert pool.search(GameState(), max_depth).depth == max_depth
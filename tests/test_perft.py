@@ -0,0 +1,43 @@
+import pytest
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.perft import PERFT_POSITIONS, perft, divide
+
+BACKENDS = [GameState, BitboardGameState]
+
+# deepest depth run for every position, deeper counts take too long for the suite
+MAX_DEPTH = 3
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+@pytest.mark.parametrize('position', PERFT_POSITIONS, ids=lambda position: position.name)
+def test_perft_matches_published_counts(state_cls, position):
+    depths = [depth for depth in sorted(position.nodes) if depth <= MAX_DEPTH]
+    assert depths, f"no count of {position.name} up to depth {MAX_DEPTH}"
+    for depth in depths:
+        assert perft(position.factory(state_cls), depth) == position.nodes[depth], depth
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_stalemate_and_checkmate_published_depth(state_cls):
+    # the published count of this position is at depth 4, small enough for the suite
+    position = next(position for position in PERFT_POSITIONS if position.name == 'stalemate and checkmate')
+    assert perft(position.factory(state_cls), 4) == 23527
+
+
+@pytest.mark.parametrize('position', PERFT_POSITIONS, ids=lambda position: position.name)
+def test_backends_divide_alike(position):
+    splits = [
+        sorted((move.packed, nodes) for move, nodes in divide(position.factory(state_cls), 2))
+        for state_cls in BACKENDS
+    ]
+    assert splits[0] == splits[1]
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_perft_leaves_position_unchanged(state_cls):
+    game_state = PERFT_POSITIONS[1].factory(state_cls)
+    fen, key, score = game_state.to_fen(), game_state.zobrist_key, game_state.eval_score
+    perft(game_state, 3)
+    assert (game_state.to_fen(), game_state.zobrist_key, game_state.eval_score) == (fen, key, score)
+
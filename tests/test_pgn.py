@@ -0,0 +1,76 @@
+import io
+import random
+
+import pytest
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.pgn import read_pgn, parse_san, move_to_san, replay_game, replay_pgn
+
+BACKENDS = [GameState, BitboardGameState]
+
+PGN = '''[Event "Casual"]
+[White "A \\"quoted\\" name"]
+[Black "B"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 {a comment
+over two lines} Nc6 3. Bc4 (3. Bb5 a6) Bc5 $1 4. O-O Nf6 5. d3 d6
+6. Bg5 h6 7. Bxf6 Qxf6 8. Nc3 O-O 1-0
+
+[Event "Illegal"]
+[Result "*"]
+
+1. e4 e5 2. Ke3 *
+
+[FEN "4k3/P7/8/8/8/8/8/4K3 w - - 0 1"]
+[Result "1/2-1/2"]
+
+1. a8=Q+ Kd7 1/2-1/2
+'''
+
+
+def test_read_pgn():
+    games = list(read_pgn(io.StringIO(PGN)))
+    assert len(games) == 3
+    first = games[0]
+    assert first.headers['White'] == 'A "quoted" name'
+    assert first.result == '1-0'
+    assert first.moves == ['e4', 'e5', 'Nf3', 'Nc6', 'Bc4', 'Bc5', 'O-O', 'Nf6', 'd3', 'd6', 'Bg5', 'h6', 'Bxf6',
+                           'Qxf6', 'Nc3', 'O-O']
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_replay(state_cls):
+    games = list(read_pgn(io.StringIO(PGN)))
+    game_state = replay_game(games[0], state_cls)
+    assert game_state.to_fen() == 'r1b2rk1/ppp2pp1/2np1q1p/2b1p3/2B1P3/2NP1N2/PPP2PPP/R2Q1RK1 w - - 2 9'
+    with pytest.raises(ValueError):
+        replay_game(games[1], state_cls)
+    assert replay_game(games[2], state_cls).to_fen() == 'Q7/3k4/8/8/8/8/8/4K3 w - - 1 2'
+
+    stats = replay_pgn(io.StringIO(PGN), state_cls)
+    assert (stats.games, stats.positions, stats.errors) == (2, 18, 1)
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_san_round_trip(state_cls):
+    rng = random.Random(3)
+    for fen in ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+                'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1'):
+        game_state = state_cls.from_fen(fen)
+        for _ in range(40):
+            moves = game_state.generate_moves([])
+            if not moves:
+                break
+            for move in moves:
+                assert parse_san(game_state, move_to_san(game_state, move, moves), moves).packed == move
+            game_state.make_packed_move(rng.choice(moves))
+
+
+def test_parse_san_rejects_illegal_and_ambiguous():
+    game_state = GameState.from_fen('4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1')
+    with pytest.raises(ValueError):
+        parse_san(game_state, 'Nf4')
+    with pytest.raises(ValueError):
+        parse_san(game_state, 'Nd2')
+    assert parse_san(game_state, 'Nbd2').start_col == 1
@@ -0,0 +1,46 @@
+import pytest
+
+from chess_engine import GameState, BitboardGameState, Searcher
+from chess_engine.search import MATE_SCORE
+from chess_engine.uci import move_to_uci
+
+BACKENDS = [GameState, BitboardGameState]
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_finds_mate_in_one(state_cls):
+    game_state = state_cls.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    result = Searcher(game_state).search(3)
+    assert move_to_uci(result.best_move.packed) == 'a1a8'
+    assert result.score == MATE_SCORE - 1
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_mated_and_stalemated_roots(state_cls):
+    mated = Searcher(state_cls.from_fen('R5k1/5ppp/8/8/8/8/8/6K1 b - - 1 1')).search(2)
+    assert mated.best_move is None and mated.score == -MATE_SCORE
+    stalemate = Searcher(state_cls.from_fen('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1')).search(2)
+    assert stalemate.best_move is None and stalemate.score == 0
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_repetitions_score_as_draws(state_cls):
+    # white is a queen up, but every move repeats a position of the game history
+    game_state = state_cls.from_fen('4k3/8/8/8/8/8/8/3QK3 w - - 0 1')
+    history = []
+    for move in game_state.generate_moves([]):
+        game_state.make_packed_move(move)
+        history.append(game_state.zobrist_key)
+        game_state.undo_last_move()
+
+    assert Searcher(game_state).search(3).score > 500
+    assert Searcher(game_state).search(3, history=history).score == 0
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_search_leaves_position_unchanged(state_cls):
+    game_state = state_cls.from_fen('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    fen, key = game_state.to_fen(), game_state.zobrist_key
+    result = Searcher(game_state).search(3)
+    assert result.depth == 3 and result.pv[0] == result.best_move
+    assert (game_state.to_fen(), game_state.zobrist_key) == (fen, key)
@@ -0,0 +1,112 @@
+import os
+import random
+from array import array
+
+import pytest
+
+from chess_engine import GameState, BitboardGameState, Tablebases, generate_tablebase
+from chess_engine.fen import format_fen
+from chess_engine.tablebase import DRAW, ILLEGAL, TABLEBASE_SUFFIX
+
+
+@pytest.fixture(scope='module')
+def directory(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('tablebases'))
+    for material in ('KQK', 'KRK'):
+        generate_tablebase(material, directory)
+    return directory
+
+
+@pytest.fixture
+def tablebases(directory):
+    tablebases = Tablebases(directory)
+    yield tablebases
+    tablebases.close()
+
+
+def _position(pieces, white_move):
+    """ GameState of {square: piece}, None if the side not to move is in check """
+    board = [['--'] * 8 for _ in range(8)]
+    for sq, piece in pieces.items():
+        board[sq >> 3][sq & 7] = piece
+    game_state = GameState.from_fen(format_fen(board, white_move))
+    game_state.white_move = not white_move
+    if game_state.in_check():
+        return None
+    game_state.white_move = white_move
+    return game_state
+
+
+def _random_positions(piece, count, seed):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        wk, bk, sq = rng.sample(range(64), 3)
+        if abs((wk >> 3) - (bk >> 3)) <= 1 and abs((wk & 7) - (bk & 7)) <= 1:
+            continue
+        game_state = _position({wk: 'wK', bk: 'bK', sq: piece}, rng.random() < 0.5)
+        if game_state is not None:
+            positions.append(game_state)
+    return positions
+
+
+def _mirror(game_state):
+    """ the same position with the colours swapped and the board flipped top to bottom """
+    board = [['--' if piece == '--' else ('b' if piece[0] == 'w' else 'w') + piece[1] for piece in row]
+             for row in reversed(game_state.board)]
+    return GameState.from_fen(format_fen(board, not game_state.white_move))
+
+
+@pytest.mark.parametrize('material, longest_win, longest_loss', [('KQK', 19, -21), ('KRK', 31, -33)])
+def test_longest_mates(directory, material, longest_win, longest_loss):
+    # mate in 10 and 16 moves with the strong side to move, mated in 10 and 16 moves with the bare king to move
+    with open(os.path.join(directory, material + TABLEBASE_SUFFIX), 'rb') as file:
+        values = [value for value in array('b', file.read()) if value != ILLEGAL]
+    assert max(values) == longest_win
+    assert min(values) == longest_loss
+
+
+@pytest.mark.parametrize('state_cls', [GameState, BitboardGameState], ids=lambda cls: cls.__name__)
+def test_known_positions(tablebases, state_cls):
+    # Qh8 mates, then the same positions with the colours swapped
+    assert tablebases.probe(state_cls.from_fen('k7/8/1K6/8/8/8/7Q/8 w - - 0 1')) == 1
+    assert tablebases.probe(state_cls.from_fen('k6Q/8/1K6/8/8/8/8/8 b - - 1 1')) == -1
+    assert tablebases.probe(state_cls.from_fen('8/7q/8/8/8/1k6/8/K7 b - - 0 1')) == 1
+    assert tablebases.probe(state_cls.from_fen('8/8/8/8/8/1k6/8/K6q w - - 1 1')) == -1
+    # the black king in check with white to move is not a position
+    assert tablebases.probe(state_cls.from_fen('k7/8/1K6/8/8/8/8/7Q w - - 0 1')) == ILLEGAL
+    # not covered : castling rights, or pieces on both sides
+    assert tablebases.probe(state_cls()) is None
+    assert tablebases.probe(state_cls.from_fen('k7/8/1K6/8/8/8/8/q6Q w - - 0 1')) is None
+
+
+@pytest.mark.parametrize('piece', ['wQ', 'wR'])
+def test_mirrored_colours(tablebases, piece):
+    for game_state in _random_positions(piece, 300, piece):
+        value = tablebases.probe(game_state)
+        assert value != ILLEGAL
+        assert tablebases.probe(_mirror(game_state)) == value
+
+
+def test_lone_king_takes_undefended_piece(tablebases):
+    # the only move of the black king takes the queen
+    game_state = GameState.from_fen('k7/1Q6/8/8/8/8/8/7K b - - 0 1')
+    assert tablebases.probe(game_state) == DRAW
+    assert [tablebases.best_move(game_state).packed] == game_state.generate_moves([])
+    # defended, the same queen wins
+    assert tablebases.probe(GameState.from_fen('k7/1Q6/2K5/8/8/8/8/8 b - - 0 1')) < 0
+
+
+@pytest.mark.parametrize('piece', ['wQ', 'wR'])
+def test_best_move_reduces_distance_to_mate(tablebases, piece):
+    for game_state in _random_positions(piece, 60, piece):
+        value = tablebases.probe(game_state)
+        while value != DRAW and value != -1:
+            move = tablebases.best_move(game_state)
+            game_state.make_move(move)
+            reply = tablebases.probe(game_state)
+            # mate in n plies for the winner is mated in n - 1 plies for the loser, and the other way round
+            assert reply == -value if value > 0 else reply == -value - 2
+            value = reply
+        if value == -1:
+            assert not game_state.get_valid_moves() and game_state.in_check()
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from chess_engine.transposition import TranspositionTable, SharedTranspositionTable, TTEntry, EXACT, LOWER_BOUND, \
+    UPPER_BOUND
+
+
+@pytest.fixture(params=['local', 'shared'])
+def tt(request, tmp_path):
+    if request.param == 'local':
+        yield TranspositionTable(1)
+        return
+    # file backed, the same slot layout as a shared memory block
+    table = SharedTranspositionTable(1, path=str(tmp_path / 'tt'))
+    yield table
+    table.close()
+    table.unlink()
+
+
+def _same_bucket(key, n):
+    """ n keys of the bucket of `key` with different key checks """
+    return [key ^ (i << 48) for i in range(1, n + 1)]
+
+
+def test_pack_unpack_round_trip(tt):
+    rng = random.Random(5)
+    for score in (-(1 << 15), -30000, -1, 0, 1, 30000, (1 << 15) - 1):
+        for move, depth, bound in ((0, 0, EXACT), (0xFFFF, 255, LOWER_BOUND), (rng.getrandbits(16), 7, UPPER_BOUND)):
+            key = rng.getrandbits(64)
+            tt.store(key, depth, score, bound, move)
+            assert tt.probe(key) == TTEntry(move, score, depth, bound)
+
+
+def test_miss_on_other_key_of_the_bucket(tt):
+    key = 0x123456789ABCDEF0
+    tt.store(key, 3, 10, EXACT, 77)
+    assert tt.probe(key ^ 1 << 60) is None
+
+
+def test_depth_preferred_slot_keeps_deepest(tt):
+    key = 0x0F0F0F0F0F0F0F0F
+    deep, *shallow = _same_bucket(key, 3)
+    tt.store(deep, 9, 1, EXACT, 1)
+    tt.store(shallow[0], 2, 2, EXACT, 2)
+    tt.store(shallow[1], 2, 3, EXACT, 3)
+    assert tt.probe(deep).depth == 9
+    assert tt.probe(shallow[0]) is None
+    assert tt.probe(shallow[1]).score == 3
+
+
+def test_older_search_is_replaced_first(tt):
+    key = 0x0F0F0F0F0F0F0F0F
+    old, new = _same_bucket(key, 2)
+    tt.store(old, 9, 1, EXACT, 1)
+    tt.new_search()
+    tt.store(new, 1, 2, EXACT, 2)
+    # the new entry takes the depth-preferred slot, the old one moves to the always-replace slot
+    assert tt.probe(new).score == 2
+    assert tt.probe(old).score == 1
+
+
+def test_same_position_update(tt):
+    key = 0xCAFEBABE12345678
+    tt.store(key, 6, 50, LOWER_BOUND, 123)
+    tt.store(key, 3, 40, UPPER_BOUND, 0)
+    assert tt.probe(key) == TTEntry(123, 50, 6, LOWER_BOUND)
+    # exact results always win, a missing move keeps the known one
+    tt.store(key, 3, 40, EXACT, 0)
+    assert tt.probe(key) == TTEntry(123, 40, 3, EXACT)
+
+
+def test_clear(tt):
+    tt.store(42, 1, 1, EXACT, 1)
+    tt.clear()
+    assert tt.probe(42) is None
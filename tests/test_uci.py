@@ -0,0 +1,79 @@
+import io
+
+import pytest
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.search import Searcher
+from chess_engine.uci import UCIEngine, move_to_uci
+
+BACKENDS = [GameState, BitboardGameState]
+
+
+def _engine(state_cls=GameState):
+    output = io.StringIO()
+    return UCIEngine(io.StringIO(), output, state_cls), output
+
+
+def _run(engine, *commands):
+    for command in commands:
+        engine.handle(command)
+    if engine._thread is not None:
+        engine._thread.join()
+    return engine.output.getvalue().splitlines()
+
+
+def _bestmove(lines):
+    bestmoves = [line for line in lines if line.startswith('bestmove')]
+    assert len(bestmoves) == 1
+    return bestmoves[0].split()[1]
+
+
+def test_handshake():
+    engine, _ = _engine()
+    lines = _run(engine, 'uci', 'isready', 'bogus')
+    assert lines[0].startswith('id name') and 'uciok' in lines
+    assert 'readyok' in lines
+    assert lines[-1] == 'info string unknown command bogus'
+
+
+@pytest.mark.parametrize('state_cls', BACKENDS, ids=lambda cls: cls.__name__)
+def test_go_answers_a_valid_move(state_cls):
+    engine, _ = _engine(state_cls)
+    lines = _run(engine, 'position startpos moves e2e4 e7e5', 'go depth 3')
+    assert any(line.startswith('info depth 3') for line in lines)
+    valid = {move_to_uci(move) for move in engine.game_state.generate_moves([])}
+    assert _bestmove(lines) in valid
+    assert len(engine.history) == 2
+
+
+def test_go_without_moves():
+    engine, _ = _engine()
+    assert _bestmove(_run(engine, 'position fen R5k1/5ppp/8/8/8/8/8/6K1 b - - 1 1', 'go depth 2')) == '0000'
+
+
+def test_infinite_waits_for_stop():
+    engine, output = _engine()
+    engine.handle('position startpos')
+    engine.handle('go infinite')
+    assert 'bestmove' not in output.getvalue()
+    lines = _run(engine, 'stop')
+    assert _bestmove(lines) in {move_to_uci(move) for move in engine.game_state.generate_moves([])}
+
+
+def test_failed_search_still_answers(monkeypatch):
+    calls = [0]
+    negamax = Searcher._negamax
+
+    def failing(self, *args):
+        calls[0] += 1
+        if calls[0] > 100:
+            raise RuntimeError('broken')
+        return negamax(self, *args)
+
+    monkeypatch.setattr(Searcher, '_negamax', failing)
+    engine, _ = _engine()
+    lines = _run(engine, 'position startpos moves d2d4', 'go depth 6')
+    assert "info string search failed : RuntimeError('broken')" in lines
+    assert _bestmove(lines) == move_to_uci(engine.game_state.generate_moves([])[0])
+    # the moves the search was inside of were taken back
+    assert engine.game_state.to_fen() == 'rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1'
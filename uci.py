@@ -0,0 +1,30 @@
+import argparse
+import sys
+
+from chess_engine import GameState, BitboardGameState
+from chess_engine.uci import UCIEngine
+
+BACKENDS = {
+    'mailbox': GameState,
+    'bitboard': BitboardGameState,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the engine as a UCI engine on stdin and stdout.")
+    parser.add_argument('-b', '--backend', choices=sorted(BACKENDS), default='mailbox')
+    parser.add_argument('--book', help="opening book file, see build_book.py")
+    parser.add_argument('--tablebases', help="tablebase directory, see generate_tablebases.py")
+    args = parser.parse_args(argv)
+
+    engine = UCIEngine(state_cls=BACKENDS[args.backend])
+    if args.book:
+        engine.handle(f"setoption name BookFile value {args.book}")
+    if args.tablebases:
+        engine.handle(f"setoption name TablebasePath value {args.tablebases}")
+    engine.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())